@@ -0,0 +1,91 @@
+# Benchmark de los métodos de carga de 'ventas_detalladas': INSERT (execute_values) vs COPY texto vs COPY binario.
+#
+# Uso:  python benchmarks/benchmark_carga_ventas.py --filas 200000
+# Crea una tabla temporal con la misma estructura de 'ventas_detalladas' (LIKE), la llena con datos
+# sintéticos con cada método y la elimina al terminar. No toca los datos reales.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Añadimos la ruta raíz del proyecto al path de python para poder importar nuestros módulos
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fase_1_extraccion_ventas.cargar_ventas_api import mapeo_columnas_api
+from utils.db_utils import get_db_connection, execute_query, copy_dataframe_to_db, insert_dataframe_to_db
+
+TABLA_BENCHMARK = "_benchmark_ventas_detalladas"
+
+def generar_ventas_sinteticas(filas, semilla=0):
+    """
+    Genera un DataFrame con las columnas y tipos que produce 'extraer_ventas_api'
+    (Int64 nulables, floats con NaN, fechas y textos con None).
+    """
+    rng = np.random.default_rng(semilla)
+    columnas = list(mapeo_columnas_api.values()) + ['empresa']
+    df = pd.DataFrame(index=range(filas))
+    for col in columnas:
+        if col in ('cant', 'porc_iva', 'factor', 'lista_precio'):
+            valores = pd.array(rng.integers(0, 100, filas), dtype='Int64')
+            valores[rng.random(filas) < 0.05] = pd.NA
+            df[col] = valores
+        elif col in ('valor_base', 'iva', 'descuento', 'valor', 'precio', 'precio_mayor', 'peso_bruto', 'costo', 'recargo'):
+            valores = rng.random(filas) * 100000
+            valores[rng.random(filas) < 0.05] = np.nan
+            df[col] = valores.round(6)
+        elif col == 'fecha':
+            df[col] = pd.Timestamp('2025-09-01') + pd.to_timedelta(rng.integers(0, 30, filas), unit='D')
+        elif col == 'empresa':
+            df[col] = rng.choice(['CAMDUN', 'GMD', 'PY'], filas)
+        else:
+            valores = pd.Series([f"{col.upper()} {i % 997}\tñ" for i in range(filas)], dtype=object)
+            valores[rng.random(filas) < 0.05] = None
+            df[col] = valores
+    return df
+
+def medir(nombre, funcion):
+    inicio = time.perf_counter()
+    filas = funcion()
+    segundos = time.perf_counter() - inicio
+    return {"metodo": nombre, "filas": filas, "segundos": segundos, "filas_por_segundo": filas / segundos if segundos else 0}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de ventas_detalladas")
+    parser.add_argument('--filas', type=int, default=200000, help="Filas sintéticas a cargar")
+    parser.add_argument('--metodos', nargs='+', default=['insert', 'copy_text', 'copy_binary'],
+                        choices=['insert', 'copy_text', 'copy_binary'])
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit(1)
+
+    print(f"Info: Generando {args.filas} filas sintéticas...")
+    df = generar_ventas_sinteticas(args.filas)
+
+    execute_query(conn, f'DROP TABLE IF EXISTS public."{TABLA_BENCHMARK}";')
+    execute_query(conn, f'CREATE UNLOGGED TABLE public."{TABLA_BENCHMARK}" (LIKE public."ventas_detalladas");')
+
+    cargas = {
+        'insert': lambda: insert_dataframe_to_db(conn, df, TABLA_BENCHMARK, page_size=1000),
+        'copy_text': lambda: copy_dataframe_to_db(conn, df, TABLA_BENCHMARK, formato='text'),
+        'copy_binary': lambda: copy_dataframe_to_db(conn, df, TABLA_BENCHMARK, formato='binary'),
+    }
+    resultados = []
+    try:
+        for metodo in args.metodos:
+            execute_query(conn, f'TRUNCATE public."{TABLA_BENCHMARK}";')
+            print(f"Info: Cargando con '{metodo}'...")
+            resultados.append(medir(metodo, cargas[metodo]))
+    finally:
+        execute_query(conn, f'DROP TABLE IF EXISTS public."{TABLA_BENCHMARK}";')
+        conn.close()
+
+    print("\n--- Resultados ---")
+    print(pd.DataFrame(resultados).to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+if __name__ == "__main__":
+    main()
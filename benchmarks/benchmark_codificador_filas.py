@@ -0,0 +1,78 @@
+# Benchmark de la preparación de filas para la BD: cadena anterior vs codificador compartido.
+#
+# Uso:  python benchmarks/benchmark_codificador_filas.py --filas 300000
+# Cadena anterior:  df.astype(object).where(pd.notnull(df), None) -> .values.tolist() -> [tuple(row) ...]
+# Codificador:      utils.db_utils.iterar_filas_en_lotes (columna por columna, lote por lote)
+# Mide tiempo, pico de memoria asignada (tracemalloc) y pico de RSS del proceso (psutil). No usa la BD.
+
+import argparse
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+import psutil
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.benchmark_carga_ventas import generar_ventas_sinteticas
+from utils.db_utils import iterar_filas_en_lotes
+
+def cadena_anterior(df):
+    df_para_insertar = df.astype(object).where(pd.notnull(df), None)
+    datos_para_insertar = [tuple(row) for row in df_para_insertar.values.tolist()]
+    return len(datos_para_insertar)
+
+def codificador_compartido(df):
+    # Se consumen los lotes como lo hace una carga real (cada lote se envía y se descarta)
+    return sum(len(lote) for lote in iterar_filas_en_lotes(df))
+
+def medir(nombre, funcion, df):
+    proceso = psutil.Process()
+    gc.collect()
+    rss_inicial = proceso.memory_info().rss
+    pico_rss = [rss_inicial]
+    midiendo = threading.Event()
+    midiendo.set()
+
+    def muestrear_rss():
+        while midiendo.is_set():
+            pico_rss[0] = max(pico_rss[0], proceso.memory_info().rss)
+            time.sleep(0.005)
+
+    hilo = threading.Thread(target=muestrear_rss, daemon=True)
+    hilo.start()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    filas = funcion(df)
+    segundos = time.perf_counter() - inicio
+    _, pico_asignado = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    midiendo.clear()
+    hilo.join()
+    return {
+        "metodo": nombre, "filas": filas, "segundos": segundos,
+        "pico_asignado_mb": pico_asignado / 1024 ** 2,
+        "pico_rss_extra_mb": (pico_rss[0] - rss_inicial) / 1024 ** 2,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del codificador de filas")
+    parser.add_argument('--filas', type=int, default=300000, help="Filas sintéticas a codificar")
+    args = parser.parse_args()
+
+    print(f"Info: Generando {args.filas} filas sintéticas...")
+    df = generar_ventas_sinteticas(args.filas)
+    print(f"Info: DataFrame de {df.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB")
+
+    resultados = [
+        medir("antes (astype/tolist/tuple)", cadena_anterior, df),
+        medir("después (iterar_filas_en_lotes)", codificador_compartido, df),
+    ]
+    print("\n--- Resultados ---")
+    print(pd.DataFrame(resultados).to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,21 @@ db_config = {
     "host": os.getenv("db_host", "localhost"),
     "port": os.getenv("db_port","5432")
 }
+# Filas por lote al enviar datos a la BD (COPY / execute_values)
+db_tamano_lote = int(os.getenv("db_tamano_lote", "20000"))
+# Método de carga de ventas: 'copy_text' (por defecto), 'copy_binary' o 'insert' (execute_values)
+ventas_metodo_carga = os.getenv("ventas_metodo_carga", "copy_text")
+# Carga incremental de ventas: solo se reemplazan los días (empresa, fecha) cuyo contenido cambió
+ventas_carga_incremental = os.getenv("ventas_carga_incremental", "true").lower() in ("1", "true", "si", "sí")
+# Modelo normalizado de ventas (hechos + dimensiones + vista 'ventas_detalladas'): ocupa menos disco
+# pero la consulta de la Fase 3 hace tres joins y es más lenta con la tabla en memoria. Es opcional:
+# solo con esto en true una BD nueva lo crea y la carga recuerda la opción 'Normalizar ventas' del menú
+ventas_modelo_normalizado = os.getenv("ventas_modelo_normalizado", "false").lower() in ("1", "true", "si", "sí")
+
+# Al iniciar se aplican las migraciones pendientes (las cargas de la Fase 1 y 2 dependen de ellas)
+# y se verifican los índices de la BD. Con 'false' solo se verifican: las migraciones se aplican
+# desde el menú y, mientras falten, los flujos completos se detienen con un error antes de empezar
+db_migraciones_automaticas = os.getenv("db_migraciones_automaticas", "true").lower() in ("1", "true", "si", "sí")
 
 # --- Configuración de la API de TNS para cada empresa ---
 api_config_tns = [
@@ -57,10 +72,72 @@ api_url = {
     "tercero": f"{api_base_url}/tablas/Tercero/Listar"
 }
 
+# --- Parámetros de rendimiento de la API ---
+# Timeouts (segundos) del login y de las consultas de inventario y terceros
+api_timeout_login = int(os.getenv("tns_api_timeout_login", "60"))
+api_timeout_consulta = int(os.getenv("tns_api_timeout_consulta", "300"))
+# Segundos que se reutiliza el token de cada empresa antes de pedir uno nuevo (un 401 también lo renueva)
+api_token_vigencia = int(os.getenv("tns_api_token_vigencia", "3000"))
+# Número máximo de empresas que se consultan en paralelo (un hilo por empresa)
+api_max_workers = int(os.getenv("tns_api_max_workers", "3"))
+# Registros por lote al leer las respuestas de la API en streaming
+api_tamano_lote = int(os.getenv("tns_api_tamano_lote", "5000"))
+# Las ventas se piden por ventanas de fechas: 'dia', 'semana' o un número de días
+ventas_ventana = os.getenv("tns_ventas_ventana", "semana")
+# Ventanas que se consultan en paralelo dentro de cada empresa
+ventas_max_workers_ventanas = int(os.getenv("tns_ventas_max_workers_ventanas", "4"))
+# Timeout (segundos) de cada ventana. Si se vence, la ventana se parte en dos automáticamente.
+ventas_timeout_ventana = int(os.getenv("tns_ventas_timeout_ventana", "600"))
+# Tamaño máximo (bytes) de la respuesta de una ventana antes de partirla en dos
+ventas_max_bytes_ventana = int(os.getenv("tns_ventas_max_bytes_ventana", str(200 * 1024 * 1024)))
+# Extracción y carga por lotes: cada ventana se transforma y se copia a la BD apenas llega,
+# sin juntar todo el rango en memoria (útil para rangos grandes)
+ventas_streaming = os.getenv("tns_ventas_streaming", "false").lower() in ("1", "true", "si", "sí")
+
 # --- Rutas de direcotrios del proyecto ---
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
+# --- Checkpoint de la extracción de la Fase 1 ---
+# Carpeta donde se guardan las ventanas ya extraídas de cada corrida para poder reanudarla
+checkpoint_dir = os.getenv("checkpoint_dir", os.path.join(base_dir, ".checkpoints"))
+
+# --- Zona de aterrizaje (landing) en Parquet ---
+# Cada extracción queda también en landing/<entidad>/empresa=<X>/fecha=<YYYY-MM-DD>/datos.parquet
+landing_habilitado = os.getenv("landing_habilitado", "true").lower() in ("1", "true", "si", "sí")
+landing_dir = os.getenv("landing_dir", os.path.join(base_dir, "landing"))
+landing_compresion = os.getenv("landing_compresion", "zstd")
+
+# --- Caché local de respuestas de la API (opcional) ---
+# Guarda comprimidas en disco las respuestas crudas de TNS para repetir una fase sin volver a descargarlas
+api_cache_habilitado = os.getenv("tns_api_cache", "false").lower() in ("1", "true", "si", "sí")
+api_cache_dir = os.getenv("tns_api_cache_dir", os.path.join(base_dir, ".cache_api"))
+# Tamaño máximo de la caché; al superarlo se borran las entradas usadas hace más tiempo
+api_cache_max_bytes = int(os.getenv("tns_api_cache_max_bytes", str(2 * 1024 * 1024 * 1024)))
+api_cache_nivel_compresion = int(os.getenv("tns_api_cache_nivel_compresion", "6"))
+# Vigencia (segundos) de las respuestas de cada endpoint (mismas llaves de api_url)
+api_cache_ttl = {
+    "ventas": int(os.getenv("tns_api_cache_ttl_ventas", str(6 * 3600))),
+    "productos": int(os.getenv("tns_api_cache_ttl_productos", str(30 * 60))),
+    "tercero": int(os.getenv("tns_api_cache_ttl_tercero", str(12 * 3600))),
+}
+# Las ventanas de ventas que terminaron hace más de estos días se consideran cerradas y no vencen
+api_cache_dias_ventana_cerrada = int(os.getenv("tns_api_cache_dias_ventana_cerrada", "40"))
+
+# --- Carga diferencial de inventario ---
+# Se guarda una foto local (llave + hash de cada fila) de la última carga exitosa y en la siguiente
+# solo se envían a la BD las filas nuevas o con cambios, y se borran las que ya no vienen
+inventario_carga_diferencial = os.getenv("inventario_carga_diferencial", "true").lower() in ("1", "true", "si", "sí")
+foto_local_dir = os.getenv("foto_local_dir", os.path.join(base_dir, ".fotos_carga"))
+
 # --- CONFIGURACIÓN FASE 3: EXPORTACIÓN ---
+# Filas que se leen de la BD (cursor del servidor) y se escriben al Excel por cada lote
+exportacion_tamano_lote = int(os.getenv("exportacion_tamano_lote", "20000"))
+# Procesos para exportar varios meses en paralelo (un mes por proceso); 0 = uno por CPU
+exportacion_procesos = int(os.getenv("exportacion_procesos", "0"))
+# Exporte incremental: junto a cada Excel se guarda un manifiesto con las huellas de sus días y en la
+# siguiente exportación del mes solo se reescriben los días nuevos o con cambios
+exportacion_incremental = os.getenv("exportacion_incremental", "true").lower() in ("1", "true", "si", "sí")
+
 # Usamos plantillas (f-strings) para las rutas
 # {mes_num} -> "10"
 # {mes_nombre} -> "Octubre"
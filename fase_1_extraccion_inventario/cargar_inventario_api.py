@@ -1,13 +1,62 @@
 import pandas as pd
-import requests
 import os
 import sys
-from datetime import datetime
 from psycopg2 import extras
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
-from utils.db_utils import get_db_connection
+from utils.db_utils import get_db_connection, upsert_dataframe_por_copy
+from utils.json_stream import iterar_lotes_json
+from utils import cache_api, cliente_tns
+from utils.landing import escribir_landing, leer_ultima_foto
+from utils.foto_local import huellas_por_llave, leer_foto, leer_huellas_bd, comparar_con_foto, guardar_foto, descartar_foto
+
+# Columnas finales del inventario (las mismas de la tabla 'inventario')
+columnas_inventario = ['codigo_inv', 'referencia_inv', 'descripcion_inv', 'bodega_inv', 'existencias_inv', 'empresa_inv']
+
+# Empresas en las que solo se conservan los productos que tienen la lista de precios permitida
+empresas_con_filtro_lista_precio = {"CAMDUN", "GMD", "PY"}
+
+def _tiene_lista_precio(lista_precios, codigo_lista):
+    """True si alguna de las listas de precios del producto tiene el código indicado."""
+    if not isinstance(lista_precios, list):
+        return False
+    for lista_precio in lista_precios:
+        if isinstance(lista_precio, dict) and str(lista_precio.get("codigo", "")).strip() == codigo_lista:
+            return True
+    return False
+
+def aplanar_inventario(productos, bodegas_permitidas, lista_precio=None, columnas=None):
+    """
+    Aplana un lote de productos de la API (cada uno con su lista de 'bodegas') a una fila por
+    producto y bodega, filtrando mientras recorre: los productos sin la lista de precios indicada
+    (si 'lista_precio' no es None) se descartan antes de mirar sus bodegas, y de cada producto
+    solo se toman las bodegas que están en 'bodegas_permitidas' (un set).
+    Agrega las filas a 'columnas' (dict columna -> lista, con los nombres finales *_inv sin
+    'empresa_inv') y lo retorna; así varios lotes se acumulan sin concatenar DataFrames.
+    """
+    if columnas is None:
+        columnas = {col: [] for col in columnas_inventario if col != 'empresa_inv'}
+    codigos, referencias = columnas['codigo_inv'], columnas['referencia_inv']
+    descripciones, bodegas, existencias = columnas['descripcion_inv'], columnas['bodega_inv'], columnas['existencias_inv']
+
+    for producto in productos:
+        bodegas_producto = producto.get('bodegas')
+        if not isinstance(bodegas_producto, list):
+            continue # Productos sin la estructura de bodegas
+        if lista_precio is not None and not _tiene_lista_precio(producto.get('listaPrecios'), lista_precio):
+            continue
+        codigo, referencia = producto.get('codigo'), producto.get('referencia')
+        for bodega in bodegas_producto:
+            codigo_bodega = bodega.get('codigoBodega')
+            if codigo_bodega not in bodegas_permitidas:
+                continue
+            codigos.append(codigo)
+            referencias.append(referencia)
+            descripciones.append(bodega.get('descripcion'))
+            bodegas.append(codigo_bodega)
+            existencias.append(bodega.get('existencias'))
+    return columnas
 
 def extraer_y_transformar_inventario():
     """
@@ -20,85 +69,121 @@ def extraer_y_transformar_inventario():
     for empresa_config in config.api_config_tns:
         nombre_empresa = empresa_config["nombre_corto"]
 
-        #Llamamos desde el config las URLs de login y productos
-        url_login = config.api_url["login"]
-        url_productos = config.api_url["productos"]
-
         print(f"Procesando inventario para: {nombre_empresa}")
 
         try:
-            #Flujo de autenticación
-            # Paso 1. Obtenemos el token de acceso
-            print("1. Solicitando token de acceso...")
-            login_payload = {
-                "codigoEmpresa": empresa_config["empresa_tns"],
-                "nombreUsuario": empresa_config["usuario_tns"],
-                "contrasenia": empresa_config["password_tns"]                
-            }
-            login_response = requests.post(url_login, json=login_payload, timeout=60)
-            login_response.raise_for_status() #Lanza error si el login falla
-            token = login_response.json()["data"]
-            print("Token obtenido con éxito.")
-            # Paso 2. Consultar productos con el token
-            print("2. Solicitando datos de inventario.")
-            #Preparamos los encabezados (headers) con el token Bearer
-            headers = {
-                "Authorization": f"Bearer {token}"
-            }
+            # El cliente compartido hace el login (una vez por empresa) y reutiliza las conexiones
+            print("Solicitando datos de inventario.")
             #Preparamos los parámetros de la URL (params)
             params_productos = {
                 "codigosucursal": "00"
             }
-            #Hacemos la llamada a la API
-            response = requests.get(url_productos, headers=headers, params=params_productos, timeout=300)
-            response.raise_for_status()
-            datos_api_raw = response.json()
-            if not (isinstance(datos_api_raw, dict) and "data" in datos_api_raw): continue
-
-            #Aplanamos el json directamente
-            df_empresa = pd.json_normalize(
-                datos_api_raw.get("data"),
-                record_path='bodegas',
-                meta=['codigo', 'referencia', 'listaPrecios'],
-                errors='ignore' #Ignora productos sin la estructura de bodegas
-            )
-            if df_empresa.empty:continue
+            #Hacemos la llamada a la API (en streaming, para no cargar el JSON completo en memoria),
+            #salvo que la respuesta esté guardada en la caché local
+            response = cache_api.leer("productos", nombre_empresa, params_productos)
+            if response is None:
+                response = cliente_tns.consultar(empresa_config, "productos", params_productos)
+                response.raise_for_status()
+                response = cache_api.grabar(response, "productos", nombre_empresa, params_productos)
+
+            bodegas_permitidas = set(empresa_config.get("bodegas_permitidas",[]))
+            lista_precio = None
+            if nombre_empresa in empresas_con_filtro_lista_precio:
+                lista_precio = empresa_config.get("lista_precio_permitida", "1")
+            columnas = None
+            with response:
+                # Solo conservamos las llaves que usa la transformación mientras se parsea, y
+                # los filtros de negocio se aplican al aplanar cada lote
+                for lote in iterar_lotes_json(response, columnas=['codigo', 'referencia', 'listaPrecios', 'bodegas']):
+                    columnas = aplanar_inventario(lote, bodegas_permitidas, lista_precio, columnas)
+            if columnas is None or not columnas['codigo_inv']:continue
 
+            df_empresa = pd.DataFrame(columnas)
             #Añadimos la columna de la empresa
             df_empresa['empresa_inv'] = nombre_empresa
-            
-            #Aplicamos los filtros de negocio
-            bodegas_permitidas = empresa_config.get("bodegas_permitidas",[])
-            df_empresa= df_empresa[df_empresa['codigoBodega'].isin(bodegas_permitidas)]
-
-            if nombre_empresa in ["CAMDUN", "GMD", "PY"]:
-                lista_precio_permitida = empresa_config.get("lista_precio_permitida", "1")
-                mask = df_empresa['listaPrecios'].apply(lambda listaPrecios: isinstance(listaPrecios, list) and any(str(listaPrecio.get("codigo", "")).strip() == lista_precio_permitida for listaPrecio in listaPrecios))
-                df_empresa = df_empresa[mask]
-            if not df_empresa.empty:
-                lista_dfs_finales.append(df_empresa)
-                print(f"¡Éxito! Se procesaron {len(df_empresa)} registros de inventario para {nombre_empresa}.")
+            lista_dfs_finales.append(df_empresa)
+            print(f"¡Éxito! Se procesaron {len(df_empresa)} registros de inventario para {nombre_empresa}.")
         except Exception as e:
             print(f"Error al procesar {nombre_empresa}: {e}")
     
     if lista_dfs_finales:
-        df_consolidado = pd.concat(lista_dfs_finales, ignore_index=True)
-        df_consolidado = df_consolidado.rename(columns={
-            'codigo': 'codigo_inv', 'referencia': 'referencia_inv', 'descripcion':'descripcion_inv',
-            'codigoBodega':'bodega_inv', 'existencias': 'existencias_inv'
-        })
-        columnas_finales = ['codigo_inv', 'referencia_inv', 'descripcion_inv', 'bodega_inv', 'existencias_inv', 'empresa_inv']
-        df_consolidado = df_consolidado[columnas_finales]
+        df_consolidado = pd.concat(lista_dfs_finales, ignore_index=True)[columnas_inventario]
         print(f"\nInfo: Extracción completada. Total de registros de inventario: {len(df_consolidado)}")
         return df_consolidado
     return None
 
+# Llave única de la tabla 'inventario' (la del ON CONFLICT)
+llaves_inventario = ['codigo_inv', 'bodega_inv', 'empresa_inv']
+
+def _llaves_en_bd(cursor, table_name, empresas):
+    """Lee las llaves que tiene la tabla para las empresas indicadas (como texto, igual que las huellas)."""
+    cursor.execute(
+        f'SELECT codigo_inv, bodega_inv, empresa_inv FROM public."{table_name}" WHERE empresa_inv = ANY(%s)',
+        (list(empresas),)
+    )
+    return pd.DataFrame(cursor.fetchall(), columns=llaves_inventario, dtype=object).astype(str)
+
+def _huellas_en_bd(cursor, table_name, empresas):
+    """
+    Huella de la tabla por empresa, calculada en la BD sin traer las filas: {empresa: [filas, huella]},
+    con la huella como la suma de los hashes de las filas completas (cambia con cualquier valor).
+    """
+    cursor.execute(
+        f'''SELECT i.empresa_inv, count(*), sum(hashtextextended(i::text, 0))
+            FROM public."{table_name}" AS i WHERE i.empresa_inv = ANY(%s) GROUP BY i.empresa_inv''',
+        (list(empresas),)
+    )
+    return {empresa: [filas, str(huella)] for empresa, filas, huella in cursor.fetchall()}
+
+def _foto_coincide_con_bd(cursor, table_name, empresas):
+    """
+    La foto local solo sirve si la BD sigue teniendo, por empresa, la huella que dejó la última
+    carga (si otra carga o un cambio manual tocó la tabla, aunque sea sin cambiar los conteos,
+    las huellas ya no coinciden).
+    """
+    en_bd = _huellas_en_bd(cursor, table_name, empresas)
+    guardadas = leer_huellas_bd(table_name)
+    return all(en_bd.get(empresa) == guardadas.get(empresa) for empresa in empresas)
+
+def _filtrar_por_llaves(df, llaves_df):
+    """Filas de 'df' cuya llave está en 'llaves_df' (DataFrame con las columnas de la llave como texto)."""
+    llaves_filas = pd.MultiIndex.from_frame(pd.DataFrame({col: df[col].astype(str) for col in llaves_inventario}))
+    return df[llaves_filas.isin(pd.MultiIndex.from_frame(llaves_df))]
+
+def _planear_carga_inventario(cursor, table_name, df_inventario, huellas):
+    """
+    Decide qué se envía a la BD comparando la extracción contra la foto local de la última carga.
+    Retorna (df_a_enviar, llaves_a_borrar). Sin foto válida se envía todo y las filas a borrar se
+    calculan contra las llaves que tiene la BD. Solo se borran filas de las empresas extraídas.
+    """
+    empresas = huellas['empresa_inv'].unique()
+    foto = leer_foto(table_name) if config.inventario_carga_diferencial else None
+    if foto is not None and not _foto_coincide_con_bd(cursor, table_name, empresas):
+        print("ADVERTENCIA: La BD no coincide con la foto local de la última carga de inventario. Se hará una carga completa.")
+        foto = None
+
+    if foto is None:
+        llaves_bd = _llaves_en_bd(cursor, table_name, empresas)
+        borradas = llaves_bd[~pd.MultiIndex.from_frame(llaves_bd).isin(pd.MultiIndex.from_frame(huellas[llaves_inventario]))]
+        print(f"Info: Carga completa de inventario: {len(df_inventario)} registros a enviar, {len(borradas)} a borrar.")
+        return df_inventario, borradas
+
+    nuevas, cambiadas, borradas = comparar_con_foto(huellas, foto, llaves_inventario, 'empresa_inv')
+    sin_cambios = len(huellas) - len(nuevas) - len(cambiadas)
+    print(f"Info: Carga diferencial de inventario: {len(nuevas)} nuevos, {len(cambiadas)} con cambios, "
+          f"{len(borradas)} a borrar, {sin_cambios} sin cambios.")
+    return _filtrar_por_llaves(df_inventario, pd.concat([nuevas, cambiadas], ignore_index=True)), borradas
+
 def cargar_inventario_db(df_inventario, conn):
     """
     Carga el DataFrame de inventario en la tabla 'inventario' usando la estrategia UPSERT 
-    (INSERT ON CONFLICT DO UPDATE).
+    (COPY a una tabla temporal + INSERT ... ON CONFLICT DO UPDATE).
     
     La clave única (ON CONFLICT) es: (codigo_inv, bodega_inv, empresa_inv)
+
+    Con la carga diferencial (config.inventario_carga_diferencial) solo se envían las filas nuevas o
+    con cambios respecto a la foto local de la última carga exitosa, y se borran las filas que ya
+    no vienen en la extracción (productos que salieron de una bodega).
     """
     table_name = "inventario"
     print(f"\nINFO: Iniciando carga UPSERT en '{table_name}'...")
@@ -109,60 +194,60 @@ def cargar_inventario_db(df_inventario, conn):
 
     try:
         # --- Paso 1: Preparación de datos ---
-        # 1. Convertimos todos los nulos (NaN) a None (NULL de Python/SQL)
-        df_para_insertar = df_inventario.astype(object).where(pd.notnull(df_inventario), None)
-
-        # 2. Convertimos el DataFrame a una lista de tuplas para execute_values
-        datos_para_insertar = [tuple(row) for row in df_para_insertar.values.tolist()]
-        
-        # Obtenemos la lista de columnas (usada en la cláusula INSERT)
-        columnas_db = list(df_inventario.columns)
-        
-        # Creamos la lista de columnas para la cláusula UPDATE
-        # Excluimos las columnas que son parte de la clave de conflicto.
-        columnas_a_actualizar = [
-            col for col in columnas_db if col not in ('codigo_inv', 'bodega_inv', 'empresa_inv')
-        ]
-        
-        # 3. Construcción de la consulta UPSERT
-        
-        # Cláusula ON CONFLICT DO UPDATE: columna = EXCLUDED.columna
-        update_clausule = ', '.join([
-            f'"{col}" = EXCLUDED."{col}"' for col in columnas_a_actualizar
-        ])
-        
-        # 4. Consulta SQL final
-        query_upsert = f"""
-            INSERT INTO public."{table_name}" ({', '.join(f'"{c}"' for c in columnas_db)})
-            VALUES %s
-            ON CONFLICT ("codigo_inv", "bodega_inv", "empresa_inv") DO UPDATE
-            SET {update_clausule};
+        query_borrar = f"""
+            DELETE FROM public."{table_name}"
+            WHERE ("codigo_inv", "bodega_inv", "empresa_inv") IN (VALUES %s);
         """
+
+        # Huellas de la extracción: con ellas se compara contra la foto y se guarda la nueva
+        huellas = huellas_por_llave(df_inventario, llaves_inventario)
         
         # --- Paso 2: Ejecución ---
+        # Las filas van por COPY a una tabla temporal y de ahí a la tabla con un solo
+        # INSERT ... ON CONFLICT (ver 'upsert_dataframe_por_copy'); todo en una transacción.
         with conn.cursor() as cursor:
-            print(f"Info: Ejecutando UPSERT para {len(datos_para_insertar)} registros...")
-            extras.execute_values(
-                cursor, 
-                query_upsert, 
-                datos_para_insertar, 
-                page_size=5000 # Un tamaño de página grande para eficiencia
-            )
+            df_a_enviar, borradas = _planear_carga_inventario(cursor, table_name, df_inventario, huellas)
+            resultado = {"insertadas": 0, "actualizadas": 0, "sin_cambios": 0, "duplicadas": 0}
+            if not df_a_enviar.empty:
+                print(f"Info: Ejecutando UPSERT para {len(df_a_enviar)} registros...")
+                resultado = upsert_dataframe_por_copy(conn, df_a_enviar, table_name, llaves_inventario, commit=False)
+            if resultado["duplicadas"]:
+                print(f"ADVERTENCIA: {resultado['duplicadas']} registros con llave repetida en la extracción; se conservó el último de cada llave.")
+            if not borradas.empty:
+                extras.execute_values(cursor, query_borrar, list(borradas.itertuples(index=False, name=None)), page_size=5000)
+            # Huella de la BD tal como queda con esta carga, para validar la foto en la próxima
+            huellas_bd = _huellas_en_bd(cursor, table_name, huellas['empresa_inv'].unique()) if config.inventario_carga_diferencial else None
             conn.commit()
-            print(f"¡ÉXITO! {len(datos_para_insertar)} registros de inventario actualizados/insertados en '{table_name}'.")
+            print(f"¡ÉXITO! Inventario en '{table_name}': {resultado['insertadas']} insertados, "
+                  f"{resultado['actualizadas']} actualizados, {resultado['sin_cambios']} sin cambios y {len(borradas)} borrados.")
+
+        # La foto solo se actualiza después del commit: si la carga falla, la próxima vuelve a comparar contra la anterior
+        if config.inventario_carga_diferencial:
+            guardar_foto(table_name, huellas, 'empresa_inv', huellas_bd)
+        else:
+            descartar_foto(table_name)
 
     except Exception as e:
         print(f"ERROR CRÍTICO durante la carga UPSERT en '{table_name}': {e}")
         conn.rollback() # Revertimos si hay un error
         raise # Relanzamos el error para que la orquestación lo maneje
 
-def ejecutar_fase_1_inventario():
+def ejecutar_fase_1_inventario(desde_landing=False):
     """
     Orquesta la extracción, transformación y carga del inventario.
+    :param desde_landing: True para cargar la última foto guardada en la zona de aterrizaje
+                          (Parquet) sin consultar la API.
     """
     print("\n=== INICIO FASE 1: ACTUALIZACIÓN DE INVENTARIO ===")
     
-    df_inventario = extraer_y_transformar_inventario()
+    if desde_landing:
+        df_inventario = leer_ultima_foto("inventario")
+    else:
+        df_inventario = extraer_y_transformar_inventario()
+        try:
+            escribir_landing(df_inventario, "inventario", "empresa_inv")
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo guardar la foto de inventario en la zona de aterrizaje: {e}. La carga a la BD continúa.")
     
     if df_inventario is not None and not df_inventario.empty:
         conn = get_db_connection()
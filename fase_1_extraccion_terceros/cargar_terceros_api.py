@@ -1,13 +1,14 @@
 import pandas as pd
-import requests
 import os
 import sys
-from datetime import datetime
-from psycopg2 import extras
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
-from utils.db_utils import get_db_connection
+from utils.db_utils import get_db_connection, upsert_dataframe_por_copy
+from utils.json_stream import iterar_lotes_json
+from utils import cache_api, cliente_tns
+from utils.landing import escribir_landing, leer_ultima_foto
+from utils.migraciones import exigir_migracion
 
 def extraer_clientes_api():
     print("Info: Iniciando extracción de clientes desde la API de TNS...")
@@ -16,48 +17,33 @@ def extraer_clientes_api():
     # Hacemos un bucle para procesar cada empresa
     for empresa_config in config.api_config_tns:
         nombre_empresa = empresa_config["nombre_corto"]
-        # Obtenemos las URLs de Login y Terceros desde el config
-        url_login = config.api_url["login"]
-        url_terceros = config.api_url["tercero"]
         print(f"--- Extrayendo para la empresa: {nombre_empresa} ---")
         
         try:
-            print("1. Solicitando token de acceso...")
-            login_payload = {
-                "codigoEmpresa": empresa_config["empresa_tns"],
-                "nombreUsuario": empresa_config["usuario_tns"],
-                "contrasenia": empresa_config["password_tns"]
-            }
-            login_response = requests.post(url_login, json=login_payload, timeout=60)
-            login_response.raise_for_status() # Lanza error si el login falla
-            token = login_response.json()["data"]
-            print("   -> Token obtenido con éxito.")
+            # El cliente compartido hace el login (una vez por empresa) y reutiliza las conexiones
+            print("Solicitando datos de terceros...")
+            #Hacemos la llamada a la API (en streaming, para no cargar el JSON completo en memoria),
+            #salvo que la respuesta esté guardada en la caché local
+            response = cache_api.leer("tercero", nombre_empresa)
+            if response is None:
+                response = cliente_tns.consultar(empresa_config, "tercero")
+                response.raise_for_status()
+                response = cache_api.grabar(response, "tercero", nombre_empresa)
             
-            print("2. Solicitando datos de terceros...")
-            # Preparamos las cabeceras (headers) con el token Bearer
-            headers = {
-                "Authorization": f"Bearer {token}"
-            }
-            # Preparamos los parámetros de la URL (params)
-            #Hacemos la llamada a la API
-            response = requests.get(url_terceros, headers=headers, timeout=300)
-            response.raise_for_status()
-            datos_api_raw = response.json()
-            
-            #Creamos la lista vacía para guardar los datos de cada empresa
-            lista_terceros_api = []
-            #Ajustamos al formato de respuesta (dict['data'])
-            if isinstance(datos_api_raw, dict) and "data" in datos_api_raw:
-                lista_terceros_api = datos_api_raw.get("data")
-            if not lista_terceros_api:
+            dfs_lotes = []
+            with response:
+                # Solo conservamos las llaves del mapeo mientras se parsea, lote por lote
+                for lote in iterar_lotes_json(response, columnas=mapeo_columnas_api.keys()):
+                    terceros_procesados = [ {nuestra_col: item.get(api_col) for api_col, nuestra_col in mapeo_columnas_api.items()} for item in lote if isinstance(item, dict) ]
+                    if terceros_procesados:
+                        dfs_lotes.append(pd.DataFrame(terceros_procesados))
+            if not dfs_lotes:
                 print(f"INFO: No se encontraron registros de terceros para {nombre_empresa}.")
                 continue #Saltamos a la siguiente empresa
-            terceros_procesados = [ {nuestra_col: item.get(api_col) for api_col, nuestra_col in mapeo_columnas_api.items()} for item in lista_terceros_api if isinstance(item, dict) ]
-            if terceros_procesados:
-                df_empresa = pd.DataFrame(terceros_procesados)
-                df_empresa['empresa_ter'] = nombre_empresa
-                lista_dfs_empresas.append(df_empresa)
-                print(f"¡ÉXITO! Se procesaron {len(df_empresa)} clientes de {nombre_empresa}.")
+            df_empresa = pd.concat(dfs_lotes, ignore_index=True)
+            df_empresa['empresa_ter'] = nombre_empresa
+            lista_dfs_empresas.append(df_empresa)
+            print(f"¡ÉXITO! Se procesaron {len(df_empresa)} clientes de {nombre_empresa}.")
         except Exception as e:
             print(f"ERROR al procesar {nombre_empresa}: {e}")
             
@@ -70,9 +56,9 @@ def extraer_clientes_api():
 def cargar_terceros_db(df_terceros, conn):
     """
     Carga el DataFrame de terceros en la tabla 'terceros' usando la estrategia UPSERT 
-    (INSERT ON CONFLICT DO UPDATE).
+    (COPY a una tabla temporal + INSERT ... ON CONFLICT DO UPDATE).
     
-    La clave única (ON CONFLICT) es: (nit, empresa_ter)
+    La clave única (ON CONFLICT) es: (nit_ter, empresa_ter)
     """
     table_name = "terceros"
     print(f"\nINFO: Iniciando carga UPSERT en '{table_name}'...")
@@ -82,48 +68,20 @@ def cargar_terceros_db(df_terceros, conn):
         return
 
     try:
-        # --- Paso 1: Preparación de datos ---
-        from psycopg2 import extras
-
-        # Convertimos nulos (NaN) a None (NULL de Python/SQL)
-        df_para_insertar = df_terceros.astype(object).where(pd.notnull(df_terceros), None)
-        datos_para_insertar = [tuple(row) for row in df_para_insertar.values.tolist()]
-        
-        columnas_db = list(df_terceros.columns)
-        
-        # Clave de Conflicto: NIT y EMPRESA
-        clave_conflicto = ("nit", "empresa_ter")
-        
-        # Columnas a actualizar: todas menos la clave de conflicto
-        columnas_a_actualizar = [
-            col for col in columnas_db if col not in clave_conflicto
-        ]
-        
-        # 2. Construcción de la cláusula ON CONFLICT DO UPDATE
-        update_clausule = ', '.join([
-            f'"{col}" = EXCLUDED."{col}"' for col in columnas_a_actualizar
-        ])
-        
-        # 3. Consulta SQL final
-        # Usamos f-string para el nombre de la tabla y join para las columnas.
-        query_upsert = f"""
-            INSERT INTO public."{table_name}" ({', '.join(f'"{c}"' for c in columnas_db)})
-            VALUES %s
-            ON CONFLICT ("nit", "empresa_ter") DO UPDATE
-            SET {update_clausule};
-        """
-        
-        # --- Paso 2: Ejecución ---
+        # Clave de Conflicto: NIT y EMPRESA (el 'nit' de la API llega renombrado a 'nit_ter')
+        clave_conflicto = ["nit_ter", "empresa_ter"]
         with conn.cursor() as cursor:
-            print(f"Info: Ejecutando UPSERT para {len(datos_para_insertar)} registros...")
-            extras.execute_values(
-                cursor, 
-                query_upsert, 
-                datos_para_insertar, 
-                page_size=5000
-            )
-            conn.commit()
-            print(f"¡ÉXITO! {len(datos_para_insertar)} registros de terceros actualizados/insertados en '{table_name}'.")
+            exigir_migracion(cursor, 2) # Índice único (nit_ter, empresa_ter) que usa el ON CONFLICT
+        
+        # --- Ejecución ---
+        # Las filas van por COPY a una tabla temporal y de ahí a la tabla con un solo
+        # INSERT ... ON CONFLICT (ver 'upsert_dataframe_por_copy').
+        print(f"Info: Ejecutando UPSERT para {len(df_terceros)} registros...")
+        resultado = upsert_dataframe_por_copy(conn, df_terceros, table_name, clave_conflicto)
+        if resultado["duplicadas"]:
+            print(f"ADVERTENCIA: {resultado['duplicadas']} registros con NIT repetido en la extracción; se conservó el último de cada NIT.")
+        print(f"¡ÉXITO! Terceros en '{table_name}': {resultado['insertadas']} insertados, "
+              f"{resultado['actualizadas']} actualizados y {resultado['sin_cambios']} sin cambios.")
 
     except Exception as e:
         print(f"ERROR CRÍTICO durante la carga UPSERT en '{table_name}': {e}")
@@ -131,23 +89,31 @@ def cargar_terceros_db(df_terceros, conn):
         raise
 
 
-def ejecutar_fase_1_terceros():
+def ejecutar_fase_1_terceros(desde_landing=False):
     """
     Orquesta la extracción, transformación y carga (UPSERT) de los datos de Terceros.
+    :param desde_landing: True para cargar la última foto guardada en la zona de aterrizaje
+                          (Parquet) sin consultar la API.
     """
-    # Importamos get_db_connection aquí (si no está importado globalmente)
-    from utils.db_utils import get_db_connection
-    
     print("\n=== INICIO FASE 1: ACTUALIZACIÓN DE TERCEROS ===")
     
     # 1. Extracción y Transformación
     try:
         # Debes reemplazar 'extraer_y_transformar_terceros' con el nombre de tu función de extracción
-        df_terceros = extraer_clientes_api() 
+        if desde_landing:
+            df_terceros = leer_ultima_foto("terceros")
+        else:
+            df_terceros = extraer_clientes_api() 
     except Exception as e:
         print(f"ERROR: Falló la extracción y transformación de Terceros: {e}")
         return # Salir si la extracción falla
 
+    if not desde_landing:
+        try:
+            escribir_landing(df_terceros, "terceros", "empresa_ter")
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo guardar la foto de terceros en la zona de aterrizaje: {e}. La carga a la BD continúa.")
+
     if df_terceros is not None and not df_terceros.empty:
         # 2. Conexión y Carga (Upsert)
         conn = get_db_connection()
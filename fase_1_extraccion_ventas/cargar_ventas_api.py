@@ -1,116 +1,391 @@
 import pandas as pd
-import numpy as np
 import requests
 import os
 import sys
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta, datetime
+import psycopg2
 from psycopg2 import extras
 
 # --- Configuración del Proyecto ---
 # Añadimos la ruta raíz del proyecto al path de python para poder importar nuestro módulos
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config #Importamos nuestras configuraciones (URLs, credenciales)
-from utils.db_utils import get_db_connection, execute_query, delete_by_date_range # Importamos nuestras funciones de base de datos
+from utils.db_utils import get_db_connection, copy_dataframe_to_db, insert_dataframe_to_db # Importamos nuestras funciones de base de datos
+from utils.json_stream import iterar_lotes_json, RespuestaDemasiadoGrandeError
+from utils import cache_api, cliente_tns
+from utils.diario_extraccion import DiarioExtraccion, existe_checkpoint
+from utils.landing import escribir_landing, leer_landing
+from utils.categoricas import compactar_categoricas
+from fase_1_extraccion_ventas.modelo_ventas import (
+    columnas_ventas_detalladas, tabla_hechos_ventas, es_modelo_normalizado, crear_modelo_normalizado,
+    preparar_staging_hechos, normalizar_ventas_detalladas
+)
+from utils.particiones import (
+    existe_tabla, es_tabla_particionada, crear_tabla_particionada, asegurar_particiones, meses_del_rango,
+    nombre_particion, crear_tabla_de_intercambio, crear_indices_como_padre, intercambiar_particion, analizar_tablas
+)
+from utils.migraciones import crear_indices, exigir_migracion, MigracionPendienteError
+from fase_2_ajustes_db.registro_ajustes import reaplicar_ajustes
 
-def extraer_ventas_api(fecha_desde, fecha_hasta):
+# Llaves de la API que conservamos y su nombre en la tabla 'ventas_detalladas'.
+mapeo_columnas_api = {
+    'nittri': 'nit','nombre':'nombre', 'numfactura':'factura', 'formapago': 'forma_pago', 'fecha':'fecha',
+    'codigo': 'codigo', 'descrip':'descripcion', 'codgrupart':'codigo_grupo_art', 'nomgrupart':'nombre_grupo_art', 'unidad':'und',
+    'cant':'cant', 'prebase':'valor_base', 'preiva': 'iva', 'porciva':'porc_iva', 'descuento':'descuento',
+    'preciotot':'valor', 'listaprecio': 'lista_precio', 'preciolista': 'precio', 'preciolistamayor':'precio_mayor', 'codlinea':'cod_linea',
+    'deslinea':'desc_linea', 'codcliente':'cod_cliente','nomclasifica':'clasificacion', 'nomclasifica2':'clasificacion_py','zona':'zona',
+    'teleF1':'telefono', 'ciudad':'ciudad', 'observ':'observaciones', 'direcC1':'direccion', 'codparcela':'cod_area',
+    'nomaread': 'nom_area', 'codvendedor': 'cod_vendedor', 'nomvendedor':'nom_vendedor', 'nitdes':'cod_despachar', 'despachara':'cliente_despachar',
+    'marca':'marca', 'referencia':'referencia', 'barrio':'barrio', 'descripciondep':'dep_articulo', 'recargo':'recargo',
+    'fecvenlote': 'serial', 'peso':'peso_bruto', 'factor':'factor','supervisor':'supervisor', 'costopromedio':'costo',
+    'motivodevolucion':'motivo_dev', 'pedido':'pedido_tiendapp', 'codbodega': 'bodega'
+}
+
+# Tabla con la huella del contenido de cada (empresa, fecha) cargada en 'ventas_detalladas'
+tabla_huellas_ventas = "ventas_huellas_dia"
+
+# Textos con pocos valores distintos que se repiten en todas las filas: se manejan como
+# categóricas (un código por fila) durante la extracción, la carga y el exporte.
+columnas_categoricas_ventas = [
+    'empresa', 'zona', 'ciudad', 'nom_vendedor', 'supervisor', 'marca',
+    'desc_linea', 'clasificacion', 'forma_pago', 'bodega',
+]
+
+class VentanaDemasiadoGrandeError(Exception):
+    """La respuesta de una ventana supera config.ventas_max_bytes_ventana."""
+
+def generar_ventanas_fechas(fecha_desde, fecha_hasta, tamano_ventana=None):
     """
-    Paso 1: Extracción
-    Nos conectamos a la API de TNS y extraemos los datos de ventas crudos para un rango de fechas
+    Divide el rango [fecha_desde, fecha_hasta] (strings YYYY-MM-DD) en ventanas consecutivas
+    sin solapamiento. tamano_ventana: 'dia', 'semana' o un número de días (por defecto el del config).
+    Retorna una lista de tuplas (date_inicio, date_fin), ambas inclusivas.
     """
-    print(f"Info: Iniciando extracción de ventas desde {fecha_desde} hasta {fecha_hasta}...")
-    #Creamos la lista vacía para guardar los datos de cada empresa
-    lista_dfs_empresas = []
-    mapeo_columnas_api = {
-        'nittri': 'nit','nombre':'nombre', 'numfactura':'factura', 'formapago': 'forma_pago', 'fecha':'fecha',
-        'codigo': 'codigo', 'descrip':'descripcion', 'codgrupart':'codigo_grupo_art', 'nomgrupart':'nombre_grupo_art', 'unidad':'und',
-        'cant':'cant', 'prebase':'valor_base', 'preiva': 'iva', 'porciva':'porc_iva', 'descuento':'descuento',
-        'preciotot':'valor', 'listaprecio': 'lista_precio', 'preciolista': 'precio', 'preciolistamayor':'precio_mayor', 'codlinea':'cod_linea',
-        'deslinea':'desc_linea', 'codcliente':'cod_cliente','nomclasifica':'clasificacion', 'nomclasifica2':'clasificacion_py','zona':'zona',
-        'teleF1':'telefono', 'ciudad':'ciudad', 'observ':'observaciones', 'direcC1':'direccion', 'codparcela':'cod_area',
-        'nomaread': 'nom_area', 'codvendedor': 'cod_vendedor', 'nomvendedor':'nom_vendedor', 'nitdes':'cod_despachar', 'despachara':'cliente_despachar',
-        'marca':'marca', 'referencia':'referencia', 'barrio':'barrio', 'descripciondep':'dep_articulo', 'recargo':'recargo',
-        'fecvenlote': 'serial', 'peso':'peso_bruto', 'factor':'factor','supervisor':'supervisor', 'costopromedio':'costo',
-        'motivodevolucion':'motivo_dev', 'pedido':'pedido_tiendapp', 'codbodega': 'bodega'
+    tamano_ventana = tamano_ventana or config.ventas_ventana
+    dias_por_ventana = {"dia": 1, "semana": 7}.get(str(tamano_ventana).lower())
+    if dias_por_ventana is None:
+        dias_por_ventana = int(tamano_ventana)
+    if dias_por_ventana < 1:
+        raise ValueError(f"El tamaño de ventana debe ser de al menos un día: {tamano_ventana}")
+
+    inicio = datetime.strptime(fecha_desde, "%Y-%m-%d").date()
+    fin = datetime.strptime(fecha_hasta, "%Y-%m-%d").date()
+    ventanas = []
+    while inicio <= fin:
+        fin_ventana = min(inicio + timedelta(days=dias_por_ventana - 1), fin)
+        ventanas.append((inicio, fin_ventana))
+        inicio = fin_ventana + timedelta(days=1)
+    return ventanas
+
+def _pedir_ventana_ventas(empresa_config, params_ventas):
+    """
+    Hace el GET de una ventana en streaming y valida el estado y el tamaño anunciado.
+    Retorna la respuesta sin leer el cuerpo.
+    Lanza VentanaDemasiadoGrandeError si el servidor o el Content-Length indican una ventana muy grande.
+    """
+    response = cliente_tns.consultar(empresa_config, "ventas", params_ventas, timeout=config.ventas_timeout_ventana)
+    if response.status_code in (413, 504):
+        # Payload demasiado grande o timeout del gateway: se trata igual que una ventana grande
+        response.close()
+        raise VentanaDemasiadoGrandeError(f"HTTP {response.status_code}")
+    if not response.ok:
+        response.content # Cargamos el cuerpo del error para poder imprimirlo después
+        response.raise_for_status()
+    tamano_anunciado = int(response.headers.get("Content-Length") or 0)
+    if tamano_anunciado > config.ventas_max_bytes_ventana:
+        response.close()
+        raise VentanaDemasiadoGrandeError(f"{tamano_anunciado} bytes")
+    return response
+
+def _vigencia_cache_ventana(fin):
+    """Las ventanas que terminaron hace tiempo ya no cambian: en la caché no vencen."""
+    if fin < date.today() - timedelta(days=config.api_cache_dias_ventana_cerrada):
+        return 'sin_vencimiento'
+    return None # La vigencia configurada para 'ventas'
+
+def _consultar_ventana_ventas(empresa_config, inicio, fin):
+    """
+    Hace UNA llamada a ObtenerVentasDetallada para la ventana [inicio, fin]
+    (o la lee de la caché local si está activada y la ventana está guardada).
+    La respuesta se lee en streaming y cada registro conserva solo las llaves de
+    'mapeo_columnas_api' mientras se parsea, así nunca está el JSON completo en memoria.
+    Retorna un DataFrame con los registros crudos (puede ser vacío).
+    Lanza VentanaDemasiadoGrandeError / RespuestaDemasiadoGrandeError si el cuerpo supera el límite.
+    """
+    params_ventas = {
+        # La API espera las fechas en formato "MM/DD/YYYY"
+        "fechaInicial": inicio.strftime("%m/%d/%Y"),
+        "fechaFin": fin.strftime("%m/%d/%Y"),
+        "codigosucursal": "00"
     }
+    nombre_empresa = empresa_config["nombre_corto"]
+    response = cache_api.leer("ventas", nombre_empresa, params_ventas)
+    if response is None:
+        response = cache_api.grabar(
+            _pedir_ventana_ventas(empresa_config, params_ventas),
+            "ventas", nombre_empresa, params_ventas, ttl=_vigencia_cache_ventana(fin)
+        )
+    with response:
+        # Cada lote se convierte a DataFrame de inmediato; la lista de diccionarios se libera
+        dfs_lotes = [
+            pd.DataFrame(lote)
+            for lote in iterar_lotes_json(
+                response, columnas=mapeo_columnas_api.keys(), max_bytes=config.ventas_max_bytes_ventana
+            )
+        ]
+    if not dfs_lotes:
+        return pd.DataFrame()
+    return pd.concat(dfs_lotes, ignore_index=True) if len(dfs_lotes) > 1 else dfs_lotes[0]
 
-    # Hacemos un bucle para procesar cada empresa
-    for empresa_config in config.api_config_tns:
-        nombre_empresa = empresa_config["nombre_corto"]
-        #Obtenemos las URLs de acceso y ventas desde el config
-        url_login = config.api_url["login"]
-        url_ventas = config.api_url["ventas"]
+def _extraer_ventana_adaptativa(empresa_config, inicio, fin, es_primera):
+    """
+    Extrae una ventana y, si hace timeout o es demasiado grande, la parte en dos mitades
+    y las extrae por separado (recursivamente, hasta llegar a un solo día).
+    Retorna un DataFrame con las filas cuya fecha cae DENTRO de la ventana; así, aunque la API
+    devuelva registros de los bordes, cada fila pertenece a una sola ventana y no se duplica.
+    Las filas sin fecha válida solo se conservan en la primera ventana del rango ('es_primera').
+    """
+    nombre_empresa = empresa_config["nombre_corto"]
+    try:
+        df_ventana = _consultar_ventana_ventas(empresa_config, inicio, fin)
+    except (requests.Timeout, VentanaDemasiadoGrandeError, RespuestaDemasiadoGrandeError) as e:
+        if inicio >= fin:
+            raise # Un solo día ya no se puede partir más
+        mitad = inicio + (fin - inicio) // 2
+        print(f"[{nombre_empresa}] Ventana {inicio} a {fin} falló ({type(e).__name__}: {e}). Partiendo en dos...")
+        df_izquierda = _extraer_ventana_adaptativa(empresa_config, inicio, mitad, es_primera)
+        df_derecha = _extraer_ventana_adaptativa(empresa_config, mitad + timedelta(days=1), fin, False)
+        partes = [df for df in (df_izquierda, df_derecha) if not df.empty]
+        return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
 
-        print(f"--- Iniciando proceso de extracción para: {nombre_empresa} ---")
+    if df_ventana.empty or 'fecha' not in df_ventana.columns:
+        return df_ventana
 
-        try:
-            # Implementación flujo de autenticación
-            # Paso 1: Obtener el token de acceso
-            print("1. Solicitando token de acceso...")
-            login_payload = {
-                "codigoEmpresa": empresa_config["empresa_tns"],
-                "nombreUsuario": empresa_config["usuario_tns"],
-                "contrasenia": empresa_config["password_tns"]                
-            }
-            login_response = requests.post(url_login,json=login_payload,timeout=60)
-            login_response.raise_for_status()
-            token = login_response.json()["data"]
-            print("Token obtenido con éxito.")
-
-            # Paso 2: Consultar ventas con el token
-            print("2. Solicitando datos de ventas.")
-            # Preparamos las cabeceras (headers) con el token Bearer
-            headers = {
-                "Authorization": f"Bearer {token}"
-            }
-            #Preparamos los parámetros de la URL (params)
-            #params_ventas = {
-            #    "fechaInicial": datetime.strptime(fecha_desde, "%Y-%m-%d").strftime("%m/%d/%Y"),
-            #    "fechaFin": datetime.strptime(fecha_hasta, "%Y-%m-%d").strftime("%m/%d/%Y"),
-            #    "codigosucursal": "00"
-            #}
-
-            # Aseguramos que las fechas enviadas a la API estén en el formato que la API espera (ej. "MM/DD/YYYY")
-            fecha_inicial_api_str = datetime.strptime(fecha_desde, "%Y-%m-%d").strftime("%m/%d/%Y")
-            fecha_fin_api_str = datetime.strptime(fecha_hasta, "%Y-%m-%d").strftime("%m/%d/%Y")
-
-            params_ventas = {
-                "fechaInicial": fecha_inicial_api_str,
-                "fechaFin": fecha_fin_api_str,
-                "codigosucursal": "00"
-            }
-
-            #Hacemos la llamada a la API
-            response = requests.get(url_ventas, headers=headers, params=params_ventas, timeout=600)
-            response.raise_for_status()
-            datos_api_raw = response.json()
-
-            #Ajustamos al formato de respuesta (dict['data'])
-            if isinstance(datos_api_raw, dict) and "data" in datos_api_raw:
-                lista_ventas = datos_api_raw.get("data")
-                
-                if not lista_ventas:
-                    print(f"Info: No se encontraron registros de ventas para {nombre_empresa} en este período.")
-                    continue
+    fechas = pd.to_datetime(df_ventana['fecha'], format="%d/%m/%Y", errors='coerce')
+    dentro = fechas.between(pd.Timestamp(inicio), pd.Timestamp(fin))
+    if es_primera:
+        dentro |= fechas.isna()
+    descartadas = int((~dentro).sum())
+    if descartadas:
+        print(f"[{nombre_empresa}] Info: {descartadas} registros fuera de la ventana {inicio} a {fin} descartados (duplicados de ventanas vecinas).")
+        df_ventana = df_ventana[dentro.to_numpy()].reset_index(drop=True)
+    print(f"[{nombre_empresa}] Ventana {inicio} a {fin}: {len(df_ventana)} registros.")
+    return df_ventana
 
-                df_empresa = pd.DataFrame(lista_ventas)
+def _extraer_ventana_con_diario(empresa_config, inicio, fin, es_primera, diario):
+    """
+    Extrae una ventana de las programadas, salvo que ya esté en el diario de la corrida.
+    Al terminar, la ventana queda guardada en el diario para poder reanudar.
+    """
+    nombre_empresa = empresa_config["nombre_corto"]
+    if diario is not None:
+        df_ventana = diario.leer(nombre_empresa, "ventas", inicio, fin)
+        if df_ventana is not None:
+            print(f"[{nombre_empresa}] Ventana {inicio} a {fin}: {len(df_ventana)} registros (checkpoint).")
+            return df_ventana
+    df_ventana = _extraer_ventana_adaptativa(empresa_config, inicio, fin, es_primera)
+    if diario is not None:
+        diario.registrar(nombre_empresa, "ventas", inicio, fin, df_ventana)
+    return df_ventana
 
-                if not df_empresa.empty:
-                    df_empresa['empresa'] = nombre_empresa
-                    lista_dfs_empresas.append(df_empresa)
-                    print(f"¡Éxito! Se extrajeron {len(df_empresa)} registros de ventas de {nombre_empresa}.")
-            else:
-                print(f"Advertencia: La respuesta de la API para {nombre_empresa} no tuvo el formato esperado (sin clave 'data')")
-        except Exception as e:
-            print(f"Error al procesar {nombre_empresa}: {e}")
-            #Imprimimos más detalles si es un error de la API
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"Respuesta del servidor: {e.response.text}")
+def _extraer_ventas_empresa(empresa_config, fecha_desde, fecha_hasta, diario=None):
+    """
+    Extrae las ventas crudas de UNA empresa consultando la API por ventanas de fechas.
+    El login lo hace el cliente compartido (utils.cliente_tns) la primera vez que se necesita.
+    Las ventanas (config.ventas_ventana) se consultan en paralelo y se unen en orden.
+    Con 'diario' las ventanas ya extraídas en una corrida anterior se leen del disco.
+    Retorna el DataFrame de la empresa (con la columna 'empresa') o None si no hubo datos.
+    Los errores se relanzan para que el orquestador los registre sin afectar a las demás empresas.
+    """
+    nombre_empresa = empresa_config["nombre_corto"]
+    print(f"--- Iniciando proceso de extracción para: {nombre_empresa} ---")
+
+    # Consultar ventas una ventana de fechas a la vez
+    ventanas = generar_ventanas_fechas(fecha_desde, fecha_hasta)
+    print(f"[{nombre_empresa}] Solicitando datos de ventas en {len(ventanas)} ventanas.")
+
+    max_workers = max(1, min(config.ventas_max_workers_ventanas, len(ventanas)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [
+            executor.submit(_extraer_ventana_con_diario, empresa_config, inicio, fin, i == 0, diario)
+            for i, (inicio, fin) in enumerate(ventanas)
+        ]
+        # Unimos en el orden de las ventanas; si una ventana falla, falla la empresa completa
+        dfs_ventanas = [futuro.result() for futuro in futuros]
+
+    dfs_ventanas = [df for df in dfs_ventanas if not df.empty]
+    if not dfs_ventanas:
+        print(f"Info: No se encontraron registros de ventas para {nombre_empresa} en este período.")
+        return None
+
+    df_empresa = pd.concat(dfs_ventanas, ignore_index=True)
+    df_empresa['empresa'] = nombre_empresa
+    print(f"¡Éxito! Se extrajeron {len(df_empresa)} registros de ventas de {nombre_empresa}.")
+    return df_empresa
+
+def _procesar_empresa_ventas(empresa_config, fecha_desde, fecha_hasta, diario=None):
+    """
+    Ejecuta la extracción de una empresa midiendo su tiempo y capturando su error.
+    Retorna un diccionario de resultado; nunca lanza excepciones, así una empresa
+    que falla no cancela a las demás.
+    """
+    nombre_empresa = empresa_config["nombre_corto"]
+    inicio = time.perf_counter()
+    resultado = {"empresa": nombre_empresa, "df": None, "error": None}
+    try:
+        resultado["df"] = _extraer_ventas_empresa(empresa_config, fecha_desde, fecha_hasta, diario)
+    except Exception as e:
+        print(f"Error al procesar {nombre_empresa}: {e}")
+        #Imprimimos más detalles si es un error de la API
+        if hasattr(e, 'response') and e.response is not None:
+            print(f"Respuesta del servidor: {e.response.text}")
+        resultado["error"] = str(e)
+        if diario is not None:
+            diario.registrar_falla(nombre_empresa, "ventas", e)
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+def _imprimir_resumen_extraccion(resultados, segundos_totales):
+    """Imprime los tiempos y registros extraídos por empresa."""
+    print("\n--- Resumen de extracción por empresa ---")
+    for resultado in resultados:
+        registros = resultado.get("registros", len(resultado["df"]) if resultado["df"] is not None else 0)
+        estado = "ERROR" if resultado["error"] else "OK"
+        print(f"  {resultado['empresa']:<8} {estado:<6} {registros:>9} registros  {resultado['segundos']:>8.1f} s")
+    print(f"  Tiempo total de extracción: {segundos_totales:.1f} s")
+
+def extraer_ventas_api(fecha_desde, fecha_hasta, concurrente=True, diario=None):
+    """
+    Paso 1: Extracción
+    Nos conectamos a la API de TNS y extraemos los datos de ventas crudos para un rango de fechas.
+    :param concurrente: True para extraer todas las empresas en paralelo (un hilo por empresa,
+                        limitado por config.api_max_workers); False para hacerlo una por una.
+    :param diario: DiarioExtraccion de la corrida; cada ventana terminada queda guardada en él
+                   y las que ya estaban no se vuelven a pedir a la API.
+    """
+    print(f"Info: Iniciando extracción de ventas desde {fecha_desde} hasta {fecha_hasta}...")
+
+    inicio_total = time.perf_counter()
+    empresas = config.api_config_tns
+
+    if concurrente and len(empresas) > 1:
+        # Un hilo por empresa (acotado por config). Cada hilo captura su propio error,
+        # así que una empresa que falla no cancela a las demás.
+        max_workers = max(1, min(config.api_max_workers, len(empresas)))
+        print(f"Info: Extracción concurrente con {max_workers} hilos para {len(empresas)} empresas.")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = [
+                executor.submit(_procesar_empresa_ventas, empresa_config, fecha_desde, fecha_hasta, diario)
+                for empresa_config in empresas
+            ]
+            # Conservamos el orden del config para que el consolidado sea idéntico al secuencial
+            resultados = [futuro.result() for futuro in futuros]
+    else:
+        # Hacemos un bucle para procesar cada empresa
+        resultados = [
+            _procesar_empresa_ventas(empresa_config, fecha_desde, fecha_hasta, diario)
+            for empresa_config in empresas
+        ]
+
+    _imprimir_resumen_extraccion(resultados, time.perf_counter() - inicio_total)
+
+    #Lista con los datos de cada empresa que sí trajo registros
+    lista_dfs_empresas = [r["df"] for r in resultados if r["df"] is not None]
 
     if not lista_dfs_empresas:
         print("Info: No se encontraron ventas para el periodo especificado.")
         return None
     
     df_consolidado = pd.concat(lista_dfs_empresas, ignore_index=True)
+    print("Info: Transformando tipos de datos...")
+    df_final = transformar_ventas(df_consolidado, reportar_memoria=True)
+
+    print(f"\nInfo: Extracción y Transformación completada. {len(df_final)} registros procesados.")
+    print(f"Info: {len(df_final.columns)} columnas preparadas para la carga.")
+    
+    # Devolver el DataFrame final, limpio, filtrado y TRANSFORMADO
+    return df_final
+
+def iterar_ventas_api(fecha_desde, fecha_hasta, diario=None):
+    """
+    Versión por lotes de la extracción (config.ventas_streaming): en lugar de unir todas las
+    empresas en un solo DataFrame, entrega cada ventana (empresa, inicio, fin) ya transformada
+    para cargarla y liberarla. Así la memoria queda acotada por el tamaño de una ventana
+    (config.ventas_ventana / ventas_max_bytes_ventana) por las ventanas en vuelo, no por el rango.
+    Cada ventana se guarda también en la zona de aterrizaje.
+    Genera (df, (empresas, inicio, fin)) en el orden de las empresas del config; las ventanas vacías
+    también se entregan (sus días quedan sin ventas). Las ventanas que fallan se reportan, se anotan
+    en el diario y no se entregan: esos días no se tocan en la BD.
+    """
+    print(f"Info: Iniciando extracción de ventas por lotes desde {fecha_desde} hasta {fecha_hasta}...")
+    inicio_total = time.perf_counter()
+    ventanas = generar_ventanas_fechas(fecha_desde, fecha_hasta)
+    unidades = [
+        (empresa_config, inicio, fin, i == 0)
+        for empresa_config in config.api_config_tns
+        for i, (inicio, fin) in enumerate(ventanas)
+    ]
+    max_workers = max(1, config.api_max_workers * config.ventas_max_workers_ventanas)
+    max_en_vuelo = 2 * max_workers # Ventanas descargadas o en descarga que todavía no se han cargado
+    print(f"Info: {len(unidades)} ventanas ({len(ventanas)} por empresa) con {max_workers} hilos, máximo {max_en_vuelo} en memoria.")
+
+    resultados = {
+        empresa_config["nombre_corto"]: {"empresa": empresa_config["nombre_corto"], "df": None, "error": None, "registros": 0, "segundos": 0.0}
+        for empresa_config in config.api_config_tns
+    }
+
+    def extraer_unidad(empresa_config, inicio, fin, es_primera):
+        inicio_unidad = time.perf_counter()
+        try:
+            return _extraer_ventana_con_diario(empresa_config, inicio, fin, es_primera, diario), None, time.perf_counter() - inicio_unidad
+        except Exception as e:
+            return None, e, time.perf_counter() - inicio_unidad
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pendientes = deque()
+        siguiente = 0
+        while siguiente < len(unidades) or pendientes:
+            while siguiente < len(unidades) and len(pendientes) < max_en_vuelo:
+                unidad = unidades[siguiente]
+                pendientes.append((unidad, executor.submit(extraer_unidad, *unidad)))
+                siguiente += 1
+            (empresa_config, inicio, fin, es_primera), futuro = pendientes.popleft()
+            df_ventana, error, segundos = futuro.result()
+            nombre_empresa = empresa_config["nombre_corto"]
+            resultado = resultados[nombre_empresa]
+            resultado["segundos"] += segundos
+            if error is not None:
+                print(f"Error al procesar {nombre_empresa} ventana {inicio} a {fin}: {error}")
+                if hasattr(error, 'response') and error.response is not None:
+                    print(f"Respuesta del servidor: {error.response.text}")
+                resultado["error"] = str(error)
+                if diario is not None:
+                    diario.registrar_falla(nombre_empresa, "ventas", error)
+                continue
+
+            df_lote = None
+            if not df_ventana.empty:
+                df_ventana['empresa'] = nombre_empresa
+                df_lote = transformar_ventas(df_ventana)
+                resultado["registros"] += len(df_lote)
+                try:
+                    escribir_landing(df_lote, "ventas", "empresa", "fecha", rango=(str(inicio), str(fin)), incluir_sin_fecha=es_primera)
+                except Exception as e:
+                    print(f"ADVERTENCIA: No se pudo guardar en la zona de aterrizaje la ventana {inicio} a {fin} de {nombre_empresa}: {e}. La carga a la BD continúa.")
+            del df_ventana
+            yield df_lote, ({nombre_empresa}, inicio, fin)
+
+    _imprimir_resumen_extraccion(list(resultados.values()), time.perf_counter() - inicio_total)
+
+def transformar_ventas(df_consolidado, reportar_memoria=False):
+    """
+    Filtra, renombra y convierte los tipos de las ventas crudas de la API (con la columna 'empresa')
+    a las columnas de 'ventas_detalladas'. Sirve igual para todas las empresas juntas o para un lote.
+    :param reportar_memoria: True para imprimir cuánta memoria ahorran las columnas categóricas.
+    """
     # 1. Definir las columnas que queremos del API (las "llaves" del mapa)
     columnas_api_deseadas = list(mapeo_columnas_api.keys())
     # 2. Crear la lista final de columnas a MANTENER
@@ -131,8 +406,6 @@ def extraer_ventas_api(fecha_desde, fecha_hasta):
     # 5. AHORA, renombrar las columnas a sus nombres de DB
     df_final = df_filtrado.rename(columns=mapeo_columnas_api)
     
-    print("Info: Transformando tipos de datos...")
-
     # 1. Columnas que deben ser INTEGER (Enteros)
     #    (Revisa esta lista. 'cant' es casi seguro el del error '3.00')
     columnas_integer = ['cant', 'porc_iva', 'factor', 'lista_precio'] 
@@ -184,78 +457,439 @@ def extraer_ventas_api(fecha_desde, fecha_hasta):
             # que psycopg2 entiende como NULL de la base de datos.
             df_final[col] = df_final[col].replace('<NA>', None)
 
+    # 5. Columnas CATEGÓRICAS (textos repetidos: empresa, zona, vendedor...)
+    #    La huella de cada día no cambia: pandas hashea igual una categórica que el texto.
+    compactar_categoricas(df_final, columnas_categoricas_ventas, reportar=reportar_memoria)
 
-    print(f"\nInfo: Extracción y Transformación completada. {len(df_final)} registros procesados.")
-    print(f"Info: {len(df_final.columns)} columnas preparadas para la carga.")
-    
-    # Devolver el DataFrame final, limpio, filtrado y TRANSFORMADO
     return df_final
 
-def cargar_ventas_db(df_datos, conn, table_name, fecha_desde, fecha_hasta):
+def asegurar_tabla_ventas(cursor, table_name):
+    """
+    Crea la tabla de ventas si no existe: 'ventas_detalladas' particionada por mes o, con
+    config.ventas_modelo_normalizado, el modelo normalizado ('ventas_hechos' particionada por mes,
+    las dimensiones y la vista 'ventas_detalladas'; ver modelo_ventas).
+    Retorna (tabla_fisica, particionada): la tabla donde se cargan las filas y si está particionada.
+    Una 'ventas_detalladas' sin particionar se sigue usando con el borrado por rango hasta
+    migrarla desde el menú de mantenimiento.
+    """
+    if not existe_tabla(cursor, table_name):
+        if config.ventas_modelo_normalizado:
+            print(f"Info: Creando '{table_name}' (vista sobre '{tabla_hechos_ventas}' particionada por mes y sus dimensiones)...")
+            crear_modelo_normalizado(cursor, table_name)
+            return tabla_hechos_ventas, True
+        print(f"Info: Creando '{table_name}' particionada por mes...")
+        crear_tabla_particionada(cursor, table_name, columnas_ventas_detalladas, 'fecha')
+        crear_indices(cursor, [table_name])
+        return table_name, True
+    if es_modelo_normalizado(cursor, table_name):
+        return tabla_hechos_ventas, True
+    particionada = es_tabla_particionada(cursor, table_name)
+    if not particionada:
+        print(f"ADVERTENCIA: '{table_name}' no está particionada; se usará el borrado por rango. "
+              f"Use la opción de mantenimiento 'Migrar ventas a tabla particionada' del menú.")
+    if config.ventas_modelo_normalizado:
+        print(f"Info: '{table_name}' es una tabla sin normalizar. Use la opción de mantenimiento "
+              f"'Normalizar ventas' del menú para pasar a las tablas de dimensiones.")
+    return table_name, particionada
+
+def migrar_ventas_a_particiones(conn, table_name="ventas_detalladas"):
+    """
+    Convierte una 'ventas_detalladas' sin particionar en una tabla particionada por mes.
+    La tabla original se conserva renombrada como '<tabla>_sin_particionar' para revisarla
+    y borrarla a mano cuando se confirme que la migración quedó bien.
+    """
+    tabla_anterior = f"{table_name}_sin_particionar"
+    try:
+        with conn.cursor() as cursor:
+            if es_tabla_particionada(cursor, table_name) or es_modelo_normalizado(cursor, table_name):
+                print(f"Info: '{table_name}' ya está particionada. No hay nada que migrar.")
+                return
+            if not existe_tabla(cursor, table_name):
+                asegurar_tabla_ventas(cursor, table_name)
+                conn.commit()
+                return
+            if existe_tabla(cursor, tabla_anterior):
+                raise ValueError(f"Ya existe '{tabla_anterior}'. Revísela y bórrela antes de migrar de nuevo.")
+
+            print(f"Info: Migrando '{table_name}' a tabla particionada por mes...")
+            cursor.execute(f'ALTER TABLE public."{table_name}" RENAME TO "{tabla_anterior}";')
+            crear_tabla_particionada(cursor, table_name, columnas_ventas_detalladas, 'fecha')
+            cursor.execute(f'SELECT min(fecha), max(fecha) FROM public."{tabla_anterior}";')
+            fecha_minima, fecha_maxima = cursor.fetchone()
+            if fecha_minima:
+                asegurar_particiones(cursor, table_name, fecha_minima, fecha_maxima)
+            columnas = ', '.join(f'"{col}"' for col, _ in columnas_ventas_detalladas)
+            cursor.execute(f'INSERT INTO public."{table_name}" ({columnas}) SELECT {columnas} FROM public."{tabla_anterior}";')
+            print(f"Info: {cursor.rowcount} registros copiados a la tabla particionada.")
+            crear_indices(cursor, [table_name])
+        conn.commit()
+        analizar_tablas(conn, [table_name])
+        print(f"¡ÉXITO! '{table_name}' quedó particionada. La tabla original quedó como '{tabla_anterior}'.")
+    except Exception as e:
+        print(f"ERROR durante la migración de '{table_name}': {e}")
+        conn.rollback()
+        raise
+
+def calcular_huellas_por_dia(df_datos):
+    """
+    Calcula una huella (sha256) del contenido extraído para cada (empresa, fecha).
+    No depende del orden de las filas: los hashes de fila se ordenan antes de combinarlos.
+    Retorna un DataFrame con las columnas empresa, fecha (date), huella y registros.
+    Las filas sin fecha no tienen día y quedan fuera de las huellas.
+    """
+    df_con_fecha = df_datos[df_datos['fecha'].notna()]
+    claves = pd.DataFrame({
+        'empresa': df_con_fecha['empresa'].to_numpy(),
+        'fecha': df_con_fecha['fecha'].dt.date.to_numpy(),
+        'hash_fila': pd.util.hash_pandas_object(df_con_fecha, index=False).to_numpy(),
+    })
+    claves = claves.sort_values(['empresa', 'fecha', 'hash_fila'])
+    huellas = [
+        (empresa, fecha, hashlib.sha256(grupo['hash_fila'].to_numpy().tobytes()).hexdigest(), len(grupo))
+        for (empresa, fecha), grupo in claves.groupby(['empresa', 'fecha'], sort=False)
+    ]
+    return pd.DataFrame(huellas, columns=['empresa', 'fecha', 'huella', 'registros'])
+
+def _leer_estado_dias(cursor, table_name, fecha_desde, fecha_hasta):
+    """
+    Lee una sola vez, para todo el rango, las huellas guardadas y los (empresa, fecha) que tienen filas.
+    Retorna (huellas_guardadas, dias_en_tabla).
+    """
+    cursor.execute(
+        f'SELECT empresa, fecha, huella FROM public."{tabla_huellas_ventas}" WHERE fecha BETWEEN %s AND %s;',
+        (fecha_desde, fecha_hasta)
+    )
+    huellas_guardadas = {(empresa, fecha): huella for empresa, fecha, huella in cursor.fetchall()}
+    cursor.execute(
+        f'SELECT DISTINCT empresa, fecha FROM public."{table_name}" WHERE fecha BETWEEN %s AND %s;',
+        (fecha_desde, fecha_hasta)
+    )
+    return huellas_guardadas, set(cursor.fetchall())
+
+def _dia_en_alcance(dia, alcance):
+    """alcance = (empresas o None para todas, fecha_desde, fecha_hasta) con fechas date."""
+    empresas, desde, hasta = alcance
+    return (empresas is None or dia[0] in empresas) and desde <= dia[1] <= hasta
+
+def _planear_dias(huellas, huellas_guardadas, dias_en_tabla, alcance, incremental):
+    """
+    Compara las huellas nuevas de un lote con las guardadas y decide qué días tocar.
+    Retorna (dias_a_eliminar, dias_a_cargar, dias_sin_cambios) como conjuntos de (empresa, fecha).
+    Un día se omite solo si su huella coincide Y sigue teniendo filas en la tabla.
+    Los días del alcance del lote que hay en la tabla pero ya no vienen en la extracción se
+    eliminan, igual que con el borrado completo del rango. Fuera del alcance no se toca nada.
+    """
+    huellas_nuevas = {
+        (empresa, fecha): huella
+        for empresa, fecha, huella in huellas[['empresa', 'fecha', 'huella']].itertuples(index=False)
+    }
+    dias_guardados = {dia for dia in (dias_en_tabla | set(huellas_guardadas)) if _dia_en_alcance(dia, alcance)}
+
+    dias_sin_cambios = set()
+    if incremental:
+        dias_sin_cambios = {
+            dia for dia, huella in huellas_nuevas.items()
+            if huellas_guardadas.get(dia) == huella and dia in dias_en_tabla
+        }
+    dias_a_eliminar = dias_guardados - dias_sin_cambios
+    dias_a_cargar = set(huellas_nuevas) - dias_sin_cambios
+    return dias_a_eliminar, dias_a_cargar, dias_sin_cambios
+
+def _eliminar_dias(cursor, tabla, dias, fecha_desde, fecha_hasta):
+    """Borra en UNA sentencia todas las filas de los (empresa, fecha) indicados. Retorna las filas borradas."""
+    if not dias:
+        return 0
+    empresas, fechas = zip(*dias)
+    cursor.execute(f"""
+        DELETE FROM public."{tabla}" t
+        USING unnest(%s::text[], %s::date[]) AS d(empresa, fecha)
+        WHERE t.empresa = d.empresa AND t.fecha = d.fecha
+        AND t.fecha BETWEEN %s AND %s;
+    """, (list(empresas), list(fechas), fecha_desde, fecha_hasta))
+    return cursor.rowcount
+
+def _cargar_filas(conn, df, table_name, metodo_carga):
+    """Carga el DataFrame con el método indicado, sin hacer commit. Retorna las filas cargadas."""
+    if metodo_carga == 'insert':
+        return insert_dataframe_to_db(conn, df, table_name, page_size=1000, commit=False)
+    if metodo_carga in ('copy_text', 'copy_binary'):
+        formato = metodo_carga.replace('copy_', '')
+        return copy_dataframe_to_db(conn, df, table_name, formato=formato, commit=False)
+    raise ValueError(f"Método de carga desconocido: {metodo_carga}")
+
+def _mes_de_fecha(meses, fecha):
+    """Retorna el mes (de meses_del_rango) que contiene la fecha, o None."""
+    for mes in meses:
+        if mes["inicio"] <= fecha < mes["fin_exclusivo"]:
+            return mes
+    return None
+
+def _preparar_tabla_staging(cursor, table_name):
+    """
+    (Re)crea la tabla de staging UNLOGGED con la estructura de la tabla destino.
+    Al ser UNLOGGED el COPY no escribe WAL; si el servidor se cae solo se pierde el staging,
+    que se vuelve a llenar en la siguiente carga.
+    Retorna el nombre de la tabla.
+    """
+    tabla_staging = f"{table_name}_staging"
+    cursor.execute(f'DROP TABLE IF EXISTS public."{tabla_staging}";')
+    cursor.execute(f'CREATE UNLOGGED TABLE public."{tabla_staging}" (LIKE public."{table_name}" INCLUDING DEFAULTS);')
+    return tabla_staging
+
+def _limpiar_tablas_temporales(conn, tablas):
+    """Borra las tablas de staging/intercambio que quedaron de una carga fallida o ya aplicada."""
+    try:
+        with conn.cursor() as cursor:
+            for tabla in tablas:
+                cursor.execute(f'DROP TABLE IF EXISTS public."{tabla}";')
+        conn.commit()
+    except psycopg2.Error as e:
+        print(f"ADVERTENCIA: No se pudieron borrar las tablas temporales {', '.join(tablas)}: {e}")
+        conn.rollback()
+
+def _meses_a_intercambiar(meses, cobertura, dias_en_tabla, dias_a_cargar, dias_sin_cambios):
+    """
+    Meses completos que se pueden reemplazar enteros por intercambio de partición:
+    ningún día omitido y todos los días del mes cubiertos por los lotes para cada empresa
+    que tenga (o vaya a tener) filas en el mes. Así, si la extracción de una empresa falló,
+    su mes no se reemplaza y sus filas se conservan.
+    """
+    meses_con_dias_omitidos = {(f.year, f.month) for _, f in dias_sin_cambios}
+    elegibles = []
+    for mes in meses:
+        if not mes["completo"] or (mes["anio"], mes["mes"]) in meses_con_dias_omitidos:
+            continue
+        en_mes = lambda dia: mes["inicio"] <= dia[1] < mes["fin_exclusivo"]
+        empresas = {e for e, f in dias_en_tabla | dias_a_cargar if en_mes((e, f))}
+        dias_mes = {mes["inicio"] + timedelta(days=n) for n in range((mes["fin_exclusivo"] - mes["inicio"]).days)}
+        if empresas and all(dias_mes <= (cobertura[None] | cobertura.get(e, set())) for e in empresas):
+            elegibles.append(mes)
+    return elegibles
+
+def cargar_ventas_db(df_datos, conn, table_name, fecha_desde, fecha_hasta, metodo_carga=None, incremental=None):
     """
     Paso 2: Carga (Versión BULK - Todas las empresas)
-    Implementa la estrategia de 'Borrar y Cargar' para sincronizar los datos.
-    Borra TODOS los registros del rango de fechas, sin filtrar por empresa.
+    Carga un DataFrame con las ventas de TODAS las empresas para el rango: los días del rango que
+    ya no vienen en la extracción se eliminan, de cualquier empresa. Ver 'cargar_ventas_por_lotes'.
     """
-    print(f"\nINFO: Iniciando carga BULK en '{table_name}' para el rango {fecha_desde} a {fecha_hasta}...")
-    
     if df_datos is None or df_datos.empty:
         print(f"ADVERTENCIA: No hay datos para cargar en '{table_name}'.")
         return
+    alcance = (None, pd.Timestamp(fecha_desde).date(), pd.Timestamp(fecha_hasta).date())
+    cargar_ventas_por_lotes([(df_datos, alcance)], conn, table_name, fecha_desde, fecha_hasta, metodo_carga, incremental)
+
+def cargar_ventas_por_lotes(lotes, conn, table_name, fecha_desde, fecha_hasta, metodo_carga=None, incremental=None):
+    """
+    Implementa la estrategia de 'Borrar y Cargar' para sincronizar los datos, por día:
+    cada (empresa, fecha) tiene una huella de su contenido guardada en la BD y solo se
+    borran y recargan los días cuya huella cambió. El resultado final es el mismo que
+    borrar el alcance de cada lote y volver a cargarlo.
+
+    :param lotes: iterable de (df, alcance), con alcance = (empresas o None, fecha_desde, fecha_hasta).
+                  Cada lote trae TODOS los días de su alcance (ej. una ventana de una empresa), así la
+                  memoria usada es la de un lote y no la del rango completo. Un día no puede quedar
+                  repartido entre dos lotes.
+
+    Con la tabla particionada por mes:
+    - Un mes completo en el que se reemplazan todos los días (de todas las empresas) se llena en
+      una tabla nueva y se intercambia con la partición actual (DETACH/ATTACH), sin DELETE ni VACUUM.
+    - En los rangos parciales el DELETE solo toca las particiones del rango.
+    - Al final se ejecuta ANALYZE sobre las particiones afectadas.
+
+    La carga se hace en dos transacciones:
+    1. Preparación: cada lote se copia (COPY, la parte lenta) a una tabla de staging UNLOGGED
+       y se libera; al final se llenan las tablas de intercambio desde el staging. Aquí no se
+       toca 'ventas_detalladas', así que las consultas y la Fase 3 no se bloquean.
+    2. Aplicación: DELETE de los días + INSERT ... SELECT desde el staging + huellas + intercambio
+       de particiones + ajustes registrados de la Fase 2 de los días recargados, en una
+       transacción corta. Se reporta cuánto duraron los bloqueos.
+    Si algo falla en la aplicación no se pierde ningún día.
+    :param metodo_carga: 'copy_text' (por defecto), 'copy_binary' o 'insert' (execute_values).
+                         Si es None se usa config.ventas_metodo_carga.
+    :param incremental: False fuerza el reemplazo de todos los días del rango.
+                        Si es None se usa config.ventas_carga_incremental.
+    """
+    metodo_carga = metodo_carga or config.ventas_metodo_carga
+    incremental = config.ventas_carga_incremental if incremental is None else incremental
+    print(f"\nINFO: Iniciando carga BULK ({metodo_carga}, {'incremental' if incremental else 'completa'}) en '{table_name}' para el rango {fecha_desde} a {fecha_hasta}...")
 
+    tablas_afectadas = set()
+    tablas_temporales = []
     try:
-        # -----------------------------------------------------------------
-        # Paso 1: Borrar los datos existentes
-        # Borramos TODOS los registros en el rango de fechas,
-        # sin importar la empresa, para reemplazarlos con el nuevo set.
-        # Asunción: La tabla 'ventas_detalladas' tiene una columna 'fecha'.
-        
-        print(f"Info: Eliminando TODOS los datos de '{table_name}' entre {fecha_desde} y {fecha_hasta}...")
-        
-        delete_query = f"""
-            DELETE FROM public."{table_name}"
-            WHERE fecha BETWEEN %s AND %s; 
-        """
-        
-        # Usamos la función genérica 'execute_query' que ya importaste
-        execute_query(conn, delete_query, params=(fecha_desde, fecha_hasta))
-        
-        print(f"¡ÉXITO! Los datos del rango han sido eliminados de '{table_name}'.")
-        # -----------------------------------------------------------------
-
-        # Paso 2: Cargar los nuevos datos (Lógica de inserción)
-        columnas_db = list(df_datos.columns)
-        # 1. Forzamos todo el DataFrame a tipos de 'objeto' de Python.
-        #    Esto convierte 'numpy.int64' (que da error) a 'int' de Python (que funciona).
-        # 2. Usamos '.where(pd.notnull...)' para convertir TODOS los tipos de nulos
-        #    (pd.NA, np.nan, NaT) a 'None', que psycopg2 entiende como 'NULL'.
-        
-        df_para_insertar = df_datos.astype(object).where(pd.notnull(df_datos), None)
+        inicio = time.perf_counter()
+        with conn.cursor() as cursor:
+            exigir_migracion(cursor, 1) # Tabla de huellas por día
+            # Con el modelo normalizado las filas van a 'ventas_hechos' (la vista solo se usa para el staging)
+            tabla_fisica, particionada = asegurar_tabla_ventas(cursor, table_name)
+            meses = meses_del_rango(fecha_desde, fecha_hasta)
+            if particionada:
+                asegurar_particiones(cursor, tabla_fisica, fecha_desde, fecha_hasta)
+            huellas_guardadas, dias_en_tabla = _leer_estado_dias(cursor, tabla_fisica, fecha_desde, fecha_hasta)
+            tabla_staging = _preparar_tabla_staging(cursor, table_name)
+            tablas_temporales.append(tabla_staging)
 
-        # 3. Convertimos el DataFrame limpio a una lista de listas.
-        #    .values.tolist() ahora es seguro porque solo hay tipos nativos.
-        lista_de_listas = df_para_insertar.values.tolist()
-        
-        # 4. Convertimos la lista de listas en una lista de tuplas.
-        datos_para_insertar = [tuple(row) for row in lista_de_listas]
-        
-        query_insert = f"INSERT INTO public.\"{table_name}\" ({', '.join(f'\"{c}\"' for c in columnas_db)}) VALUES %s;"
-        
+            # -----------------------------------------------------------------
+            # Paso 1: Por cada lote, comparar las huellas por día con las de la última carga y
+            # copiar al staging solo las filas de los días que cambiaron.
+            # Las filas sin fecha no pertenecen a ningún día: se cargan siempre, como antes.
+            dias_a_eliminar, dias_a_cargar, dias_sin_cambios = set(), set(), set()
+            huellas_a_guardar = []
+            cobertura = {None: set()} # empresa (None = todas) -> días cubiertos por los lotes
+            filas_staging = 0
+            hay_filas_sin_fecha = False
+            lotes_procesados = 0
+            for df_lote, alcance in lotes:
+                lotes_procesados += 1
+                empresas, desde, hasta = alcance
+                dias_alcance = {desde + timedelta(days=n) for n in range((hasta - desde).days + 1)}
+                for empresa in (empresas if empresas is not None else [None]):
+                    cobertura.setdefault(empresa, set()).update(dias_alcance)
+                if df_lote is None or df_lote.empty:
+                    huellas = pd.DataFrame(columns=['empresa', 'fecha', 'huella', 'registros'])
+                else:
+                    huellas = calcular_huellas_por_dia(df_lote)
+                eliminar, cargar, sin_cambios = _planear_dias(huellas, huellas_guardadas, dias_en_tabla, alcance, incremental)
+                dias_a_eliminar |= eliminar
+                dias_a_cargar |= cargar
+                dias_sin_cambios |= sin_cambios
+                huellas_a_guardar.extend(
+                    fila for fila in huellas.itertuples(index=False, name=None) if (fila[0], fila[1]) in cargar
+                )
+                if df_lote is None or df_lote.empty:
+                    continue
+                dia_de_cada_fila = pd.MultiIndex.from_arrays([df_lote['empresa'], df_lote['fecha'].dt.date])
+                sin_fecha = df_lote['fecha'].isna().to_numpy()
+                hay_filas_sin_fecha |= bool(sin_fecha.any())
+                df_a_cargar = df_lote[dia_de_cada_fila.isin(list(cargar)) | sin_fecha]
+                # COPY FROM STDIN desde un buffer en memoria es el camino por defecto (mucho más rápido);
+                # los NA/NaN/NaT viajan como NULL igual que con el INSERT clásico.
+                filas_staging += _cargar_filas(conn, df_a_cargar, tabla_staging, metodo_carga) if not df_a_cargar.empty else 0
+
+            if not lotes_procesados:
+                print(f"ADVERTENCIA: No hay datos para cargar en '{table_name}'.")
+                conn.rollback()
+                return
+            print(f"Info: Días sin cambios (omitidos): {len(dias_sin_cambios)} | "
+                  f"días a reemplazar: {len(dias_a_cargar)} | días a eliminar: {len(dias_a_eliminar - dias_a_cargar)}")
+
+            # Modelo normalizado: se registran las versiones nuevas de clientes, productos y vendedores
+            # y las filas del staging se pasan a ids (también fuera del bloqueo)
+            tabla_origen = tabla_staging
+            if tabla_fisica != table_name:
+                tabla_origen = preparar_staging_hechos(cursor, tabla_staging)
+                tablas_temporales.append(tabla_origen)
+
+            # -----------------------------------------------------------------
+            # Paso 2: Meses completos: se llena una tabla nueva desde el staging mientras la
+            # partición actual sigue disponible para lectura
+            meses_a_intercambiar = []
+            if particionada:
+                meses_a_intercambiar = _meses_a_intercambiar(meses, cobertura, dias_en_tabla, dias_a_cargar, dias_sin_cambios)
+            claves_intercambio = {(mes["anio"], mes["mes"]) for mes in meses_a_intercambiar}
+            def se_intercambia(dia):
+                return (dia[1].year, dia[1].month) in claves_intercambio
+
+            tablas_intercambio = []
+            filas_intercambio = 0
+            for mes in meses_a_intercambiar:
+                tabla_nueva = crear_tabla_de_intercambio(cursor, tabla_fisica, mes, 'fecha')
+                tablas_temporales.append(tabla_nueva)
+                cursor.execute(
+                    f'INSERT INTO public."{tabla_nueva}" SELECT * FROM public."{tabla_origen}" WHERE fecha >= %s AND fecha < %s;',
+                    (mes["inicio"], mes["fin_exclusivo"])
+                )
+                filas_mes = cursor.rowcount
+                crear_indices_como_padre(cursor, tabla_fisica, tabla_nueva)
+                tablas_intercambio.append((mes, tabla_nueva))
+                filas_intercambio += filas_mes
+                print(f"Info: {filas_mes} registros preparados para reemplazar la partición de {mes['anio']}-{mes['mes']:02d}.")
+        conn.commit()
+        print(f"Info: {filas_staging} registros preparados (staging e intercambio) en {time.perf_counter() - inicio:.1f} s.")
+
+        # ---------------------------------------------------------------------
+        # Transacción corta: desde aquí se bloquean 'ventas_detalladas' y sus particiones
+        inicio_bloqueo = time.perf_counter()
         with conn.cursor() as cursor:
-            extras.execute_values(cursor, query_insert, datos_para_insertar, page_size=1000)
-            conn.commit()
-            # rowcount puede no ser fiable con execute_values, usamos len()
-            print(f"¡ÉXITO! Se han insertado {len(datos_para_insertar)} nuevos registros en '{table_name}'.")
+            # Paso 3: Borrar los días que cambiaron (o que ya no vienen en la extracción)
+            # fuera de los meses intercambiados. El filtro por fecha limita el DELETE a sus particiones.
+            dias_a_eliminar_directo = {dia for dia in dias_a_eliminar if not se_intercambia(dia)}
+            filas_eliminadas = _eliminar_dias(cursor, tabla_fisica, dias_a_eliminar_directo, fecha_desde, fecha_hasta)
+            _eliminar_dias(cursor, tabla_huellas_ventas, dias_a_eliminar, fecha_desde, fecha_hasta)
+            print(f"Info: {filas_eliminadas} registros eliminados de '{table_name}'.")
+
+            # Paso 4: Pasar del staging a la tabla las filas fuera de los meses intercambiados
+            # (el planificador las reparte por partición)
+            cursor.execute(f"""
+                INSERT INTO public."{tabla_fisica}" SELECT * FROM public."{tabla_origen}"
+                WHERE fecha IS NULL OR date_trunc('month', fecha)::date <> ALL(%s::date[]);
+            """, ([mes["inicio"] for mes in meses_a_intercambiar],))
+            filas_cargadas = cursor.rowcount
+
+            # Paso 5: Guardar las huellas de los días recargados
+            extras.execute_values(
+                cursor,
+                f'INSERT INTO public."{tabla_huellas_ventas}" (empresa, fecha, huella, registros) VALUES %s;',
+                huellas_a_guardar
+            )
+
+            # Paso 6: Intercambiar las particiones de los meses completos (al final, para que
+            # el bloqueo del DETACH/ATTACH dure lo menos posible antes del commit)
+            for mes, tabla_nueva in tablas_intercambio:
+                tablas_afectadas.add(intercambiar_particion(cursor, tabla_fisica, mes, tabla_nueva))
+                tablas_temporales.remove(tabla_nueva)
+                print(f"Info: Partición de {mes['anio']}-{mes['mes']:02d} reemplazada por intercambio (DETACH/ATTACH).")
+            filas_cargadas += filas_intercambio
+
+            # Paso 7: Volver a aplicar los ajustes de la Fase 2 registrados para los días recargados
+            # (el DELETE + INSERT los acaba de deshacer); si fallan, la carga completa se revierte
+            reaplicar_ajustes(
+                conn, table_name, dias_a_eliminar | dias_a_cargar,
+                [mes["inicio"] for mes in meses_a_intercambiar], fecha_desde, fecha_hasta
+            )
+
+            # Particiones tocadas por los borrados/cargas parciales
+            for _, fecha in (dias_a_eliminar_directo | {dia for dia in dias_a_cargar if not se_intercambia(dia)}):
+                mes = _mes_de_fecha(meses, fecha)
+                if particionada and mes:
+                    tablas_afectadas.add(nombre_particion(tabla_fisica, mes["anio"], mes["mes"]))
+                else:
+                    tablas_afectadas.add(tabla_fisica)
+            if hay_filas_sin_fecha:
+                tablas_afectadas.add(f"{tabla_fisica}_default" if particionada else tabla_fisica)
+        conn.commit()
+        segundos_bloqueo = time.perf_counter() - inicio_bloqueo
+        print(f"Info: Tiempo con '{table_name}' bloqueada (DELETE + INSERT ... SELECT + intercambios + ajustes): {segundos_bloqueo:.2f} s.")
+        print(f"¡ÉXITO! Se han insertado {filas_cargadas} nuevos registros en '{table_name}' en {time.perf_counter() - inicio:.1f} s "
+              f"({len(dias_sin_cambios)} días omitidos, {len(dias_a_cargar)} días reemplazados).")
 
     except Exception as e:
         print(f"ERROR CRÍTICO durante la carga en '{table_name}': {e}")
         conn.rollback() # Revertimos cualquier cambio si hay un error
         raise # Es buena idea relanzar el error para que la orquestación lo sepa
+    finally:
+        # El staging y las tablas de intercambio no usadas no se necesitan después de la carga
+        if tablas_temporales:
+            _limpiar_tablas_temporales(conn, tablas_temporales)
+
+    # Estadísticas frescas para las particiones que cambiaron (fuera de la transacción de carga)
+    analizar_tablas(conn, sorted(tablas_afectadas))
+
+def nombre_corrida_ventas(fecha_inicio_str, fecha_fin_str):
+    """Nombre del checkpoint de una corrida de la Fase 1 de ventas."""
+    return f"ventas_{fecha_inicio_str}_{fecha_fin_str}"
 
-def ejecutar_fase_1(fecha_inicio_str, fecha_fin_str):
+def hay_corrida_pendiente(fecha_inicio_str, fecha_fin_str):
+    """True si una corrida anterior del mismo rango quedó sin terminar y se puede reanudar."""
+    return existe_checkpoint(nombre_corrida_ventas(fecha_inicio_str, fecha_fin_str))
+
+def ejecutar_fase_1(fecha_inicio_str, fecha_fin_str, reanudar=False, desde_landing=False):
     """
     Orquesta la Fase 1: Extracción y Carga de Ventas API.
     Esta función es llamada por main.py
+    :param reanudar: True para continuar una corrida interrumpida del mismo rango: solo se piden
+                     a la API las ventanas que faltan y luego se hace la carga normal.
+    :param desde_landing: True para cargar lo que ya está en la zona de aterrizaje (Parquet)
+                          sin consultar la API.
     """    
     print(f"\n=== INICIO FASE 1: EXTRACCIÓN Y CARGA DE VENTAS ({fecha_inicio_str} a {fecha_fin_str}) ===")
 
@@ -270,9 +904,25 @@ def ejecutar_fase_1(fecha_inicio_str, fecha_fin_str):
 
 
     # --- Orquestación del Proceso ---
-    # 1. Extraer (BULK - Todas las empresas)
-    # Tu función 'extraer_ventas_api' ya hace esto, está perfecta.
-    df_ventas_crudo = extraer_ventas_api(fecha_inicio_str, fecha_fin_str)
+    if config.ventas_streaming and not desde_landing:
+        _ejecutar_fase_1_por_lotes(fecha_inicio_str, fecha_fin_str, reanudar)
+        print("\n== Fin fase 1: extracción y carga de ventas ==")
+        return
+
+    diario = None
+    if desde_landing:
+        # 1. Leer lo que ya se extrajo antes (sin llamar a la API)
+        df_ventas_crudo = leer_landing("ventas", fecha_desde=fecha_inicio_str, fecha_hasta=fecha_fin_str)
+    else:
+        # 1. Extraer (BULK - Todas las empresas), anotando cada ventana en el checkpoint de la corrida
+        diario = DiarioExtraccion(nombre_corrida_ventas(fecha_inicio_str, fecha_fin_str), reanudar=reanudar)
+        df_ventas_crudo = extraer_ventas_api(fecha_inicio_str, fecha_fin_str, diario=diario)
+        # Copia columnar de la extracción para poder recargar o exportar sin volver a la API.
+        # Si falla (disco lleno, permisos...) solo se advierte: la carga a la BD no depende de ella
+        try:
+            escribir_landing(df_ventas_crudo, "ventas", "empresa", "fecha", rango=(fecha_inicio_str, fecha_fin_str))
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo guardar la extracción de ventas en la zona de aterrizaje: {e}. La carga a la BD continúa.")
     
     table_name = "ventas_detalladas"
 
@@ -289,11 +939,52 @@ def ejecutar_fase_1(fecha_inicio_str, fecha_fin_str):
                     fecha_inicio_str, 
                     fecha_fin_str
                 )
+                if diario is not None:
+                    _cerrar_corrida(diario)
+            except MigracionPendienteError:
+                raise # Sin el esquema no hay carga: se detiene todo el flujo, no solo la Fase 1
             except Exception as e:
                 # Capturamos el error relanzado por cargar_ventas_db
                 print(f"ERROR: El proceso de carga a la base de datos falló: {e}")
+                print("Info: Las ventanas extraídas quedaron en el checkpoint; puede reanudar la corrida sin volver a consultar la API.")
             finally:
                 conn.close()
                 print("\nConexión a la base de datos cerrada.")
+    elif diario is not None and diario.completo():
+        diario.eliminar() # No hubo ventas en el rango: no queda nada por reanudar
     
-    print("\n== Fin fase 1: extracción y carga de ventas ==")
\ No newline at end of file
+    print("\n== Fin fase 1: extracción y carga de ventas ==")
+
+def _ejecutar_fase_1_por_lotes(fecha_inicio_str, fecha_fin_str, reanudar=False):
+    """
+    Fase 1 con config.ventas_streaming: cada ventana extraída pasa directo al staging de la carga,
+    así nunca está todo el rango en memoria. El resultado en la BD es el mismo que el de la carga BULK.
+    """
+    diario = DiarioExtraccion(nombre_corrida_ventas(fecha_inicio_str, fecha_fin_str), reanudar=reanudar)
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        cargar_ventas_por_lotes(
+            iterar_ventas_api(fecha_inicio_str, fecha_fin_str, diario=diario),
+            conn,
+            "ventas_detalladas",
+            fecha_inicio_str,
+            fecha_fin_str
+        )
+        _cerrar_corrida(diario)
+    except MigracionPendienteError:
+        raise # Sin el esquema no hay carga: se detiene todo el flujo, no solo la Fase 1
+    except Exception as e:
+        print(f"ERROR: El proceso de carga a la base de datos falló: {e}")
+        print("Info: Las ventanas extraídas quedaron en el checkpoint; puede reanudar la corrida sin volver a consultar la API.")
+    finally:
+        conn.close()
+        print("\nConexión a la base de datos cerrada.")
+
+def _cerrar_corrida(diario):
+    """Borra el checkpoint si todas las ventanas de todas las empresas quedaron extraídas."""
+    if diario.completo():
+        diario.eliminar()
+    else:
+        print("ADVERTENCIA: Algunas empresas/ventanas fallaron. Use la opción de reanudar para extraer solo las que faltan.")
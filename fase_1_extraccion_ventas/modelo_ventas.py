@@ -0,0 +1,286 @@
+# Modelo normalizado de las ventas:
+# - 'ventas_hechos': una fila por línea de factura con las medidas y los ids de las dimensiones
+#   (particionada por mes sobre 'fecha').
+# - 'ventas_clientes', 'ventas_productos', 'ventas_vendedores': los textos largos que antes se
+#   repetían en cada línea. Cada fila es una VERSIÓN de (empresa, código): si el nombre, la
+#   dirección, etc. cambian se agrega una versión nueva y las líneas anteriores siguen apuntando
+#   a la que tenían, así el histórico no cambia.
+# - 'id_linea': llave subrogada de cada línea de 'ventas_hechos' (secuencia). La vista la expone
+#   como última columna y los triggers borran/actualizan por ella, con su índice.
+# - 'ventas_detalladas': vista con las mismas columnas y en el mismo orden de la tabla anterior
+#   (más 'id_linea' al final), para la Fase 2 (UPDATE/DELETE/COPY, vía triggers INSTEAD OF) y la Fase 3.
+
+from utils.particiones import (
+    existe_tabla, crear_tabla_particionada, asegurar_particiones, analizar_tablas
+)
+from utils.migraciones import crear_indices
+
+# Estructura de 'ventas_detalladas' (el orden es el mismo de los CSV de ajustes de la Fase 2).
+columnas_ventas_detalladas = [
+    ('nit', 'text'), ('nombre', 'text'), ('factura', 'text'), ('forma_pago', 'text'), ('fecha', 'date'),
+    ('codigo', 'text'), ('descripcion', 'text'), ('codigo_grupo_art', 'text'), ('nombre_grupo_art', 'text'), ('und', 'text'),
+    ('cant', 'integer'), ('valor_base', 'numeric'), ('iva', 'numeric'), ('porc_iva', 'integer'), ('descuento', 'numeric'),
+    ('valor', 'numeric'), ('lista_precio', 'integer'), ('precio', 'numeric'), ('precio_mayor', 'numeric'), ('cod_linea', 'text'),
+    ('desc_linea', 'text'), ('cod_cliente', 'text'), ('clasificacion', 'text'), ('clasificacion_py', 'text'), ('zona', 'text'),
+    ('telefono', 'text'), ('ciudad', 'text'), ('observaciones', 'text'), ('direccion', 'text'), ('cod_area', 'text'),
+    ('nom_area', 'text'), ('cod_vendedor', 'text'), ('nom_vendedor', 'text'), ('cod_despachar', 'text'), ('cliente_despachar', 'text'),
+    ('marca', 'text'), ('referencia', 'text'), ('barrio', 'text'), ('dep_articulo', 'text'), ('recargo', 'text'),
+    ('serial', 'text'), ('peso_bruto', 'numeric'), ('factor', 'integer'), ('supervisor', 'text'), ('costo', 'numeric'),
+    ('motivo_dev', 'text'), ('empresa', 'text'), ('pedido_tiendapp', 'text'), ('bodega', 'text'),
+]
+
+tabla_hechos_ventas = "ventas_hechos"
+columna_id_linea = "id_linea"
+secuencia_id_linea = f"{tabla_hechos_ventas}_{columna_id_linea}_seq"
+
+# Dimensiones: tabla, id (llave subrogada), código de negocio y columnas de texto que describe
+dimensiones_ventas = [
+    {"tabla": "ventas_clientes", "id": "id_cliente", "llave": "cod_cliente",
+     "atributos": ["nombre", "direccion", "telefono", "barrio"]},
+    {"tabla": "ventas_productos", "id": "id_producto", "llave": "codigo",
+     "atributos": ["descripcion", "marca", "referencia"]},
+    {"tabla": "ventas_vendedores", "id": "id_vendedor", "llave": "cod_vendedor",
+     "atributos": ["nom_vendedor", "supervisor"]},
+]
+
+_columnas_de_dimension = {
+    col: dimension for dimension in dimensiones_ventas for col in [dimension["llave"], *dimension["atributos"]]
+}
+
+# Columnas de 'ventas_hechos': las que no están en una dimensión, en su orden, y al final los ids
+_columnas_propias_hechos = [col for col, _ in columnas_ventas_detalladas if col not in _columnas_de_dimension]
+columnas_hechos_ventas = (
+    [(col, tipo) for col, tipo in columnas_ventas_detalladas if col not in _columnas_de_dimension]
+    + [(dimension["id"], 'bigint') for dimension in dimensiones_ventas]
+)
+
+# 'id_linea' va al final de 'ventas_hechos' (después de los ids) y sale de la secuencia: los
+# INSERT ... SELECT de la carga no la mencionan y toma el valor por defecto.
+# PostgreSQL 16 no admite columnas IDENTITY en tablas particionadas, por eso la secuencia.
+_columna_id_linea_sql = (columna_id_linea, f"bigint NOT NULL DEFAULT nextval('public.\"{secuencia_id_linea}\"')")
+
+def _lista(columnas, prefijo=None):
+    """'"a", "b"' o, con prefijo, 'p."a", p."b"'."""
+    return ', '.join(f'{prefijo}."{col}"' if prefijo else f'"{col}"' for col in columnas)
+
+def _columnas_version(dimension):
+    """Columnas que identifican una versión: empresa, código y atributos."""
+    return ["empresa", dimension["llave"], *dimension["atributos"]]
+
+def _huella_sql(dimension, prefijo):
+    """
+    Expresión SQL con la huella (md5) de una versión de la dimensión. ROW(...)::text distingue
+    NULL de texto vacío, así dos versiones distintas nunca tienen la misma huella.
+    """
+    return f"md5(ROW({_lista(_columnas_version(dimension), prefijo)})::text)"
+
+def es_modelo_normalizado(cursor, table_name):
+    """True si 'table_name' es la vista sobre 'ventas_hechos' (modelo normalizado)."""
+    cursor.execute("""
+        SELECT c.relkind = 'v'
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = %s;
+    """, (table_name,))
+    fila = cursor.fetchone()
+    return bool(fila and fila[0]) and existe_tabla(cursor, tabla_hechos_ventas)
+
+def _crear_dimensiones(cursor):
+    for dimension in dimensiones_ventas:
+        atributos = ',\n                '.join(f'"{col}" text' for col in dimension["atributos"])
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS public."{dimension['tabla']}" (
+                "{dimension['id']}" bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+                empresa text,
+                "{dimension['llave']}" text,
+                {atributos},
+                huella text NOT NULL UNIQUE,
+                creado_en timestamptz NOT NULL DEFAULT now()
+            );
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS "{dimension['tabla']}_empresa_llave_idx"
+            ON public."{dimension['tabla']}" (empresa, "{dimension['llave']}");
+        """)
+
+def _crear_vista(cursor, table_name):
+    """Vista con el layout de siempre + triggers INSTEAD OF que escriben en hechos y dimensiones."""
+    alias = {dimension["tabla"]: f"d{i}" for i, dimension in enumerate(dimensiones_ventas)}
+    columnas_vista = ',\n            '.join(
+        [f'{alias[_columnas_de_dimension[col]["tabla"]]}."{col}"' if col in _columnas_de_dimension else f'h."{col}"'
+         for col, _ in columnas_ventas_detalladas]
+        + [f'h."{columna_id_linea}"']
+    )
+    joins = '\n        '.join(
+        f'LEFT JOIN public."{d["tabla"]}" {alias[d["tabla"]]} ON {alias[d["tabla"]]}."{d["id"]}" = h."{d["id"]}"'
+        for d in dimensiones_ventas
+    )
+    cursor.execute(f"""
+        CREATE OR REPLACE VIEW public."{table_name}" AS
+        SELECT
+            {columnas_vista}
+        FROM public."{tabla_hechos_ventas}" h
+        {joins};
+    """)
+
+    variables = '\n    '.join([f'v_{d["id"]} bigint;' for d in dimensiones_ventas] + ['v_id_linea bigint;'])
+    # Fila vieja: se borra su línea de los hechos por 'id_linea' (índice) en la partición de su fecha
+    borrar_linea = (
+        f'DELETE FROM public."{tabla_hechos_ventas}" WHERE "{columna_id_linea}" = OLD."{columna_id_linea}" AND {{fecha}};'
+    )
+    # Fila nueva: se registra la versión de cada dimensión (si no existe) y se inserta en los hechos
+    registrar_ids_nuevos = '\n    '.join(
+        f'INSERT INTO public."{d["tabla"]}" ({_lista(_columnas_version(d))}, huella) '
+        f'VALUES ({_lista(_columnas_version(d), "NEW")}, {_huella_sql(d, "NEW")}) '
+        f'ON CONFLICT (huella) DO NOTHING;\n    '
+        f'SELECT "{d["id"]}" INTO v_{d["id"]} FROM public."{d["tabla"]}" WHERE huella = {_huella_sql(d, "NEW")};'
+        for d in dimensiones_ventas
+    )
+    columnas_insert = _lista([col for col, _ in columnas_hechos_ventas] + [columna_id_linea])
+    valores_insert = ', '.join(
+        [_lista(_columnas_propias_hechos, "NEW")] + [f'v_{d["id"]}' for d in dimensiones_ventas] + ['v_id_linea']
+    )
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION public."{table_name}_escribir"() RETURNS trigger LANGUAGE plpgsql AS $funcion$
+        DECLARE
+            {variables}
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                IF OLD.fecha IS NULL THEN
+                    {borrar_linea.format(fecha='fecha IS NULL')}
+                ELSE
+                    {borrar_linea.format(fecha='fecha = OLD.fecha')}
+                END IF;
+                IF TG_OP = 'DELETE' THEN
+                    RETURN OLD;
+                END IF;
+            END IF;
+            -- Una línea actualizada conserva su 'id_linea'; una insertada toma uno nuevo
+            IF TG_OP = 'UPDATE' THEN
+                v_id_linea := OLD."{columna_id_linea}";
+            ELSE
+                v_id_linea := nextval('public."{secuencia_id_linea}"');
+            END IF;
+            {registrar_ids_nuevos}
+            INSERT INTO public."{tabla_hechos_ventas}" ({columnas_insert}) VALUES ({valores_insert});
+            RETURN NEW;
+        END
+        $funcion$;
+    """)
+    cursor.execute(f'DROP TRIGGER IF EXISTS "{table_name}_escribir" ON public."{table_name}";')
+    cursor.execute(f"""
+        CREATE TRIGGER "{table_name}_escribir" INSTEAD OF INSERT OR UPDATE OR DELETE ON public."{table_name}"
+        FOR EACH ROW EXECUTE FUNCTION public."{table_name}_escribir"();
+    """)
+
+def crear_modelo_normalizado(cursor, table_name):
+    """Crea (si no existen) las dimensiones, 'ventas_hechos' particionada por mes y la vista 'table_name'."""
+    _crear_dimensiones(cursor)
+    cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS public."{secuencia_id_linea}";')
+    crear_tabla_particionada(cursor, tabla_hechos_ventas, columnas_hechos_ventas + [_columna_id_linea_sql], 'fecha')
+    cursor.execute(f'ALTER SEQUENCE public."{secuencia_id_linea}" OWNED BY public."{tabla_hechos_ventas}"."{columna_id_linea}";')
+    crear_indices(cursor, [tabla_hechos_ventas])
+    _crear_vista(cursor, table_name)
+
+def registrar_dimensiones(cursor, tabla_origen):
+    """
+    Agrega a las dimensiones las versiones de 'tabla_origen' (con el layout de 'ventas_detalladas')
+    que todavía no existen e imprime cuántos códigos son nuevos y cuántos cambiaron.
+    """
+    for d in dimensiones_ventas:
+        columnas = _lista(_columnas_version(d))
+        cursor.execute(f"""
+            WITH nuevas AS (
+                INSERT INTO public."{d['tabla']}" ({columnas}, huella)
+                SELECT {columnas}, {_huella_sql(d, 'v')}
+                FROM (SELECT DISTINCT {columnas} FROM public."{tabla_origen}") v
+                ON CONFLICT (huella) DO NOTHING
+                RETURNING empresa, "{d['llave']}"
+            )
+            SELECT count(*), count(*) FILTER (WHERE EXISTS (
+                SELECT 1 FROM public."{d['tabla']}" anterior
+                WHERE anterior.empresa IS NOT DISTINCT FROM nuevas.empresa
+                  AND anterior."{d['llave']}" IS NOT DISTINCT FROM nuevas."{d['llave']}"
+            ))
+            FROM nuevas;
+        """)
+        nuevas, con_cambios = cursor.fetchone()
+        if nuevas:
+            print(f"Info: '{d['tabla']}': {nuevas - con_cambios} códigos nuevos, {con_cambios} con cambios (nueva versión).")
+
+def select_hechos(tabla_origen):
+    """SELECT que convierte filas con el layout de 'ventas_detalladas' en filas de 'ventas_hechos'."""
+    columnas = ', '.join([_lista(_columnas_propias_hechos, "s")] + [f'd{i}."{d["id"]}"' for i, d in enumerate(dimensiones_ventas)])
+    joins = '\n        '.join(
+        f'JOIN public."{d["tabla"]}" d{i} ON d{i}.huella = {_huella_sql(d, "s")}'
+        for i, d in enumerate(dimensiones_ventas)
+    )
+    return f"""
+        SELECT {columnas}
+        FROM public."{tabla_origen}" s
+        {joins}
+    """
+
+def preparar_staging_hechos(cursor, tabla_staging):
+    """
+    Registra las dimensiones del staging (layout de 'ventas_detalladas') y crea
+    '<ventas_hechos>_staging' (UNLOGGED) con las filas ya convertidas a ids.
+    Retorna el nombre de la tabla creada.
+    """
+    registrar_dimensiones(cursor, tabla_staging)
+    tabla_staging_hechos = f"{tabla_hechos_ventas}_staging"
+    cursor.execute(f'DROP TABLE IF EXISTS public."{tabla_staging_hechos}";')
+    cursor.execute(f'CREATE UNLOGGED TABLE public."{tabla_staging_hechos}" AS {select_hechos(tabla_staging)};')
+    return tabla_staging_hechos
+
+def _tamano_total(cursor, tablas):
+    """Bytes que ocupan las tablas (con sus particiones, índices y TOAST)."""
+    cursor.execute(
+        "SELECT coalesce(sum(pg_total_relation_size(relid)), 0) FROM unnest(%s::regclass[]) t, pg_partition_tree(t) p;",
+        ([f'public."{tabla}"' for tabla in tablas],)
+    )
+    return cursor.fetchone()[0]
+
+def normalizar_ventas_detalladas(conn, table_name="ventas_detalladas"):
+    """
+    Convierte la tabla 'ventas_detalladas' (particionada o no) al modelo normalizado:
+    dimensiones + 'ventas_hechos' + vista 'ventas_detalladas' con las mismas columnas.
+    La tabla original se conserva renombrada como '<tabla>_sin_normalizar' para revisarla
+    y borrarla a mano cuando se confirme que la migración quedó bien.
+    """
+    tabla_anterior = f"{table_name}_sin_normalizar"
+    try:
+        with conn.cursor() as cursor:
+            if es_modelo_normalizado(cursor, table_name):
+                print(f"Info: '{table_name}' ya usa el modelo normalizado. No hay nada que migrar.")
+                return
+            if not existe_tabla(cursor, table_name):
+                crear_modelo_normalizado(cursor, table_name)
+                conn.commit()
+                return
+            if existe_tabla(cursor, tabla_anterior):
+                raise ValueError(f"Ya existe '{tabla_anterior}'. Revísela y bórrela antes de migrar de nuevo.")
+
+            print(f"Info: Normalizando '{table_name}' (dimensiones de clientes, productos y vendedores)...")
+            cursor.execute(f'ALTER TABLE public."{table_name}" RENAME TO "{tabla_anterior}";')
+            crear_modelo_normalizado(cursor, table_name)
+            cursor.execute(f'SELECT min(fecha), max(fecha), count(*) FROM public."{tabla_anterior}";')
+            fecha_minima, fecha_maxima, registros = cursor.fetchone()
+            if fecha_minima:
+                asegurar_particiones(cursor, tabla_hechos_ventas, fecha_minima, fecha_maxima)
+            registrar_dimensiones(cursor, tabla_anterior)
+            columnas = _lista(col for col, _ in columnas_hechos_ventas)
+            cursor.execute(f'INSERT INTO public."{tabla_hechos_ventas}" ({columnas}) {select_hechos(tabla_anterior)};')
+            if cursor.rowcount != registros:
+                raise ValueError(f"Se copiaron {cursor.rowcount} de {registros} registros.")
+            print(f"Info: {cursor.rowcount} registros copiados a '{tabla_hechos_ventas}'.")
+        conn.commit()
+        analizar_tablas(conn, [tabla_hechos_ventas] + [d["tabla"] for d in dimensiones_ventas])
+        with conn.cursor() as cursor:
+            antes = _tamano_total(cursor, [tabla_anterior])
+            despues = _tamano_total(cursor, [tabla_hechos_ventas] + [d["tabla"] for d in dimensiones_ventas])
+        print(f"Info: Tamaño en disco: {antes / 1024**2:.1f} MB antes -> {despues / 1024**2:.1f} MB (hechos + dimensiones).")
+        print(f"¡ÉXITO! '{table_name}' quedó normalizada. La tabla original quedó como '{tabla_anterior}'.")
+    except Exception as e:
+        print(f"ERROR durante la normalización de '{table_name}': {e}")
+        conn.rollback()
+        raise
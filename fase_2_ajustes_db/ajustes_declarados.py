@@ -0,0 +1,277 @@
+# Ajustes de la Fase 2 declarados como datos (CSV) en lugar de sentencias SQL escritas a mano.
+#
+# Formato del archivo (UTF-8, separado por comas, con encabezado):
+#
+#   accion,factura,columna,valor,motivo
+#   actualizar,DVFECA1143076,cod_vendedor,V10,Errores en devoluciones
+#   actualizar,DVFECA1143076,nom_vendedor,DUARTE MORALES LEIDY VIVIANA (SSM1,Errores en devoluciones
+#   borrar,FVFECA1341379,,,Facturas anuladas
+#   cargar_csv,,,datos/ajustes_septiembre.csv,Facturas que no llegaron por la API
+#
+# - actualizar: pone 'valor' en 'columna' para todas las filas de la factura (valor vacío = NULL).
+#   Las fechas van en formato AAAA-MM-DD.
+# - borrar: borra todas las filas de la factura.
+# - cargar_csv: agrega las filas de un CSV (ruta relativa al archivo) con encabezado; las columnas
+#   son las del encabezado y deben ser de 'ventas_detalladas' (las que falten quedan en NULL). Las
+#   fechas pueden venir como AAAA-MM-DD o DD/MM/AAAA.
+#   El registro guarda la ruta y los días (empresa, fecha) del CSV; cuando la Fase 1 recarga uno de
+#   esos días se vuelven a cargar las filas del CSV de ese día, así que el archivo debe seguir ahí.
+#
+# Se aplican en ese orden (actualizar, borrar, cargar_csv) y en pocas sentencias: un
+# UPDATE ... FROM (VALUES ...) por cada grupo de facturas que cambia las mismas columnas y un solo
+# DELETE ... WHERE factura = ANY(...), todo en una transacción.
+
+import csv
+import os
+from datetime import date, datetime
+
+from psycopg2 import extras
+
+from fase_1_extraccion_ventas.modelo_ventas import columna_id_linea, columnas_ventas_detalladas
+
+ACCIONES = ("actualizar", "borrar", "cargar_csv")
+
+def leer_ajustes(ruta_archivo):
+    """
+    Lee un archivo de ajustes declarados. Retorna un dict con:
+    - 'actualizaciones': {factura: {columna: valor}}
+    - 'borrados': lista de facturas (sin repetir, en el orden del archivo)
+    - 'cargas': lista de rutas absolutas de CSV a cargar
+    - 'motivos': {factura: motivo} (el último motivo declarado para la factura)
+    Lanza ValueError con el número de línea si una fila no es válida.
+    """
+    ajustes = {"actualizaciones": {}, "borrados": [], "cargas": [], "motivos": {}}
+    directorio = os.path.dirname(os.path.abspath(ruta_archivo))
+
+    with open(ruta_archivo, "r", encoding="utf-8-sig", newline="") as f:
+        for numero, fila in enumerate(csv.DictReader(f), start=2):
+            accion = (fila.get("accion") or "").strip().lower()
+            factura = (fila.get("factura") or "").strip()
+            columna = (fila.get("columna") or "").strip()
+            valor = fila.get("valor")
+            motivo = (fila.get("motivo") or "").strip()
+
+            if accion not in ACCIONES:
+                raise ValueError(f"Línea {numero}: acción '{accion}' no válida (use {', '.join(ACCIONES)}).")
+            if accion == "cargar_csv":
+                if not valor:
+                    raise ValueError(f"Línea {numero}: 'cargar_csv' necesita la ruta del CSV en 'valor'.")
+                ajustes["cargas"].append(os.path.join(directorio, valor.strip()))
+                continue
+            if not factura:
+                raise ValueError(f"Línea {numero}: falta la factura.")
+            if motivo:
+                ajustes["motivos"][factura] = motivo
+            if accion == "borrar":
+                if factura not in ajustes["borrados"]:
+                    ajustes["borrados"].append(factura)
+                continue
+            if not columna or columna == "factura":
+                raise ValueError(f"Línea {numero}: columna '{columna}' no válida para 'actualizar'.")
+            ajustes["actualizaciones"].setdefault(factura, {})[columna] = valor if valor != "" else None
+    return ajustes
+
+def _tipos_columnas(cursor, table_name):
+    """{columna: tipo SQL completo (ej. 'numeric(18,2)')} de una tabla o vista de 'public'."""
+    cursor.execute("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+        ORDER BY a.attnum;
+    """, (f'public."{table_name}"',))
+    return dict(cursor.fetchall())
+
+def _filas_por_factura(cursor, table_name, facturas):
+    """{factura: filas actuales en la tabla}, en una sola consulta."""
+    if not facturas:
+        return {}
+    cursor.execute(
+        f'SELECT factura, count(*) FROM public."{table_name}" WHERE factura = ANY(%s) GROUP BY factura',
+        (list(facturas),)
+    )
+    return dict(cursor.fetchall())
+
+def _agrupar_por_columnas(actualizaciones):
+    """Agrupa las facturas que cambian exactamente las mismas columnas: {(col1, col2...): [factura, ...]}."""
+    grupos = {}
+    for factura, cambios in actualizaciones.items():
+        grupos.setdefault(tuple(sorted(cambios)), []).append(factura)
+    return grupos
+
+def _actualizar_grupo(cursor, table_name, columnas, facturas, actualizaciones, tipos):
+    """Un UPDATE ... FROM (VALUES ...) para todas las facturas del grupo. Retorna las filas afectadas."""
+    alias = ', '.join(['"factura"'] + [f'"{col}"' for col in columnas])
+    asignaciones = ', '.join(f'"{col}" = v."{col}"::{tipos[col]}' for col in columnas)
+    query = f"""
+        UPDATE public."{table_name}" AS t
+        SET {asignaciones}
+        FROM (VALUES %s) AS v({alias})
+        WHERE t."factura" = v."factura";
+    """
+    valores = [tuple([factura] + [actualizaciones[factura][col] for col in columnas]) for factura in facturas]
+    # Todas las facturas del grupo van en una sola sentencia
+    extras.execute_values(cursor, query, valores, page_size=len(valores))
+    return cursor.rowcount
+
+def _fecha_csv(valor):
+    """Fecha de un CSV de 'cargar_csv' (AAAA-MM-DD o DD/MM/AAAA). None si no tiene ninguno de esos formatos."""
+    valor = (valor or "").strip()
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(valor, "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+def dias_del_csv(ruta_csv):
+    """
+    (empresa, fecha) de las filas de un CSV de 'cargar_csv'. Lanza ValueError con el número de
+    línea si una fila no tiene una fecha válida, o si el CSV no tiene filas: sin sus días el
+    registro no podría volver a cargar el CSV cuando la Fase 1 recargue esos días.
+    """
+    archivo = os.path.basename(ruta_csv)
+    dias = set()
+    with open(ruta_csv, "r", encoding="utf-8-sig", newline="") as f:
+        for numero, fila in enumerate(csv.DictReader(f), start=2):
+            fecha = _fecha_csv(fila.get("fecha"))
+            if fecha is None:
+                raise ValueError(f"{archivo}, línea {numero}: fecha '{fila.get('fecha')}' no válida (use AAAA-MM-DD o DD/MM/AAAA).")
+            dias.add((fila.get("empresa") or None, fecha))
+    if not dias:
+        raise ValueError(f"{archivo} no tiene filas para cargar.")
+    return dias
+
+def _columnas_del_csv(ruta_csv):
+    """
+    Columnas del encabezado de un CSV de 'cargar_csv' (sin el BOM de UTF-8 que deja Excel).
+    Lanza ValueError si alguna no es columna de 'ventas_detalladas' o si se repite.
+    """
+    with open(ruta_csv, "r", encoding="utf-8-sig", newline="") as f:
+        columnas = [col.strip() for col in next(csv.reader(f), [])]
+    validas = {col for col, _ in columnas_ventas_detalladas}
+    desconocidas = [col for col in columnas if col not in validas]
+    if desconocidas or not columnas:
+        raise ValueError(f"Columnas del encabezado de {os.path.basename(ruta_csv)} que no existen en "
+                         f"'ventas_detalladas': {', '.join(desconocidas) or '(encabezado vacío)'}")
+    if len(set(columnas)) != len(columnas):
+        raise ValueError(f"El encabezado de {os.path.basename(ruta_csv)} tiene columnas repetidas.")
+    return columnas
+
+def _cargar_csv(cursor, table_name, ruta_csv, dias_cargas=None):
+    """
+    COPY de las filas de un CSV (con encabezado) a la tabla, con las columnas del encabezado. Con
+    'dias_cargas' = (días, meses) solo se agregan las filas de esos (empresa, fecha) o de los meses
+    que empiezan en esas fechas: el CSV pasa primero por una tabla temporal. Retorna las filas agregadas.
+    """
+    if not os.path.exists(ruta_csv):
+        raise FileNotFoundError(f"El archivo {ruta_csv} no existe.")
+    lista_columnas = ', '.join(f'"{col}"' for col in _columnas_del_csv(ruta_csv))
+    destino = f'public."{table_name}"' if dias_cargas is None else 'pg_temp."ajustes_csv"'
+    if dias_cargas is not None:
+        cursor.execute('DROP TABLE IF EXISTS pg_temp."ajustes_csv";')
+        cursor.execute(f'CREATE TEMP TABLE "ajustes_csv" AS SELECT {lista_columnas} FROM public."{table_name}" LIMIT 0;')
+    # Las fechas DD/MM/AAAA del CSV se leen como día/mes (las AAAA-MM-DD no cambian) solo durante
+    # el COPY; si falla, el rollback de la transacción devuelve el DateStyle anterior
+    cursor.execute("SELECT current_setting('DateStyle');")
+    estilo_fechas = cursor.fetchone()[0]
+    cursor.execute("SET DateStyle = 'ISO, DMY';")
+    with open(ruta_csv, "r", encoding="utf-8-sig") as f:
+        next(f) # saltar encabezado
+        cursor.copy_expert(f'COPY {destino} ({lista_columnas}) FROM STDIN WITH CSV', f)
+    cargadas = cursor.rowcount
+    cursor.execute("SELECT set_config('DateStyle', %s, false);", (estilo_fechas,))
+    if dias_cargas is None:
+        return cargadas
+
+    dias, meses = dias_cargas
+    cursor.execute(f"""
+        INSERT INTO public."{table_name}" ({lista_columnas})
+        SELECT {lista_columnas} FROM pg_temp."ajustes_csv"
+        WHERE (empresa, fecha) IN (SELECT * FROM unnest(%s::text[], %s::date[]))
+           OR date_trunc('month', fecha)::date = ANY(%s::date[]);
+    """, ([empresa for empresa, _ in dias], [fecha for _, fecha in dias], list(meses)))
+    cargadas = cursor.rowcount
+    cursor.execute('DROP TABLE pg_temp."ajustes_csv";')
+    return cargadas
+
+def aplicar_ajustes(conn, ajustes, table_name="ventas_detalladas", commit=True, dias_cargas=None):
+    """
+    Aplica los ajustes leídos con 'leer_ajustes' en una sola transacción e imprime, por sentencia,
+    las filas previstas (las que hoy tienen esas facturas) y las realmente afectadas.
+    :param dias_cargas: (días, meses) para cargar de cada CSV solo las filas de los días recargados
+                        por la Fase 1 (ver '_cargar_csv'); None carga los CSV completos.
+    Retorna un dict con 'actualizadas', 'borradas' y 'cargadas'.
+    """
+    actualizaciones, borrados, cargas = ajustes["actualizaciones"], ajustes["borrados"], ajustes["cargas"]
+    resumen = {"actualizadas": 0, "borradas": 0, "cargadas": 0}
+
+    with conn.cursor() as cursor:
+        try:
+            tipos = _tipos_columnas(cursor, table_name)
+            tipos.pop(columna_id_linea, None) # Llave de la vista del modelo normalizado: no se ajusta ni viene en los CSV
+            desconocidas = sorted({col for cambios in actualizaciones.values() for col in cambios} - set(tipos))
+            if desconocidas:
+                raise ValueError(f"Columnas que no existen en '{table_name}': {', '.join(desconocidas)}")
+
+            # Filas previstas: una sola consulta para todas las facturas del archivo
+            previstas = _filas_por_factura(cursor, table_name, set(actualizaciones) | set(borrados))
+            no_encontradas = sorted((set(actualizaciones) | set(borrados)) - set(previstas))
+            if no_encontradas:
+                print(f"ADVERTENCIA: {len(no_encontradas)} facturas de los ajustes no están en '{table_name}': "
+                      f"{', '.join(no_encontradas[:10])}{' ...' if len(no_encontradas) > 10 else ''}")
+
+            for columnas, facturas in _agrupar_por_columnas(actualizaciones).items():
+                filas_previstas = sum(previstas.get(factura, 0) for factura in facturas)
+                afectadas = _actualizar_grupo(cursor, table_name, columnas, facturas, actualizaciones, tipos)
+                resumen["actualizadas"] += afectadas
+                print(f"Info: UPDATE de {', '.join(columnas)} en {len(facturas)} facturas: "
+                      f"{filas_previstas} filas previstas, {afectadas} actualizadas.")
+
+            if borrados:
+                filas_previstas = sum(previstas.get(factura, 0) for factura in borrados)
+                cursor.execute(f'DELETE FROM public."{table_name}" WHERE factura = ANY(%s)', (borrados,))
+                resumen["borradas"] = cursor.rowcount
+                print(f"Info: DELETE de {len(borrados)} facturas: {filas_previstas} filas previstas, {cursor.rowcount} borradas.")
+
+            for ruta_csv in cargas:
+                cargadas = _cargar_csv(cursor, table_name, ruta_csv, dias_cargas)
+                resumen["cargadas"] += cargadas
+                print(f"Info: {cargadas} filas cargadas desde {os.path.basename(ruta_csv)}.")
+
+            if commit:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return resumen
+
+def ejecutar_archivo_ajustes(conn, ruta_archivo, table_name="ventas_detalladas"):
+    """
+    Lee y aplica un archivo de ajustes declarados (lo que hace la Fase 2 con un .csv) y, en la
+    misma transacción, los guarda en el registro de ajustes para que la Fase 1 los vuelva a
+    aplicar cuando recargue esos días.
+    """
+    from fase_2_ajustes_db.registro_ajustes import ubicar_facturas, registrar_ajustes
+
+    archivo = os.path.basename(ruta_archivo)
+    print(f"-> Aplicando ajustes declarados en {archivo}...")
+    ajustes = leer_ajustes(ruta_archivo)
+    print(f"Info: {len(ajustes['actualizaciones'])} facturas a actualizar, {len(ajustes['borrados'])} a borrar "
+          f"y {len(ajustes['cargas'])} CSV a cargar.")
+    try:
+        # Los días de cada factura se toman antes de aplicar (un ajuste puede cambiar la fecha)
+        with conn.cursor() as cursor:
+            ubicaciones = ubicar_facturas(cursor, table_name, set(ajustes["actualizaciones"]) | set(ajustes["borrados"]))
+        resumen = aplicar_ajustes(conn, ajustes, table_name, commit=False)
+        with conn.cursor() as cursor:
+            registrados = registrar_ajustes(cursor, archivo, ajustes, ubicaciones)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"ERROR al aplicar los ajustes de {archivo}: {e}")
+        raise
+    print(f"✅ Ajustes aplicados: {resumen['actualizadas']} filas actualizadas, {resumen['borradas']} borradas "
+          f"y {resumen['cargadas']} cargadas ({registrados} ajustes en el registro).")
+    return resumen
@@ -0,0 +1,152 @@
+# Registro persistente de los ajustes de la Fase 2 (tabla 'ventas_ajustes', creada por la migración 0003).
+#
+# Cada ajuste aplicado desde un archivo declarado queda guardado con la empresa y la fecha de las
+# filas que tocó (y la fecha destino si el ajuste cambia la fecha). Cuando la Fase 1 borra y
+# recarga días de 'ventas_detalladas', los ajustes de esos días se vuelven a aplicar en la misma
+# transacción de la carga, así la tabla no pierde las correcciones. Las cargas de CSV ('cargar_csv')
+# se registran con la ruta del archivo y cada (empresa, fecha) de sus filas, sin factura.
+
+from psycopg2 import extras
+
+from fase_2_ajustes_db.ajustes_declarados import aplicar_ajustes, dias_del_csv
+from utils.migraciones import exigir_migracion
+
+tabla_registro_ajustes = "ventas_ajustes"
+
+def _existe_registro(cursor):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (f'public."{tabla_registro_ajustes}"',))
+    return cursor.fetchone()[0]
+
+def ubicar_facturas(cursor, table_name, facturas):
+    """{factura: [(empresa, fecha), ...]} con los días en los que hoy están las filas de cada factura."""
+    if not facturas:
+        return {}
+    cursor.execute(
+        f'SELECT DISTINCT factura, empresa, fecha FROM public."{table_name}" WHERE factura = ANY(%s)',
+        (list(facturas),)
+    )
+    ubicaciones = {}
+    for factura, empresa, fecha in cursor.fetchall():
+        ubicaciones.setdefault(factura, []).append((empresa, fecha))
+    return ubicaciones
+
+def registrar_ajustes(cursor, archivo, ajustes, ubicaciones):
+    """
+    Guarda en el registro los ajustes de un archivo (reemplaza lo registrado antes con el mismo
+    nombre de archivo). 'ubicaciones' son los días de cada factura ANTES de aplicar los ajustes
+    (ver 'ubicar_facturas'). Una factura que no estaba en la tabla se registra sin empresa ni fecha
+    y no se vuelve a aplicar automáticamente. Retorna las filas registradas.
+    """
+    exigir_migracion(cursor, 5) # Tabla del registro, con las cargas de CSV
+    cursor.execute(f'DELETE FROM public."{tabla_registro_ajustes}" WHERE archivo = %s;', (archivo,))
+
+    filas = []
+    for factura, cambios in ajustes["actualizaciones"].items():
+        fecha_destino = cambios.get("fecha")
+        for columna, valor in cambios.items():
+            for empresa, fecha in ubicaciones.get(factura, [(None, None)]):
+                filas.append(("actualizar", factura, columna, valor, empresa, fecha, fecha_destino))
+    for factura in ajustes["borrados"]:
+        for empresa, fecha in ubicaciones.get(factura, [(None, None)]):
+            filas.append(("borrar", factura, None, None, empresa, fecha, None))
+    for ruta_csv in ajustes["cargas"]:
+        for empresa, fecha in dias_del_csv(ruta_csv):
+            filas.append(("cargar_csv", None, None, ruta_csv, empresa, fecha, None))
+
+    motivos = ajustes.get("motivos", {})
+    if filas:
+        extras.execute_values(cursor, f"""
+            INSERT INTO public."{tabla_registro_ajustes}"
+                (archivo, accion, factura, columna, valor, motivo, empresa, fecha, fecha_destino)
+            VALUES %s;
+        """, [
+            (archivo, accion, factura, columna, valor, motivos.get(factura), empresa, fecha, fecha_destino)
+            for accion, factura, columna, valor, empresa, fecha, fecha_destino in filas
+        ], template="(%s, %s, %s, %s, %s, %s, %s, %s::date, %s::date)", page_size=5000)
+    return len(filas)
+
+def ajustes_de_los_dias(cursor, dias, meses, fecha_desde, fecha_hasta):
+    """
+    Arma (con el formato de 'leer_ajustes') los ajustes registrados que tocan los días recargados:
+    'dias' son (empresa, fecha) y 'meses' los primeros días de los meses reemplazados completos.
+    Un ajuste toca un día si su fecha original o su fecha destino cae en él. Si una factura tiene
+    varios ajustes gana el último registrado, como al aplicar los archivos en orden.
+    Retorna (ajustes, movidas, perdidas): las facturas con cambio de fecha cuyo día original se
+    recargó ('movidas') y aquellas de las que solo se recargó el día destino ('perdidas').
+    """
+    cursor.execute(f"""
+        SELECT accion, factura, columna, valor, empresa, fecha, fecha_destino
+        FROM public."{tabla_registro_ajustes}"
+        WHERE fecha BETWEEN %s AND %s OR fecha_destino BETWEEN %s AND %s
+        ORDER BY id;
+    """, (fecha_desde, fecha_hasta, fecha_desde, fecha_hasta))
+
+    ajustes = {"actualizaciones": {}, "borrados": [], "cargas": [], "motivos": {}}
+    movidas, perdidas = set(), set()
+    for accion, factura, columna, valor, empresa, fecha, fecha_destino in cursor.fetchall():
+        origen_recargado = dia_recargado(empresa, fecha, dias, meses)
+        if not (origen_recargado or dia_recargado(empresa, fecha_destino, dias, meses)):
+            continue
+        if accion == "borrar":
+            if factura not in ajustes["borrados"]:
+                ajustes["borrados"].append(factura)
+            continue
+        if accion == "cargar_csv":
+            if valor not in ajustes["cargas"]:
+                ajustes["cargas"].append(valor)
+            continue
+        if columna == "fecha":
+            (movidas if origen_recargado else perdidas).add(factura)
+        ajustes["actualizaciones"].setdefault(factura, {})[columna] = valor
+    return ajustes, movidas, perdidas - movidas
+
+def dia_recargado(empresa, fecha, dias, meses):
+    """True si el (empresa, fecha) está entre los días recargados o en un mes reemplazado completo."""
+    return fecha is not None and ((empresa, fecha) in dias or fecha.replace(day=1) in meses)
+
+def _borrar_copias_movidas(cursor, table_name, facturas, dias, meses):
+    """
+    Las facturas con cambio de fecha cuyo día original se recargó vuelven a estar en ese día (recién
+    cargadas) y además en el día destino, que no se recargó (la copia ajustada de antes). Se borra
+    esa copia vieja para que al volver a aplicar el ajuste no quede duplicada. Retorna las filas borradas.
+    """
+    viejas = [
+        (factura, empresa, fecha)
+        for factura, ubicaciones in ubicar_facturas(cursor, table_name, facturas).items()
+        for empresa, fecha in ubicaciones
+        if not dia_recargado(empresa, fecha, dias, meses)
+    ]
+    if not viejas:
+        return 0
+    extras.execute_values(
+        cursor,
+        f'DELETE FROM public."{table_name}" WHERE (factura, empresa, fecha) IN (VALUES %s);',
+        viejas, template="(%s, %s, %s::date)", page_size=len(viejas)
+    )
+    return cursor.rowcount
+
+def reaplicar_ajustes(conn, table_name, dias, meses, fecha_desde, fecha_hasta):
+    """
+    Vuelve a aplicar, SIN hacer commit (dentro de la transacción de la carga de la Fase 1), los
+    ajustes registrados de los días recargados. De los CSV registrados se cargan de nuevo solo las
+    filas de esos días; si un CSV ya no existe la carga falla y se revierte completa.
+    Retorna el resumen de 'aplicar_ajustes' o None.
+    """
+    meses = set(meses)
+    with conn.cursor() as cursor:
+        if not _existe_registro(cursor):
+            return None
+        ajustes, movidas, perdidas = ajustes_de_los_dias(cursor, dias, meses, fecha_desde, fecha_hasta)
+        if not ajustes["actualizaciones"] and not ajustes["borrados"] and not ajustes["cargas"]:
+            return None
+        print(f"Info: Volviendo a aplicar los ajustes registrados de los días recargados: "
+              f"{len(ajustes['actualizaciones'])} facturas a actualizar, {len(ajustes['borrados'])} a borrar "
+              f"y {len(ajustes['cargas'])} CSV a cargar.")
+        if movidas:
+            borradas = _borrar_copias_movidas(cursor, table_name, movidas, dias, meses)
+            if borradas:
+                print(f"Info: {borradas} filas de la fecha anterior de facturas con cambio de fecha reemplazadas por las recién cargadas.")
+        if perdidas:
+            print(f"ADVERTENCIA: Se recargó el día destino pero no el día original de {len(perdidas)} facturas con cambio de fecha "
+                  f"({', '.join(sorted(perdidas)[:10])}); recargue también su día original para recuperarlas.")
+    return aplicar_ajustes(conn, ajustes, table_name, commit=False, dias_cargas=(dias, meses))
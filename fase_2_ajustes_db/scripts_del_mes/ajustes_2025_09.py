@@ -1,50 +0,0 @@
-import os
-
-# ¡Ya no importamos psycopg2 ni nos conectamos aquí!
-
-def ejecutar_ajustes(conn):
-    """
-    Aplica los ajustes de SQL y carga el CSV de Septiembre 2025.
-    La conexión 'conn' es proporcionada por main.py.
-    """
-    print("-> Aplicando ajustes de Septiembre 2025 (SQLs + Carga CSV)...")
-    
-    # Lista de sentencias SQL a ejecutar
-    sql_statements = [
-        # Problemas de transmisión a la DIAN...
-        """UPDATE ventas_detalladas SET fecha = '2025-08-29' WHERE factura = 'DVFECA1138408';""",
-        # ... (todas tus otras sentencias UPDATE y DELETE) ...
-        """DELETE FROM ventas_detalladas WHERE factura IN (
-            'FVFECA1334420', 'FVFECA1334419', 'FVFECA1334392', 'FVFECA1334376'
-        );""",
-    ]
-
-    # --- Manejo del CSV ---
-    # 1. Obtenemos la ruta del directorio DONDE ESTÁ ESTE SCRIPT
-    script_dir = os.path.dirname(__file__)
-    # 2. Construimos la ruta al CSV (que debe estar al lado del script)
-    csv_path = os.path.join(script_dir, "ajustes_septiembre.csv")
-
-    if not os.path.exists(csv_path):
-        print(f"ERROR: No se encontró el archivo CSV en {csv_path}")
-        raise FileNotFoundError(f"El archivo {csv_path} no existe.")
-
-    # Usamos la conexión que nos pasaron
-    with conn.cursor() as cur:
-        try:
-            print(f"Ejecutando {len(sql_statements)} sentencias SQL...")
-            for stmt in sql_statements:
-                cur.execute(stmt)
-            
-            print(f"Cargando CSV desde {csv_path}...")
-            with open(csv_path, "r", encoding="utf-8") as f:
-                next(f)  # saltar encabezado
-                cur.copy_expert("COPY ventas_detalladas FROM STDIN WITH CSV", f)
-
-            conn.commit()
-            print("✅ Correcciones de Septiembre aplicadas exitosamente (SQLs + CSV).")
-
-        except Exception as e:
-            print(f"ERROR al aplicar ajustes de Septiembre: {e}")
-            conn.rollback() # Revertimos si algo falla
-            raise # Relanzamos el error para que main.py lo sepa
\ No newline at end of file
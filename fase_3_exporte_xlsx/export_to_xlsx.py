@@ -1,29 +1,25 @@
-from sqlalchemy import create_engine
 import pandas as pd
 import sys
 import os
 import calendar
 import locale
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import date
+from itertools import groupby
+from operator import itemgetter
 
 # Añadimos la ruta raíz del proyecto al path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config # Importamos nuestras configuraciones
-
-def get_db_engine():
-    """
-    Crea y retorna un engine de SQLAlchemy a partir de config.db_config.
-    """
-    try:
-        db = config.db_config
-        if not db.get("password"):
-            raise ValueError("La contraseña de la BD no está en config.py")
-        
-        db_url = f"postgresql://{db['user']}:{db['password']}@{db['host']}:{db['port']}/{db['dbname']}"
-        return create_engine(db_url)
-    except Exception as e:
-        print(f"Error al crear el engine de SQLAlchemy: {e}")
-        return None
+from utils.landing import leer_landing
+from utils.db_utils import get_db_connection, iterar_filas_en_lotes
+from utils.excel_streaming import escribir_xlsx_por_lotes, anexar_filas_xlsx
+from fase_1_extraccion_ventas.cargar_ventas_api import columnas_ventas_detalladas
+from fase_3_exporte_xlsx.manifiesto_exporte import (
+    huellas_por_dia, leer_manifiesto, guardar_manifiesto, descartar_manifiesto, planear_exporte
+)
 
 def get_month_details(mes, anio):
     """
@@ -50,76 +46,358 @@ def get_month_details(mes, anio):
     
     return fecha_inicio, fecha_fin, nombre_mes, str(mes).zfill(2)
 
-def ejecutar_fase_3(mes, anio):
+def leer_ventas_landing(empresas, fecha_inicio, fecha_fin):
     """
-    Orquesta la Fase 3: Exportación de datos a Excel.
-    Esta función es llamada por main.py
+    Lee las ventas de las empresas desde la zona de aterrizaje (Parquet), con las columnas en el
+    mismo orden de 'ventas_detalladas'. Son los datos tal como se extrajeron: sin los ajustes de la Fase 2.
     """
-    print(f"\n=== INICIO FASE 3: EXPORTACIÓN A EXCEL (Mes: {mes}, Año: {anio}) ===")
+    df = leer_landing("ventas", list(empresas), fecha_inicio, fecha_fin, incluir_sin_fecha=False)
+    if df is None:
+        return pd.DataFrame()
+    df = df.reindex(columns=[col for col, _ in columnas_ventas_detalladas])
+    df['fecha'] = df['fecha'].dt.date # Igual que al leer la columna DATE de la BD
+    return df
 
-    # 1. Validar que las rutas de exportación existan en config
-    if not hasattr(config, 'rutas_exportacion') or not config.rutas_exportacion:
-        print("ERROR: 'rutas_exportacion' no está definido en config.py")
-        print("Por favor, añade un diccionario 'rutas_exportacion' a tu config.py")
-        return
+def _nuevo_resultado(empresa, anio, mes_num, ruta_archivo, error=None):
+    """Resultado de la exportación de un archivo (una empresa en un mes)."""
+    return {
+        "empresa": empresa, "mes": f"{anio}-{mes_num}", "ruta": ruta_archivo, "modo": "completo",
+        "filas": 0, "escritas": 0, "hojas": 0, "bytes": 0, "segundos": 0.0, "error": error
+    }
 
-    # 2. Obtener detalles del mes y motor de BD
-    fecha_inicio, fecha_fin, nombre_mes, mes_num_str = get_month_details(mes, anio)
-    engine = get_db_engine()
-    
-    if not engine:
-        print("ERROR: No se pudo conectar a la base de datos. Abortando exportación.")
-        return
+def _resultados_con_error(mes, anio, rutas, error):
+    """Resultados de todos los archivos de un mes cuyo proceso falló."""
+    mes_num = str(mes).zfill(2)
+    return [_nuevo_resultado(empresa, anio, mes_num, ruta, str(error)) for empresa, ruta in rutas.items()]
+
+def _actualizar_manifiesto(ruta_archivo, columnas, dias, filas, hojas):
+    """
+    Guarda el manifiesto del archivo recién escrito si corresponde a lo escrito (una hoja y las
+    filas de los días); si no, lo borra para que la próxima exportación sea completa.
+    """
+    try:
+        if dias is not None and hojas == 1 and filas == sum(filas_dia for _, filas_dia, _ in dias):
+            guardar_manifiesto(ruta_archivo, columnas, dias)
+        else:
+            descartar_manifiesto(ruta_archivo)
+    except OSError as e:
+        print(f"ADVERTENCIA: No se pudo actualizar el manifiesto de {os.path.basename(ruta_archivo)} ({e}).")
 
-    print(f"Exportando rango: {fecha_inicio} al {fecha_fin} (Mes: {nombre_mes})")
+def _escribir_archivo(resultado, columnas, lotes_filas, dias=None):
+    """
+    Escribe el .xlsx completo de un resultado y anota filas, hojas, bytes y segundos.
+    'dias' son las huellas por día de lo escrito, para su manifiesto (None = sin manifiesto).
+    Un error queda en el resultado y no se relanza: un archivo que falla no detiene a los demás.
+    """
+    inicio = time.perf_counter()
+    try:
+        directorio_destino = os.path.dirname(resultado["ruta"])
+        if directorio_destino:
+            os.makedirs(directorio_destino, exist_ok=True)
+        filas, hojas = escribir_xlsx_por_lotes(resultado["ruta"], columnas, lotes_filas)
+        resultado.update(filas=filas, escritas=filas, hojas=hojas, bytes=os.path.getsize(resultado["ruta"]))
+        _actualizar_manifiesto(resultado["ruta"], columnas, dias, filas, hojas)
+    except Exception as e:
+        resultado["error"] = str(e)
+    resultado["segundos"] += time.perf_counter() - inicio
 
+def _anexar_archivo(resultado, columnas, lotes_filas, fila_corte, dias):
+    """
+    Reescribe el archivo solo desde 'fila_corte' (el primer día nuevo o con cambios) con las filas
+    recibidas y actualiza su manifiesto. Si falla, el archivo queda como estaba y se borra el
+    manifiesto: la próxima exportación lo escribe completo.
+    """
+    inicio = time.perf_counter()
     try:
-        # 3. Iterar sobre las plantillas de ruta en config
-        for empresa, plantilla_ruta in config.rutas_exportacion.items():
-            
-            # 4. Crear la ruta de archivo final
-            try:
-                ruta_archivo = plantilla_ruta.format(
-                    mes_num=mes_num_str,
-                    mes_nombre=nombre_mes,
-                    anio=anio
-                )
-            except KeyError as e:
-                print(f"ADVERTENCIA: La plantilla de ruta para '{empresa}' tiene una clave desconocida: {e}")
-                print(f"Plantilla: {plantilla_ruta}")
-                continue # Saltar a la siguiente empresa
-
-            # 5. Asegurarse de que el directorio de destino exista
-            directorio_destino = os.path.dirname(ruta_archivo)
-            if not os.path.exists(directorio_destino):
-                os.makedirs(directorio_destino)
-                print(f"Info: Se ha creado el directorio: {directorio_destino}")
-
-            # --- ¡CORRECCIÓN DE SEGURIDAD! ---
-            # Usamos una consulta parametrizada en lugar de f-strings
-            # para prevenir Inyección SQL.
-            query = """
-                SELECT * FROM ventas_detalladas 
-                WHERE empresa = %(empresa_param)s 
-                AND fecha BETWEEN %(inicio_param)s AND %(fin_param)s
+        escritas = anexar_filas_xlsx(resultado["ruta"], fila_corte, columnas, lotes_filas)
+        filas = fila_corte - 2 + escritas
+        resultado.update(filas=filas, escritas=escritas, hojas=1, bytes=os.path.getsize(resultado["ruta"]))
+        _actualizar_manifiesto(resultado["ruta"], columnas, dias, filas, 1)
+    except Exception as e:
+        resultado["error"] = str(e)
+        descartar_manifiesto(resultado["ruta"])
+    resultado["segundos"] += time.perf_counter() - inicio
+
+def _planear_archivos(resultados, dias, columnas, fecha_inicio):
+    """
+    Decide con los manifiestos qué hacer con cada archivo del mes (ver 'planear_exporte').
+    Retorna ({empresa: fecha desde la que se leen sus filas}, {empresa: fila de corte de los incrementales}).
+    Los archivos sin cambios quedan resueltos en su resultado y las empresas sin datos no se leen.
+    """
+    desde, cortes = {}, {}
+    for empresa, resultado in resultados.items():
+        if dias is None:
+            desde[empresa] = fecha_inicio
+            continue
+        if empresa not in dias:
+            continue # Sin datos en el mes
+        modo, fila_corte, fecha_desde = planear_exporte(leer_manifiesto(resultado["ruta"]), dias[empresa], columnas)
+        resultado["modo"] = modo
+        if modo == "sin cambios":
+            filas = sum(filas_dia for _, filas_dia, _ in dias[empresa])
+            resultado.update(filas=filas, hojas=1, bytes=os.path.getsize(resultado["ruta"]))
+        elif modo == "incremental":
+            cortes[empresa] = fila_corte
+            if fecha_desde:
+                desde[empresa] = fecha_desde
+        else:
+            desde[empresa] = fecha_inicio
+    return desde, cortes
+
+def _exportar_mes_desde_bd(conn, fecha_inicio, fecha_fin, resultados):
+    """
+    Lee el mes UNA sola vez para todas las empresas con un cursor del lado del servidor, ordenado
+    por empresa y fecha: las filas llegan en lotes de config.exportacion_tamano_lote y cada empresa
+    se escribe a su archivo a medida que llegan, así la memoria no depende del tamaño del mes.
+    Con config.exportacion_incremental, de cada archivo que ya existe con su manifiesto solo se
+    leen y reescriben los días desde el primero nuevo o con cambios.
+    """
+    tamano_lote = config.exportacion_tamano_lote
+    # Columnas del archivo, en orden (sin el 'id_linea' que agrega la vista del modelo normalizado)
+    columnas = [col for col, _ in columnas_ventas_detalladas]
+    try:
+        with conn.cursor() as cursor:
+            # Las huellas y las filas se leen de la misma foto de la BD: el manifiesto corresponde al archivo
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY;")
+            dias = huellas_por_dia(cursor, resultados, fecha_inicio, fecha_fin, columnas) if config.exportacion_incremental else None
+
+        desde, cortes = _planear_archivos(resultados, dias, columnas, fecha_inicio)
+        if desde:
+            # Los valores van como parámetros para prevenir Inyección SQL (el f-string solo pone las columnas).
+            query = f"""
+                SELECT {', '.join(f'v."{col}"' for col in columnas)} FROM ventas_detalladas AS v
+                JOIN unnest(%(empresas_param)s::text[], %(desde_param)s::date[]) AS d(empresa, desde)
+                    ON v.empresa = d.empresa AND v.fecha >= d.desde
+                WHERE v.fecha BETWEEN %(inicio_param)s AND %(fin_param)s
+                ORDER BY v.empresa, v.fecha
             """
             params = {
-                "empresa_param": empresa,
+                "empresas_param": list(desde),
+                "desde_param": list(desde.values()),
                 "inicio_param": fecha_inicio,
                 "fin_param": fecha_fin
             }
-            
-            print(f"\nConsultando datos para: {empresa}...")
-            df = pd.read_sql(query, engine, params=params)
+            # Un cursor con nombre es un cursor del servidor: fetchmany trae solo el siguiente lote
+            with conn.cursor(name="exporte_ventas") as cursor:
+                cursor.itersize = tamano_lote
+                cursor.execute(query, params)
+
+                def filas():
+                    lote = cursor.fetchmany(tamano_lote)
+                    while lote:
+                        yield from lote
+                        lote = cursor.fetchmany(tamano_lote)
 
-            if not df.empty:
-                # 7. Exportar a Excel
-                df.to_excel(ruta_archivo, index=False)
-                print(f"¡ÉXITO! Datos de {empresa} exportados a {ruta_archivo}")
-            else:
-                print(f"Info: No hay datos para exportar de {empresa} en el rango seleccionado.")
+                # Las filas vienen agrupadas por empresa; si un archivo falla, groupby salta el resto de su grupo
+                for empresa, filas_empresa in groupby(filas(), key=itemgetter(columnas.index("empresa"))):
+                    if empresa in cortes:
+                        _anexar_archivo(resultados[empresa], columnas, [filas_empresa], cortes.pop(empresa), dias[empresa])
+                    else:
+                        _escribir_archivo(resultados[empresa], columnas, [filas_empresa], dias[empresa] if dias else None)
 
+        # Archivos a los que solo hay que quitarles días del final
+        for empresa, fila_corte in cortes.items():
+            _anexar_archivo(resultados[empresa], columnas, [], fila_corte, dias[empresa])
+    finally:
+        conn.rollback() # Cierra la transacción de lectura del cursor
+
+def _exportar_mes_desde_landing(fecha_inicio, fecha_fin, resultados):
+    """
+    Igual que '_exportar_mes_desde_bd' pero con los datos de la zona de aterrizaje (una lectura
+    para todas las empresas). Siempre escribe los archivos completos y sin manifiesto.
+    """
+    df = leer_ventas_landing(resultados, fecha_inicio, fecha_fin)
+    if df.empty:
+        return
+    columnas = list(df.columns)
+    for empresa, df_empresa in df.groupby('empresa', sort=False):
+        _escribir_archivo(resultados[empresa], columnas, iterar_filas_en_lotes(df_empresa, config.exportacion_tamano_lote))
+
+def exportar_mes(mes, anio, rutas, desde_landing=False):
+    """
+    Exporta un mes de todas las empresas de 'rutas' ({empresa: ruta del archivo}).
+    Es la unidad de trabajo de 'ejecutar_fase_3_rango' (en los procesos, con una sola empresa):
+    abre su propia conexión y nunca lanza excepciones. Retorna la lista de resultados, uno por archivo; una empresa sin datos
+    en el mes queda con 0 filas y no se crea su archivo.
+    """
+    fecha_inicio, fecha_fin, _, mes_num = get_month_details(mes, anio)
+    resultados = {empresa: _nuevo_resultado(empresa, anio, mes_num, ruta) for empresa, ruta in rutas.items()}
+    conn = None
+    try:
+        if desde_landing:
+            _exportar_mes_desde_landing(fecha_inicio, fecha_fin, resultados)
+        else:
+            conn = get_db_connection()
+            if not conn:
+                raise ConnectionError("No se pudo conectar a la base de datos.")
+            _exportar_mes_desde_bd(conn, fecha_inicio, fecha_fin, resultados)
     except Exception as e:
-        print(f"ERROR Inesperado durante la exportación: {e}")
-    
-    print("\n== FIN FASE 3: Exportación a Excel ==\n")
\ No newline at end of file
+        # Falló la lectura del mes: los archivos ya escritos se conservan, los pendientes quedan con error
+        for resultado in resultados.values():
+            if not resultado["filas"] and not resultado["error"]:
+                resultado["error"] = str(e)
+    finally:
+        if conn:
+            conn.close()
+    return list(resultados.values())
+
+def _meses_del_rango(mes_inicio, anio_inicio, mes_fin, anio_fin):
+    """Lista de (mes, anio) desde el mes inicial hasta el final, ambos incluidos."""
+    meses = []
+    mes, anio = mes_inicio, anio_inicio
+    while (anio, mes) <= (anio_fin, mes_fin):
+        meses.append((mes, anio))
+        mes, anio = (1, anio + 1) if mes == 12 else (mes + 1, anio)
+    return meses
+
+def _rutas_del_mes(mes, anio, rutas_exportacion):
+    """
+    Arma las rutas de los archivos del mes con las plantillas de config.
+    Retorna ({empresa: ruta}, resultados con error de las plantillas que tienen claves desconocidas).
+    """
+    _, _, nombre_mes, mes_num_str = get_month_details(mes, anio)
+    rutas, fallidas = {}, []
+    for empresa, plantilla_ruta in rutas_exportacion.items():
+        try:
+            rutas[empresa] = plantilla_ruta.format(
+                mes_num=mes_num_str,
+                mes_nombre=nombre_mes,
+                anio=anio
+            )
+        except KeyError as e:
+            print(f"ADVERTENCIA: La plantilla de ruta para '{empresa}' tiene una clave desconocida: {e}")
+            print(f"Plantilla: {plantilla_ruta}")
+            fallidas.append(_nuevo_resultado(empresa, anio, mes_num_str, plantilla_ruta, f"Clave desconocida en la plantilla: {e}"))
+    return rutas, fallidas
+
+def _imprimir_resultados_mes(resultados):
+    """Mensajes por archivo de un mes terminado."""
+    for resultado in resultados:
+        empresa, ruta_archivo = resultado["empresa"], resultado["ruta"]
+        if resultado["error"]:
+            print(f"ERROR al exportar {empresa} ({resultado['mes']}): {resultado['error']}")
+        elif resultado["modo"] == "sin cambios":
+            print(f"Info: {ruta_archivo} ya está al día ({resultado['filas']} registros de {empresa}); no se reescribe.")
+        elif resultado["modo"] == "incremental":
+            print(f"¡ÉXITO! {resultado['escritas']} registros de {empresa} de los días nuevos o con cambios escritos en "
+                  f"{ruta_archivo} ({resultado['filas']} en total)")
+        elif resultado["filas"]:
+            detalle_hojas = f" en {resultado['hojas']} hojas (límite de filas de Excel)" if resultado["hojas"] > 1 else ""
+            print(f"¡ÉXITO! {resultado['filas']} registros de {empresa} exportados a {ruta_archivo}{detalle_hojas}")
+        else:
+            print(f"Info: No hay datos para exportar de {empresa} en {resultado['mes']}.")
+
+def _imprimir_resumen_exporte(resultados, segundos_totales):
+    """Imprime filas (totales y escritas), bytes y segundos de cada archivo exportado."""
+    print("\n--- Resumen de exportación por archivo ---")
+    print(f"  {'Mes':<8} {'Empresa':<8} {'Estado':<9} {'Modo':<11} {'Filas':>9} {'Escritas':>9} {'Bytes':>13} {'Segundos':>9}")
+    for resultado in resultados:
+        estado = "ERROR" if resultado["error"] else ("OK" if resultado["filas"] else "SIN DATOS")
+        print(f"  {resultado['mes']:<8} {resultado['empresa']:<8} {estado:<9} {resultado['modo']:<11} {resultado['filas']:>9} "
+              f"{resultado['escritas']:>9} {resultado['bytes']:>13,} {resultado['segundos']:>9.1f}")
+    fallidos = sum(1 for resultado in resultados if resultado["error"])
+    print(f"  Archivos: {len(resultados)} ({fallidos} con error). Tiempo total de exportación: {segundos_totales:.1f} s")
+
+def ejecutar_fase_3_rango(mes_inicio, anio_inicio, mes_fin, anio_fin, empresas=None, desde_landing=False):
+    """
+    Orquesta la Fase 3 para un rango de meses: un archivo por empresa y mes.
+    Los archivos se exportan en paralelo en procesos separados (config.exportacion_procesos),
+    porque escribir el .xlsx usa CPU: cada (mes, empresa) es un trabajo del pool, así la empresa
+    más grande de un mes no deja esperando a las demás. En un solo proceso cada mes se lee una
+    vez para todas las empresas.
+    Un archivo que falla no detiene a los demás; al final se imprime el resumen por archivo.
+    :param empresas: lista de empresas de config.rutas_exportacion a exportar (None = todas).
+    :param desde_landing: True para exportar desde la zona de aterrizaje (Parquet) en lugar de la BD.
+                          Ojo: esos datos no tienen los ajustes de la Fase 2.
+    Retorna la lista de resultados por archivo.
+    """
+    if (mes_inicio, anio_inicio) == (mes_fin, anio_fin):
+        print(f"\n=== INICIO FASE 3: EXPORTACIÓN A EXCEL (Mes: {mes_inicio}, Año: {anio_inicio}) ===")
+    else:
+        print(f"\n=== INICIO FASE 3: EXPORTACIÓN A EXCEL (Desde: {mes_inicio}/{anio_inicio}, Hasta: {mes_fin}/{anio_fin}) ===")
+
+    # 1. Validar que las rutas de exportación existan en config
+    if not hasattr(config, 'rutas_exportacion') or not config.rutas_exportacion:
+        print("ERROR: 'rutas_exportacion' no está definido en config.py")
+        print("Por favor, añade un diccionario 'rutas_exportacion' a tu config.py")
+        return []
+
+    rutas_exportacion = config.rutas_exportacion
+    if empresas:
+        desconocidas = [empresa for empresa in empresas if empresa not in rutas_exportacion]
+        if desconocidas:
+            print(f"ADVERTENCIA: Empresas sin ruta en 'rutas_exportacion': {', '.join(desconocidas)}")
+        rutas_exportacion = {empresa: plantilla for empresa, plantilla in rutas_exportacion.items() if empresa in empresas}
+        if not rutas_exportacion:
+            print("ERROR: Ninguna de las empresas seleccionadas tiene ruta de exportación.")
+            return []
+
+    meses = _meses_del_rango(mes_inicio, anio_inicio, mes_fin, anio_fin)
+    if not meses:
+        print("ERROR: El mes final no puede ser anterior al mes inicial.")
+        return []
+    if desde_landing:
+        print("ADVERTENCIA: Se exporta desde la zona de aterrizaje; los datos no incluyen los ajustes de la Fase 2.")
+
+    # 2. Las rutas de cada mes y un trabajo por archivo (mes, empresa) para el pool
+    resultados, meses_rutas = [], []
+    for mes, anio in meses:
+        rutas, fallidas = _rutas_del_mes(mes, anio, rutas_exportacion)
+        resultados.extend(fallidas)
+        if rutas:
+            meses_rutas.append((mes, anio, rutas))
+    trabajos = [(mes, anio, {empresa: ruta}) for mes, anio, rutas in meses_rutas for empresa, ruta in rutas.items()]
+
+    # 3. Exportar: en el mismo proceso (un mes a la vez) o en un pool de procesos (un archivo por trabajo)
+    inicio_total = time.perf_counter()
+    procesos = max(1, min(config.exportacion_procesos or os.cpu_count() or 1, len(trabajos)))
+    if procesos == 1:
+        for mes, anio, rutas in meses_rutas:
+            print(f"\nExportando {mes}/{anio} ({len(rutas)} empresas)...")
+            resultados_mes = exportar_mes(mes, anio, rutas, desde_landing)
+            _imprimir_resultados_mes(resultados_mes)
+            resultados.extend(resultados_mes)
+    else:
+        print(f"Info: Exportando {len(trabajos)} archivos de {len(meses_rutas)} meses con {procesos} procesos.")
+        reintentos = []
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            futuros = [(executor.submit(exportar_mes, mes, anio, rutas, desde_landing), (mes, anio, rutas)) for mes, anio, rutas in trabajos]
+            for futuro, trabajo in futuros:
+                try:
+                    resultados_mes = futuro.result()
+                except BrokenProcessPool:
+                    reintentos.append(trabajo)
+                    continue
+                except Exception as e:
+                    resultados_mes = _resultados_con_error(*trabajo, e)
+                _imprimir_resultados_mes(resultados_mes)
+                resultados.extend(resultados_mes)
+
+        # Un proceso que termina de forma anormal rompe el pool y cancela los archivos pendientes:
+        # esos se reintentan cada uno en su propio proceso, así solo falla el archivo que lo causó
+        if reintentos:
+            print(f"ADVERTENCIA: Un proceso de exportación terminó de forma anormal. Reintentando {len(reintentos)} archivos uno por uno...")
+        for mes, anio, rutas in reintentos:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                try:
+                    resultados_mes = executor.submit(exportar_mes, mes, anio, rutas, desde_landing).result()
+                except Exception as e:
+                    resultados_mes = _resultados_con_error(mes, anio, rutas, e)
+            _imprimir_resultados_mes(resultados_mes)
+            resultados.extend(resultados_mes)
+
+    orden_empresas = list(rutas_exportacion)
+    resultados.sort(key=lambda resultado: (resultado["mes"], orden_empresas.index(resultado["empresa"])))
+    _imprimir_resumen_exporte(resultados, time.perf_counter() - inicio_total)
+
+    print("\n== FIN FASE 3: Exportación a Excel ==\n")
+    return resultados
+
+def ejecutar_fase_3(mes, anio, desde_landing=False):
+    """
+    Orquesta la Fase 3: Exportación de datos a Excel.
+    Esta función es llamada por main.py
+    :param desde_landing: True para exportar desde la zona de aterrizaje (Parquet) en lugar de la BD.
+                          Ojo: esos datos no tienen los ajustes de la Fase 2.
+    """
+    return ejecutar_fase_3_rango(mes, anio, mes, anio, desde_landing=desde_landing)
@@ -0,0 +1,108 @@
+# Manifiesto de cada archivo exportado por la Fase 3 (exporte incremental).
+#
+# Junto a cada .xlsx se guarda '<archivo>.xlsx.manifiesto.json' con los días que contiene, en el
+# orden en que están en la hoja: [fecha, filas, huella]. La huella de un día es la suma de los
+# hashes de sus filas calculada en la BD, así que cambia si se agrega, borra o modifica cualquier
+# fila de ese día (también por los ajustes de la Fase 2). En la siguiente exportación del mes se
+# comparan las huellas: los días del principio que no cambiaron se dejan como están en el archivo
+# y solo se reescribe desde el primer día nuevo o con cambios.
+#
+# El manifiesto guarda también el tamaño y la fecha de modificación del .xlsx: si alguien abre y
+# guarda el archivo en Excel ya no coinciden y el archivo se vuelve a escribir completo.
+
+import json
+import os
+
+from utils.excel_streaming import MAX_FILAS_EXCEL
+
+VERSION_MANIFIESTO = 1
+
+def ruta_manifiesto(ruta_archivo):
+    return ruta_archivo + ".manifiesto.json"
+
+def huellas_por_dia(cursor, empresas, fecha_inicio, fecha_fin, columnas):
+    """
+    {empresa: [[fecha 'AAAA-MM-DD', filas, huella], ...]} de 'ventas_detalladas' en el rango,
+    ordenado por fecha. Se calcula en la BD sin traer las filas y solo sobre 'columnas' (las que
+    van al archivo; el 'id_linea' del modelo normalizado cambia cada vez que se recarga un día).
+    """
+    fila = ', '.join(f'v."{col}"' for col in columnas)
+    cursor.execute(f"""
+        SELECT v.empresa, v.fecha, count(*), sum(hashtextextended(ROW({fila})::text, 0))
+        FROM ventas_detalladas AS v
+        WHERE v.empresa = ANY(%s) AND v.fecha BETWEEN %s AND %s
+        GROUP BY v.empresa, v.fecha
+        ORDER BY v.empresa, v.fecha;
+    """, (list(empresas), fecha_inicio, fecha_fin))
+    dias = {}
+    for empresa, fecha, filas, huella in cursor.fetchall():
+        dias.setdefault(empresa, []).append([fecha.isoformat(), filas, str(huella)])
+    return dias
+
+def leer_manifiesto(ruta_archivo):
+    """
+    Lee el manifiesto del archivo. Retorna None si no hay, si no se puede leer o si el .xlsx ya no
+    es el que se escribió (otro tamaño o fecha de modificación).
+    """
+    ruta = ruta_manifiesto(ruta_archivo)
+    if not os.path.exists(ruta) or not os.path.exists(ruta_archivo):
+        return None
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"ADVERTENCIA: No se pudo leer el manifiesto de {os.path.basename(ruta_archivo)} ({e}). Se exportará completo.")
+        return None
+    estado = os.stat(ruta_archivo)
+    if (manifiesto.get("version") != VERSION_MANIFIESTO
+            or manifiesto.get("tamano") != estado.st_size
+            or manifiesto.get("modificado") != estado.st_mtime_ns):
+        return None
+    return manifiesto
+
+def guardar_manifiesto(ruta_archivo, columnas, dias):
+    """Guarda el manifiesto de un archivo recién escrito (archivo temporal y renombrado)."""
+    estado = os.stat(ruta_archivo)
+    manifiesto = {
+        "version": VERSION_MANIFIESTO,
+        "tamano": estado.st_size,
+        "modificado": estado.st_mtime_ns,
+        "columnas": list(columnas),
+        "dias": dias
+    }
+    ruta = ruta_manifiesto(ruta_archivo)
+    ruta_temporal = ruta + ".tmp"
+    with open(ruta_temporal, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False)
+    os.replace(ruta_temporal, ruta)
+
+def descartar_manifiesto(ruta_archivo):
+    """Borra el manifiesto (la próxima exportación del archivo será completa)."""
+    ruta = ruta_manifiesto(ruta_archivo)
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+def planear_exporte(manifiesto, dias, columnas):
+    """
+    Decide cómo exportar un archivo comparando su manifiesto con los días actuales de la BD.
+    Retorna (modo, fila_corte, fecha_desde):
+    - ('completo', None, None): no hay manifiesto válido o cambiaron las columnas.
+    - ('sin cambios', None, None): el archivo ya tiene exactamente esos días.
+    - ('incremental', fila_corte, fecha_desde): se conservan las filas anteriores a 'fila_corte'
+      y se escriben los días desde 'fecha_desde' (None si solo hay que quitar días del final).
+    """
+    if manifiesto is None or manifiesto["columnas"] != list(columnas):
+        return "completo", None, None
+    if sum(filas for _, filas, _ in dias) + 1 > MAX_FILAS_EXCEL:
+        return "completo", None, None # El archivo ocupa varias hojas
+
+    anteriores = manifiesto["dias"]
+    iguales = 0
+    while iguales < min(len(anteriores), len(dias)) and anteriores[iguales] == dias[iguales]:
+        iguales += 1
+    if iguales == len(anteriores) == len(dias):
+        return "sin cambios", None, None
+
+    fila_corte = 2 + sum(filas for _, filas, _ in dias[:iguales])
+    fecha_desde = dias[iguales][0] if iguales < len(dias) else None
+    return "incremental", fila_corte, fecha_desde
@@ -10,6 +10,8 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 try:
     from utils import user_inputs 
     from utils.db_utils import get_db_connection
+    from utils.migraciones import aplicar_migraciones, verificar_esquema, esquema_al_dia
+    import config
 except ImportError as e:
     print(f"Error: No se pudieron importar las utilidades. Revisa tu archivo .env y la estructura.")
     print(f"Detalle: {e}")
@@ -19,12 +21,15 @@ except ImportError as e:
 try:
     # FASE 1 - VENTAS (Renombrada)
     from fase_1_extraccion_ventas.cargar_ventas_api import ejecutar_fase_1 as ejecutar_fase_1_ventas 
+    from fase_1_extraccion_ventas.cargar_ventas_api import migrar_ventas_a_particiones, hay_corrida_pendiente, normalizar_ventas_detalladas
     # FASE 1 - INVENTARIO
     from fase_1_extraccion_inventario.cargar_inventario_api import ejecutar_fase_1_inventario
     # FASE 1 - TERCEROS (¡NUEVO!)
     from fase_1_extraccion_terceros.cargar_terceros_api import ejecutar_fase_1_terceros
+    # FASE 2 - AJUSTES DECLARADOS (.csv)
+    from fase_2_ajustes_db.ajustes_declarados import ejecutar_archivo_ajustes
     # FASE 3
-    from fase_3_exporte_xlsx.export_to_xlsx import ejecutar_fase_3
+    from fase_3_exporte_xlsx.export_to_xlsx import ejecutar_fase_3_rango
 except ImportError as e:
     print(f"Error: No se pudo importar un módulo de fase. ¿Revisaste las rutas?")
     print(f"Detalle: {e}")
@@ -45,16 +50,36 @@ def mostrar_menu_principal():
     print("--- 3. Mantenimiento ---")
     print("[5] Ejecutar solo Fase 2: Ajustes de Base de Datos")
     print("[6] Ejecutar solo Fase 3: Exportar Ventas a Excel")
-    print("[7] Salir")
+    print("[7] Migrar 'ventas_detalladas' a tabla particionada por mes")
+    print("[8] Normalizar 'ventas_detalladas' (dimensiones de clientes, productos y vendedores)")
+    print("[9] Aplicar migraciones de la BD (tablas e índices)")
+    print("[10] Salir")
     print("-"*40)
     return input("Elige una opción: ").strip()
 
+# 'python main.py --resume' reanuda sin preguntar las corridas de ventas que quedaron a medias
+reanudar_siempre = "--resume" in sys.argv
+# 'python main.py --desde-landing' carga y exporta desde la zona de aterrizaje (Parquet), sin consultar la API
+desde_landing = "--desde-landing" in sys.argv
+
+def preguntar_reanudar(fecha_ini, fecha_fin):
+    """Si una corrida del mismo rango quedó interrumpida, pregunta si se reanuda."""
+    if not hay_corrida_pendiente(fecha_ini, fecha_fin):
+        return False
+    if reanudar_siempre:
+        return True
+    respuesta = input("Hay una extracción interrumpida para este rango. ¿Reanudarla? (s/n): ").strip().lower()
+    return respuesta == 's'
+
 def correr_fase_1_ventas():
     """Pide fechas y ejecuta la Fase 1 de Ventas."""
     try:
         fecha_ini, fecha_fin = user_inputs.pedir_rango_fechas()
         if fecha_ini and fecha_fin:
-            ejecutar_fase_1_ventas(fecha_ini, fecha_fin)
+            if desde_landing:
+                ejecutar_fase_1_ventas(fecha_ini, fecha_fin, desde_landing=True)
+            else:
+                ejecutar_fase_1_ventas(fecha_ini, fecha_fin, reanudar=preguntar_reanudar(fecha_ini, fecha_fin))
     except Exception as e:
         print(f"ERROR INESPERADO en Fase 1 - Ventas: {e}")
 
@@ -76,16 +101,20 @@ def correr_fase_2():
             print("ERROR: No se pudo obtener conexión a la BD para la Fase 2.")
             return
 
-        module_name = os.path.basename(script_path).replace('.py', '')
-        spec = importlib.util.spec_from_file_location(module_name, script_path)
-        script_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(script_module)
-
-        if hasattr(script_module, 'ejecutar_ajustes'):
-            script_module.ejecutar_ajustes(conn) 
+        # Los ajustes declarados (.csv) se aplican con el motor de ajustes; los .py se importan y ejecutan
+        if script_path.lower().endswith('.csv'):
+            ejecutar_archivo_ajustes(conn, script_path)
         else:
-            print(f"ERROR: El script {script_path} no tiene una función 'ejecutar_ajustes(conn)'.")
-            conn.rollback() 
+            module_name = os.path.basename(script_path).replace('.py', '')
+            spec = importlib.util.spec_from_file_location(module_name, script_path)
+            script_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(script_module)
+
+            if hasattr(script_module, 'ejecutar_ajustes'):
+                script_module.ejecutar_ajustes(conn) 
+            else:
+                print(f"ERROR: El script {script_path} no tiene una función 'ejecutar_ajustes(conn)'.")
+                conn.rollback() 
 
     except Exception as e:
         print(f"ERROR INESPERADO durante la ejecución del script de ajuste: {e}")
@@ -99,26 +128,106 @@ def correr_fase_2():
     print("\n== FIN FASE 2: Ajustes de Base de Datos ==\n")
 
 def correr_fase_3():
-    """Pide mes/año y ejecuta la Fase 3 (Exporte Excel)."""
+    """Pide el mes (o rango de meses) y ejecuta la Fase 3 (Exporte Excel) para todas las empresas."""
     try:
-        mes, anio = user_inputs.pedir_mes_anio_exporte()
-        if mes and anio:
-            ejecutar_fase_3(mes, anio)
+        mes_inicio, anio_inicio, mes_fin, anio_fin = user_inputs.pedir_rango_meses_exporte()
+        if mes_inicio and anio_inicio:
+            ejecutar_fase_3_rango(mes_inicio, anio_inicio, mes_fin, anio_fin, desde_landing=desde_landing)
     except Exception as e:
         print(f"ERROR INESPERADO en Fase 3: {e}")
 
+def correr_migracion_particiones():
+    """Convierte 'ventas_detalladas' en una tabla particionada por mes (pide confirmación)."""
+    confirmacion = input("Esto reescribe toda la tabla 'ventas_detalladas'. ¿Continuar? (s/n): ").strip().lower()
+    if confirmacion != 's':
+        print("Info: Migración cancelada.")
+        return
+    conn = get_db_connection()
+    if not conn:
+        print("ERROR: No se pudo obtener conexión a la BD.")
+        return
+    try:
+        migrar_ventas_a_particiones(conn)
+    except Exception as e:
+        print(f"ERROR INESPERADO durante la migración: {e}")
+    finally:
+        conn.close()
+        print("Conexión a la base de datos cerrada.")
+
+def correr_normalizacion():
+    """Pasa 'ventas_detalladas' al modelo de hechos + dimensiones (pide confirmación)."""
+    print("Info: El modelo normalizado ocupa menos disco, pero la consulta del exporte (Fase 3) es más lenta.")
+    confirmacion = input("Esto reescribe toda la tabla 'ventas_detalladas' en tablas de hechos y dimensiones. ¿Continuar? (s/n): ").strip().lower()
+    if confirmacion != 's':
+        print("Info: Normalización cancelada.")
+        return
+    conn = get_db_connection()
+    if not conn:
+        print("ERROR: No se pudo obtener conexión a la BD.")
+        return
+    try:
+        normalizar_ventas_detalladas(conn)
+    except Exception as e:
+        print(f"ERROR INESPERADO durante la normalización: {e}")
+    finally:
+        conn.close()
+        print("Conexión a la base de datos cerrada.")
+
+def verificar_bd_al_iniciar():
+    """Reporta migraciones pendientes, índices faltantes y costo de las consultas calientes."""
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        if config.db_migraciones_automaticas:
+            aplicar_migraciones(conn)
+        verificar_esquema(conn)
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo verificar la BD al iniciar: {e}")
+    finally:
+        conn.close()
+
+def correr_migraciones():
+    """Aplica las migraciones pendientes y vuelve a verificar el esquema."""
+    conn = get_db_connection()
+    if not conn:
+        print("ERROR: No se pudo obtener conexión a la BD.")
+        return
+    try:
+        aplicar_migraciones(conn)
+        verificar_esquema(conn)
+    except Exception as e:
+        print(f"ERROR INESPERADO durante las migraciones: {e}")
+    finally:
+        conn.close()
+        print("Conexión a la base de datos cerrada.")
+
 def correr_flujo_completo():
     """Ejecuta las tres fases de Ventas en secuencia."""
     print("\n" + "#"*40)
     print("      INICIANDO FLUJO COMPLETO DE VENTAS")
     print("#"*40)
+
+    # Las cargas dependen de las migraciones: si falta alguna no se empieza
+    conn = get_db_connection()
+    if not conn:
+        print("ERROR CRÍTICO: No se pudo obtener conexión a la BD. Abortando flujo.")
+        return
+    try:
+        if not esquema_al_dia(conn):
+            return
+    finally:
+        conn.close()
     
     # PASO 1: Extracción de API (Ventas)
     print("\n--- PASO 1: EXTRACCIÓN API (VENTAS) ---")
     try:
         fecha_ini, fecha_fin = user_inputs.pedir_rango_fechas()
         if not (fecha_ini and fecha_fin): return
-        ejecutar_fase_1_ventas(fecha_ini, fecha_fin)
+        if desde_landing:
+            ejecutar_fase_1_ventas(fecha_ini, fecha_fin, desde_landing=True)
+        else:
+            ejecutar_fase_1_ventas(fecha_ini, fecha_fin, reanudar=preguntar_reanudar(fecha_ini, fecha_fin))
     except Exception as e:
         print(f"ERROR CRÍTICO en Fase 1. Abortando flujo: {e}")
         return 
@@ -134,9 +243,9 @@ def correr_flujo_completo():
     # PASO 3: Exporte Excel (Ventas)
     print("\n--- PASO 3: EXPORTE EXCEL (VENTAS) ---")
     try:
-        mes, anio = user_inputs.pedir_mes_anio_exporte()
-        if not (mes and anio): return
-        ejecutar_fase_3(mes, anio)
+        mes_inicio, anio_inicio, mes_fin, anio_fin = user_inputs.pedir_rango_meses_exporte()
+        if not (mes_inicio and anio_inicio): return
+        ejecutar_fase_3_rango(mes_inicio, anio_inicio, mes_fin, anio_fin, desde_landing=desde_landing)
     except Exception as e:
         print(f"ERROR CRÍTICO en Fase 3: {e}")
         
@@ -147,6 +256,7 @@ def correr_flujo_completo():
 
 def main():
     """Bucle principal del programa."""
+    verificar_bd_al_iniciar()
     while True:
         opcion = mostrar_menu_principal()
         
@@ -157,10 +267,10 @@ def main():
             correr_fase_1_ventas()
             
         elif opcion == '3':
-            ejecutar_fase_1_inventario()
+            ejecutar_fase_1_inventario(desde_landing=desde_landing)
             
         elif opcion == '4':
-            ejecutar_fase_1_terceros() # <--- ¡NUEVA LLAMADA DIRECTA!
+            ejecutar_fase_1_terceros(desde_landing=desde_landing) # <--- ¡NUEVA LLAMADA DIRECTA!
             
         elif opcion == '5':
             correr_fase_2()
@@ -169,6 +279,15 @@ def main():
             correr_fase_3()
             
         elif opcion == '7':
+            correr_migracion_particiones()
+            
+        elif opcion == '8':
+            correr_normalizacion()
+            
+        elif opcion == '9':
+            correr_migraciones()
+            
+        elif opcion == '10':
             print("Saliendo del programa. ¡Adiós!")
             break
             
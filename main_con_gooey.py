@@ -11,6 +11,8 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 # --- Importación de Utilidades ---
 try:
     from utils.db_utils import get_db_connection
+    from utils.migraciones import aplicar_migraciones, verificar_esquema, esquema_al_dia
+    import config
 except ImportError as e:
     print(f"Error: No se pudieron importar las utilidades. {e}")
     sys.exit(1)
@@ -19,12 +21,15 @@ except ImportError as e:
 try:
     # FASE 1 - VENTAS (Renombrada)
     from fase_1_extraccion_ventas.cargar_ventas_api import ejecutar_fase_1 as ejecutar_fase_1_ventas
+    from fase_1_extraccion_ventas.cargar_ventas_api import migrar_ventas_a_particiones, normalizar_ventas_detalladas
     # FASE 1 - INVENTARIO
     from fase_1_extraccion_inventario.cargar_inventario_api import ejecutar_fase_1_inventario
     # FASE 1 - TERCEROS (¡NUEVO!)
     from fase_1_extraccion_terceros.cargar_terceros_api import ejecutar_fase_1_terceros
+    # FASE 2 - AJUSTES DECLARADOS (.csv)
+    from fase_2_ajustes_db.ajustes_declarados import ejecutar_archivo_ajustes
     # FASE 3
-    from fase_3_exporte_xlsx.export_to_xlsx import ejecutar_fase_3
+    from fase_3_exporte_xlsx.export_to_xlsx import ejecutar_fase_3_rango
 except ImportError as e:
     print(f"Error: No se pudo importar un módulo de fase. ¿Revisaste las rutas?")
     print(f"Detalle: {e}")
@@ -51,16 +56,20 @@ def correr_fase_2_gooey(script_path):
             print("ERROR: No se pudo obtener conexión a la BD para la Fase 2.")
             return
 
-        module_name = os.path.basename(script_path).replace('.py', '')
-        spec = importlib.util.spec_from_file_location(module_name, script_path)
-        script_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(script_module)
-
-        if hasattr(script_module, 'ejecutar_ajustes'):
-            script_module.ejecutar_ajustes(conn) 
+        # Los ajustes declarados (.csv) se aplican con el motor de ajustes; los .py se importan y ejecutan
+        if script_path.lower().endswith('.csv'):
+            ejecutar_archivo_ajustes(conn, script_path)
         else:
-            print(f"ERROR: El script {script_path} no tiene una función 'ejecutar_ajustes(conn)'.")
-            conn.rollback()
+            module_name = os.path.basename(script_path).replace('.py', '')
+            spec = importlib.util.spec_from_file_location(module_name, script_path)
+            script_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(script_module)
+
+            if hasattr(script_module, 'ejecutar_ajustes'):
+                script_module.ejecutar_ajustes(conn) 
+            else:
+                print(f"ERROR: El script {script_path} no tiene una función 'ejecutar_ajustes(conn)'.")
+                conn.rollback()
 
     except Exception as e:
         print(f"ERROR INESPERADO durante la ejecución del script de ajuste: {e}")
@@ -110,11 +119,17 @@ def main():
         widget="DateChooser",
         gooey_options={'format': '%Y-%m-%d'}
     )
+    full_group.add_argument(
+        '--resume',
+        help="Reanudar la extracción interrumpida de este rango (solo pide a la API lo que falta)",
+        action='store_true',
+        widget="CheckBox"
+    )
     
     # Argumento para la Fase 2 (Ajustes)
     full_group.add_argument(
         '--script_ajuste_f2',
-        help="Script de ajuste (.py) a ejecutar (Opcional)",
+        help="Ajustes declarados (.csv) o script de ajuste (.py) a ejecutar (Opcional)",
         widget="FileChooser"
     )
     
@@ -132,6 +147,31 @@ def main():
         type=int,
         default=datetime.now().year
     )
+    full_group.add_argument(
+        '--mes_fin_f3',
+        help="Mes final para exportar varios meses (Opcional)",
+        type=int,
+        choices=list(range(1, 13)),
+        widget="Dropdown"
+    )
+    full_group.add_argument(
+        '--anio_fin_f3',
+        help="Año del mes final (Opcional; por defecto el mismo año)",
+        type=int
+    )
+    full_group.add_argument(
+        '--empresas_f3',
+        help="Empresas a exportar (Opcional; por defecto todas)",
+        nargs='*',
+        choices=list(config.rutas_exportacion),
+        widget="Listbox"
+    )
+    full_group.add_argument(
+        '--desde_landing',
+        help="Cargar y exportar desde la zona de aterrizaje (Parquet) sin consultar la API. Sin los ajustes de la Fase 2",
+        action='store_true',
+        widget="CheckBox"
+    )
 
     # --- PESTAÑA 2: SOLO FASE 1 - VENTAS ---
     fase1_ventas_parser = subparsers.add_parser(
@@ -150,6 +190,18 @@ def main():
         widget="DateChooser",
         gooey_options={'format': '%Y-%m-%d'}
     )
+    fase1_ventas_parser.add_argument(
+        '--resume',
+        help="Reanudar la extracción interrumpida de este rango (solo pide a la API lo que falta)",
+        action='store_true',
+        widget="CheckBox"
+    )
+    fase1_ventas_parser.add_argument(
+        '--desde_landing',
+        help="Cargar desde la zona de aterrizaje (Parquet) sin consultar la API",
+        action='store_true',
+        widget="CheckBox"
+    )
 
     # --- PESTAÑA 3: SOLO FASE 1 - INVENTARIO ---
     fase1_inv_parser = subparsers.add_parser(
@@ -163,6 +215,12 @@ def main():
         default=True,
         widget="Block" # Hace que el argumento se vea como un simple bloque
     )
+    fase1_inv_parser.add_argument(
+        '--desde_landing',
+        help="Cargar la última foto de la zona de aterrizaje (Parquet) sin consultar la API",
+        action='store_true',
+        widget="CheckBox"
+    )
     
     # --- PESTAÑA 4: SOLO FASE 1 - TERCEROS (¡NUEVA PESTAÑA!) ---
     fase1_terceros_parser = subparsers.add_parser(
@@ -176,6 +234,12 @@ def main():
         default=True,
         widget="Block"
     )
+    fase1_terceros_parser.add_argument(
+        '--desde_landing',
+        help="Cargar la última foto de la zona de aterrizaje (Parquet) sin consultar la API",
+        action='store_true',
+        widget="CheckBox"
+    )
 
     # --- PESTAÑA 5: SOLO FASE 2 (Ajustes DB) ---
     fase2_parser = subparsers.add_parser(
@@ -184,10 +248,10 @@ def main():
     )
     fase2_parser.add_argument(
         'script_path',
-        help="Seleccione el script de ajuste (.py) a ejecutar",
+        help="Seleccione los ajustes (.csv) o el script de ajuste (.py) a ejecutar",
         widget="FileChooser",
         gooey_options={
-            'wildcard': "Scripts de Python (*.py)|*.py"
+            'wildcard': "Ajustes declarados (*.csv)|*.csv|Scripts de Python (*.py)|*.py"
         }
     )
     
@@ -209,6 +273,70 @@ def main():
         type=int,
         default=datetime.now().year
     )
+    fase3_parser.add_argument(
+        '--mes_fin',
+        help="Mes final para exportar varios meses (Opcional; los archivos se exportan en paralelo)",
+        type=int,
+        choices=list(range(1, 13)),
+        widget="Dropdown"
+    )
+    fase3_parser.add_argument(
+        '--anio_fin',
+        help="Año del mes final (Opcional; por defecto el mismo año)",
+        type=int
+    )
+    fase3_parser.add_argument(
+        '--empresas',
+        help="Empresas a exportar (Opcional; por defecto todas)",
+        nargs='*',
+        choices=list(config.rutas_exportacion),
+        widget="Listbox"
+    )
+    fase3_parser.add_argument(
+        '--desde_landing',
+        help="Exportar desde la zona de aterrizaje (Parquet). Sin los ajustes de la Fase 2",
+        action='store_true',
+        widget="CheckBox"
+    )
+    
+    # --- PESTAÑA 7: MANTENIMIENTO (Particiones) ---
+    particiones_parser = subparsers.add_parser(
+        'mantenimiento_particiones',
+        help="Migrar 'ventas_detalladas' a tabla particionada por mes"
+    )
+    particiones_parser.add_argument(
+        '--run_particiones',
+        help="Presione Start para convertir 'ventas_detalladas' en una tabla particionada por mes",
+        action='store_true',
+        default=True,
+        widget="Block"
+    )
+    
+    # --- PESTAÑA 8: MANTENIMIENTO (Normalización) ---
+    normalizacion_parser = subparsers.add_parser(
+        'mantenimiento_normalizacion',
+        help="Normalizar 'ventas_detalladas' (dimensiones de clientes, productos y vendedores)"
+    )
+    normalizacion_parser.add_argument(
+        '--run_normalizacion',
+        help="Presione Start para pasar 'ventas_detalladas' a tablas de hechos y dimensiones (con una vista de compatibilidad)",
+        action='store_true',
+        default=True,
+        widget="Block"
+    )
+    
+    # --- PESTAÑA 9: MANTENIMIENTO (Migraciones) ---
+    migraciones_parser = subparsers.add_parser(
+        'mantenimiento_migraciones',
+        help="Aplicar migraciones de la BD (tablas e índices)"
+    )
+    migraciones_parser.add_argument(
+        '--run_migraciones',
+        help="Presione Start para aplicar las migraciones pendientes y ver el estado de los índices",
+        action='store_true',
+        default=True,
+        widget="Block"
+    )
     
     # 3. Gooey parsea los argumentos
     args = parser.parse_args()
@@ -217,10 +345,34 @@ def main():
     
     print(f"Comando seleccionado: {args.command}")
 
+    # Verificación del esquema (migraciones pendientes, índices y costo de las consultas calientes)
+    conn = get_db_connection()
+    if conn:
+        try:
+            if config.db_migraciones_automaticas or args.command == 'mantenimiento_migraciones':
+                aplicar_migraciones(conn)
+            verificar_esquema(conn)
+        except Exception as e:
+            print(f"ERROR: No se pudo verificar o migrar la BD: {e}")
+        finally:
+            conn.close()
+
     if args.command == 'ventas_completo':
         print("\n" + "#"*40)
         print("      INICIANDO FLUJO COMPLETO DE VENTAS")
         print("#"*40)
+
+        # Las cargas dependen de las migraciones: si falta alguna no se empieza
+        conn = get_db_connection()
+        if not conn:
+            print("ERROR CRÍTICO: No se pudo obtener conexión a la BD. Abortando flujo.")
+            sys.exit(1)
+        try:
+            al_dia = esquema_al_dia(conn)
+        finally:
+            conn.close()
+        if not al_dia:
+            sys.exit(1)
         
         # Corrección de fecha y ejecución de FASE 1
         fecha_inicio_obj = datetime.strptime(args.fecha_inicio_f1, '%Y-%m-%d')
@@ -228,9 +380,11 @@ def main():
         fecha_ini_corregida = fecha_inicio_obj.strftime('%Y-%m-%d')
         fecha_fin_corregida = fecha_fin_obj.strftime('%Y-%m-%d')
         
-        ejecutar_fase_1_ventas(fecha_ini_corregida, fecha_fin_corregida)
+        ejecutar_fase_1_ventas(fecha_ini_corregida, fecha_fin_corregida, reanudar=args.resume, desde_landing=args.desde_landing)
         correr_fase_2_gooey(args.script_ajuste_f2)
-        ejecutar_fase_3(args.mes_exporte_f3, args.anio_exporte_f3)
+        mes_fin = args.mes_fin_f3 or args.mes_exporte_f3
+        anio_fin = args.anio_fin_f3 or args.anio_exporte_f3
+        ejecutar_fase_3_rango(args.mes_exporte_f3, args.anio_exporte_f3, mes_fin, anio_fin, empresas=args.empresas_f3, desde_landing=args.desde_landing)
         
         print("\n¡FLUJO COMPLETO TERMINADO!")
         
@@ -241,19 +395,40 @@ def main():
         fecha_ini_corregida = fecha_inicio_obj.strftime('%Y-%m-%d')
         fecha_fin_corregida = fecha_fin_obj.strftime('%Y-%m-%d')
         
-        ejecutar_fase_1_ventas(fecha_ini_corregida, fecha_fin_corregida)
+        ejecutar_fase_1_ventas(fecha_ini_corregida, fecha_fin_corregida, reanudar=args.resume, desde_landing=args.desde_landing)
         
     elif args.command == 'fase1_inventario':
-        ejecutar_fase_1_inventario()
+        ejecutar_fase_1_inventario(desde_landing=args.desde_landing)
         
     elif args.command == 'fase1_terceros': # <--- ¡NUEVA LÓGICA DE EJECUCIÓN!
-        ejecutar_fase_1_terceros()
+        ejecutar_fase_1_terceros(desde_landing=args.desde_landing)
         
     elif args.command == 'fase2':
         correr_fase_2_gooey(args.script_path)
         
     elif args.command == 'fase3':
-        ejecutar_fase_3(args.mes, args.anio)
+        mes_fin = args.mes_fin or args.mes
+        anio_fin = args.anio_fin or args.anio
+        ejecutar_fase_3_rango(args.mes, args.anio, mes_fin, anio_fin, empresas=args.empresas, desde_landing=args.desde_landing)
+    
+    elif args.command == 'mantenimiento_particiones':
+        conn = get_db_connection()
+        if conn:
+            try:
+                migrar_ventas_a_particiones(conn)
+            finally:
+                conn.close()
+    
+    elif args.command == 'mantenimiento_normalizacion':
+        conn = get_db_connection()
+        if conn:
+            try:
+                normalizar_ventas_detalladas(conn)
+            finally:
+                conn.close()
+    
+    elif args.command == 'mantenimiento_migraciones':
+        pass # Las migraciones ya se aplicaron arriba, junto con la verificación
     
     else:
         print("No se seleccionó ningún comando.")
@@ -0,0 +1,19 @@
+"""
+Tabla de la Fase 1 de ventas con la huella de cada (empresa, fecha) cargada ('ventas_huellas_dia').
+La tabla de ventas no la crea esta migración: la crea la carga la primera vez (particionada por mes
+o, con config.ventas_modelo_normalizado, el modelo normalizado).
+"""
+
+crear_huellas = """
+    CREATE TABLE IF NOT EXISTS public."ventas_huellas_dia" (
+        empresa text NOT NULL,
+        fecha date NOT NULL,
+        huella char(64) NOT NULL,
+        registros integer NOT NULL,
+        actualizado_en timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (empresa, fecha)
+    );
+"""
+
+def aplicar(cursor):
+    cursor.execute(crear_huellas)
@@ -0,0 +1,54 @@
+"""
+Índices de las consultas calientes:
+- (empresa, fecha): DELETE por día/rango de la Fase 1 y consulta de la Fase 3.
+- factura: UPDATE/DELETE de los scripts de la Fase 2.
+- Llaves únicas de los ON CONFLICT de inventario y terceros. Si hay filas duplicadas el índice
+  no se puede crear y la migración falla (se revierte) indicando la llave.
+Las tablas que no existen (o que son vistas) se omiten, y no se crea un índice si la tabla ya
+tiene uno que sirve (uno normal que empiece por esas columnas, o uno único exactamente sobre ellas).
+"""
+
+# (tabla, columnas, único, CREATE INDEX)
+indices = [
+    ("ventas_hechos", ["empresa", "fecha"], False,
+     'CREATE INDEX IF NOT EXISTS "ventas_hechos_empresa_fecha_idx" ON public."ventas_hechos" ("empresa", "fecha");'),
+    ("ventas_hechos", ["factura"], False,
+     'CREATE INDEX IF NOT EXISTS "ventas_hechos_factura_idx" ON public."ventas_hechos" ("factura");'),
+    ("ventas_detalladas", ["empresa", "fecha"], False,
+     'CREATE INDEX IF NOT EXISTS "ventas_detalladas_empresa_fecha_idx" ON public."ventas_detalladas" ("empresa", "fecha");'),
+    ("ventas_detalladas", ["factura"], False,
+     'CREATE INDEX IF NOT EXISTS "ventas_detalladas_factura_idx" ON public."ventas_detalladas" ("factura");'),
+    ("inventario", ["codigo_inv", "bodega_inv", "empresa_inv"], True,
+     'CREATE UNIQUE INDEX IF NOT EXISTS "inventario_llave_uk" ON public."inventario" ("codigo_inv", "bodega_inv", "empresa_inv");'),
+    ("terceros", ["nit_ter", "empresa_ter"], True,
+     'CREATE UNIQUE INDEX IF NOT EXISTS "terceros_llave_uk" ON public."terceros" ("nit_ter", "empresa_ter");'),
+]
+
+def _es_tabla(cursor, tabla):
+    cursor.execute("""
+        SELECT c.relkind IN ('r', 'p') FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = %s;
+    """, (tabla,))
+    fila = cursor.fetchone()
+    return bool(fila and fila[0])
+
+def _tiene_indice_equivalente(cursor, tabla, columnas, unico):
+    cursor.execute("""
+        SELECT x.indisunique, array_agg(a.attname ORDER BY k.orden)
+        FROM pg_index x
+        CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, orden)
+        JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+        WHERE x.indrelid = %s::regclass
+        GROUP BY x.indexrelid, x.indisunique;
+    """, (f'public."{tabla}"',))
+    for es_unico, columnas_indice in cursor.fetchall():
+        if unico and es_unico and sorted(columnas_indice) == sorted(columnas):
+            return True
+        if not unico and columnas_indice[:len(columnas)] == columnas:
+            return True
+    return False
+
+def aplicar(cursor):
+    for tabla, columnas, unico, crear in indices:
+        if _es_tabla(cursor, tabla) and not _tiene_indice_equivalente(cursor, tabla, columnas, unico):
+            cursor.execute(crear)
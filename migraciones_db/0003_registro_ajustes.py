@@ -0,0 +1,26 @@
+"""
+Registro de los ajustes de la Fase 2 ('ventas_ajustes'), indexado por fecha, fecha destino y
+archivo, para volver a aplicarlos cuando la Fase 1 recarga los días que tocan.
+"""
+
+crear_registro = """
+    CREATE TABLE IF NOT EXISTS public."ventas_ajustes" (
+        id bigserial PRIMARY KEY,
+        archivo text NOT NULL,
+        accion text NOT NULL,
+        factura text NOT NULL,
+        columna text,
+        valor text,
+        motivo text,
+        empresa text,
+        fecha date,
+        fecha_destino date,
+        registrado_en timestamptz NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS "ventas_ajustes_fecha_idx" ON public."ventas_ajustes" (fecha);
+    CREATE INDEX IF NOT EXISTS "ventas_ajustes_fecha_destino_idx" ON public."ventas_ajustes" (fecha_destino);
+    CREATE INDEX IF NOT EXISTS "ventas_ajustes_archivo_idx" ON public."ventas_ajustes" (archivo);
+"""
+
+def aplicar(cursor):
+    cursor.execute(crear_registro)
@@ -0,0 +1,108 @@
+"""
+Llave subrogada 'id_linea' en 'ventas_hechos' (modelo normalizado) para que los triggers de la vista
+'ventas_detalladas' borren y actualicen la línea por su índice en vez de comparar todas las columnas.
+La columna sale de una secuencia (PostgreSQL 16 no admite IDENTITY en tablas particionadas); las
+filas existentes toman su valor al agregar la columna. La vista la expone como última columna.
+Si la BD no usa el modelo normalizado no hace nada.
+"""
+
+crear_columna = """
+    CREATE SEQUENCE IF NOT EXISTS public."ventas_hechos_id_linea_seq";
+    ALTER TABLE public."ventas_hechos"
+        ADD COLUMN IF NOT EXISTS "id_linea" bigint NOT NULL DEFAULT nextval('public."ventas_hechos_id_linea_seq"');
+    ALTER SEQUENCE public."ventas_hechos_id_linea_seq" OWNED BY public."ventas_hechos"."id_linea";
+    CREATE INDEX IF NOT EXISTS "ventas_hechos_id_linea_idx" ON public."ventas_hechos" ("id_linea");
+"""
+
+crear_vista = """
+    CREATE OR REPLACE VIEW public."ventas_detalladas" AS
+    SELECT
+        h."nit", d0."nombre", h."factura", h."forma_pago", h."fecha",
+        d1."codigo", d1."descripcion", h."codigo_grupo_art", h."nombre_grupo_art", h."und",
+        h."cant", h."valor_base", h."iva", h."porc_iva", h."descuento",
+        h."valor", h."lista_precio", h."precio", h."precio_mayor", h."cod_linea",
+        h."desc_linea", d0."cod_cliente", h."clasificacion", h."clasificacion_py", h."zona",
+        d0."telefono", h."ciudad", h."observaciones", d0."direccion", h."cod_area",
+        h."nom_area", d2."cod_vendedor", d2."nom_vendedor", h."cod_despachar", h."cliente_despachar",
+        d1."marca", d1."referencia", d0."barrio", h."dep_articulo", h."recargo",
+        h."serial", h."peso_bruto", h."factor", d2."supervisor", h."costo",
+        h."motivo_dev", h."empresa", h."pedido_tiendapp", h."bodega",
+        h."id_linea"
+    FROM public."ventas_hechos" h
+    LEFT JOIN public."ventas_clientes" d0 ON d0."id_cliente" = h."id_cliente"
+    LEFT JOIN public."ventas_productos" d1 ON d1."id_producto" = h."id_producto"
+    LEFT JOIN public."ventas_vendedores" d2 ON d2."id_vendedor" = h."id_vendedor";
+"""
+
+crear_trigger = """
+    CREATE OR REPLACE FUNCTION public."ventas_detalladas_escribir"() RETURNS trigger LANGUAGE plpgsql AS $funcion$
+    DECLARE
+        v_id_cliente bigint;
+        v_id_producto bigint;
+        v_id_vendedor bigint;
+        v_id_linea bigint;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            IF OLD.fecha IS NULL THEN
+                DELETE FROM public."ventas_hechos" WHERE "id_linea" = OLD."id_linea" AND fecha IS NULL;
+            ELSE
+                DELETE FROM public."ventas_hechos" WHERE "id_linea" = OLD."id_linea" AND fecha = OLD.fecha;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+        END IF;
+        -- Una línea actualizada conserva su 'id_linea'; una insertada toma uno nuevo
+        IF TG_OP = 'UPDATE' THEN
+            v_id_linea := OLD."id_linea";
+        ELSE
+            v_id_linea := nextval('public."ventas_hechos_id_linea_seq"');
+        END IF;
+        INSERT INTO public."ventas_clientes" ("empresa", "cod_cliente", "nombre", "direccion", "telefono", "barrio", huella)
+        VALUES (NEW."empresa", NEW."cod_cliente", NEW."nombre", NEW."direccion", NEW."telefono", NEW."barrio",
+                md5(ROW(NEW."empresa", NEW."cod_cliente", NEW."nombre", NEW."direccion", NEW."telefono", NEW."barrio")::text))
+        ON CONFLICT (huella) DO NOTHING;
+        SELECT "id_cliente" INTO v_id_cliente FROM public."ventas_clientes"
+        WHERE huella = md5(ROW(NEW."empresa", NEW."cod_cliente", NEW."nombre", NEW."direccion", NEW."telefono", NEW."barrio")::text);
+        INSERT INTO public."ventas_productos" ("empresa", "codigo", "descripcion", "marca", "referencia", huella)
+        VALUES (NEW."empresa", NEW."codigo", NEW."descripcion", NEW."marca", NEW."referencia",
+                md5(ROW(NEW."empresa", NEW."codigo", NEW."descripcion", NEW."marca", NEW."referencia")::text))
+        ON CONFLICT (huella) DO NOTHING;
+        SELECT "id_producto" INTO v_id_producto FROM public."ventas_productos"
+        WHERE huella = md5(ROW(NEW."empresa", NEW."codigo", NEW."descripcion", NEW."marca", NEW."referencia")::text);
+        INSERT INTO public."ventas_vendedores" ("empresa", "cod_vendedor", "nom_vendedor", "supervisor", huella)
+        VALUES (NEW."empresa", NEW."cod_vendedor", NEW."nom_vendedor", NEW."supervisor",
+                md5(ROW(NEW."empresa", NEW."cod_vendedor", NEW."nom_vendedor", NEW."supervisor")::text))
+        ON CONFLICT (huella) DO NOTHING;
+        SELECT "id_vendedor" INTO v_id_vendedor FROM public."ventas_vendedores"
+        WHERE huella = md5(ROW(NEW."empresa", NEW."cod_vendedor", NEW."nom_vendedor", NEW."supervisor")::text);
+        INSERT INTO public."ventas_hechos" (
+            "nit", "factura", "forma_pago", "fecha", "codigo_grupo_art", "nombre_grupo_art", "und", "cant",
+            "valor_base", "iva", "porc_iva", "descuento", "valor", "lista_precio", "precio", "precio_mayor",
+            "cod_linea", "desc_linea", "clasificacion", "clasificacion_py", "zona", "ciudad", "observaciones",
+            "cod_area", "nom_area", "cod_despachar", "cliente_despachar", "dep_articulo", "recargo", "serial",
+            "peso_bruto", "factor", "costo", "motivo_dev", "empresa", "pedido_tiendapp", "bodega",
+            "id_cliente", "id_producto", "id_vendedor", "id_linea"
+        ) VALUES (
+            NEW."nit", NEW."factura", NEW."forma_pago", NEW."fecha", NEW."codigo_grupo_art", NEW."nombre_grupo_art", NEW."und", NEW."cant",
+            NEW."valor_base", NEW."iva", NEW."porc_iva", NEW."descuento", NEW."valor", NEW."lista_precio", NEW."precio", NEW."precio_mayor",
+            NEW."cod_linea", NEW."desc_linea", NEW."clasificacion", NEW."clasificacion_py", NEW."zona", NEW."ciudad", NEW."observaciones",
+            NEW."cod_area", NEW."nom_area", NEW."cod_despachar", NEW."cliente_despachar", NEW."dep_articulo", NEW."recargo", NEW."serial",
+            NEW."peso_bruto", NEW."factor", NEW."costo", NEW."motivo_dev", NEW."empresa", NEW."pedido_tiendapp", NEW."bodega",
+            v_id_cliente, v_id_producto, v_id_vendedor, v_id_linea
+        );
+        RETURN NEW;
+    END
+    $funcion$;
+    DROP TRIGGER IF EXISTS "ventas_detalladas_escribir" ON public."ventas_detalladas";
+    CREATE TRIGGER "ventas_detalladas_escribir" INSTEAD OF INSERT OR UPDATE OR DELETE ON public."ventas_detalladas"
+    FOR EACH ROW EXECUTE FUNCTION public."ventas_detalladas_escribir"();
+"""
+
+def aplicar(cursor):
+    cursor.execute("SELECT to_regclass('public.\"ventas_hechos\"') IS NOT NULL;")
+    if not cursor.fetchone()[0]:
+        return
+    cursor.execute(crear_columna)
+    cursor.execute(crear_vista)
+    cursor.execute(crear_trigger)
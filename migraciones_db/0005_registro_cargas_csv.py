@@ -0,0 +1,11 @@
+"""
+Las cargas de CSV de la Fase 2 ('cargar_csv') quedan en 'ventas_ajustes' con la ruta del archivo
+en 'valor' y una fila por cada (empresa, fecha) del CSV, sin factura.
+"""
+
+permitir_sin_factura = """
+    ALTER TABLE public."ventas_ajustes" ALTER COLUMN factura DROP NOT NULL;
+"""
+
+def aplicar(cursor):
+    cursor.execute(permitir_sin_factura)
@@ -0,0 +1,21 @@
+# Fixtures compartidas de las pruebas.
+#
+# Las pruebas que usan la BD NO se conectan con las credenciales del .env (la BD de producción en
+# el uso normal): solo corren si TEST_DATABASE_URL apunta a una BD dedicada a pruebas, por ejemplo
+#   TEST_DATABASE_URL="host=localhost dbname=ventas_pruebas user=postgres password=..."
+# Sin esa variable se saltan.
+
+import os
+
+import psycopg2
+import pytest
+
+@pytest.fixture
+def conn_prueba():
+    dsn = os.getenv("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL no está definida (BD de pruebas).")
+    conn = psycopg2.connect(dsn)
+    yield conn
+    conn.rollback()
+    conn.close()
@@ -0,0 +1,89 @@
+# Pruebas de los ajustes declarados de la Fase 2 con los archivos reales de 'scripts_del_mes'.
+# Las que cargan en la BD usan la BD de pruebas (TEST_DATABASE_URL, ver conftest.py).
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fase_1_extraccion_ventas.modelo_ventas import columnas_ventas_detalladas
+from fase_2_ajustes_db.ajustes_declarados import leer_ajustes, aplicar_ajustes, dias_del_csv, _columnas_del_csv
+from fase_2_ajustes_db.registro_ajustes import registrar_ajustes, ajustes_de_los_dias
+from utils.migraciones import aplicar_migraciones
+
+scripts_del_mes = os.path.join(os.path.dirname(__file__), '..', 'fase_2_ajustes_db', 'scripts_del_mes')
+ajustes_septiembre = os.path.join(scripts_del_mes, 'ajustes_2025_09.csv')
+csv_septiembre = os.path.join(scripts_del_mes, 'datos', 'ajustes_septiembre.csv')
+
+tabla_prueba = "prueba_ajustes_declarados"
+
+@pytest.fixture
+def conn(conn_prueba):
+    columnas = ', '.join(f'"{col}" {tipo}' for col, tipo in columnas_ventas_detalladas)
+    with conn_prueba.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS public."{tabla_prueba}";')
+        cursor.execute(f'CREATE TABLE public."{tabla_prueba}" ({columnas});')
+    conn_prueba.commit()
+    yield conn_prueba
+    conn_prueba.rollback()
+    with conn_prueba.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS public."{tabla_prueba}";')
+    conn_prueba.commit()
+
+def test_columnas_del_csv_real():
+    columnas = _columnas_del_csv(csv_septiembre)
+    assert len(columnas) == 48
+    assert columnas[0] == "nit" # sin el BOM
+    assert "bodega" not in columnas
+
+def test_columnas_del_csv_desconocida(tmp_path):
+    ruta = tmp_path / "ajustes.csv"
+    ruta.write_text("factura,fecha,no_existe\nF1,2025-09-01,x\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="no_existe"):
+        _columnas_del_csv(str(ruta))
+
+def test_carga_el_csv_real_de_48_columnas(conn):
+    ajustes = leer_ajustes(ajustes_septiembre)
+    ajustes = {"actualizaciones": {}, "borrados": [], "cargas": ajustes["cargas"], "motivos": {}}
+    with conn.cursor() as cursor:
+        cursor.execute("SHOW DateStyle;")
+        estilo_fechas = cursor.fetchone()[0]
+    resumen = aplicar_ajustes(conn, ajustes, tabla_prueba)
+    assert resumen["cargadas"] == 222
+
+    with conn.cursor() as cursor:
+        cursor.execute(f'SELECT min(fecha)::text, max(fecha)::text, count(bodega) FROM public."{tabla_prueba}";')
+        assert cursor.fetchone() == ("2025-09-29", "2025-09-30", 0)
+        cursor.execute("SHOW DateStyle;")
+        assert cursor.fetchone()[0] == estilo_fechas # el COPY no cambia el DateStyle de la sesión
+
+def test_dias_del_csv_real():
+    # El CSV real trae las fechas como DD/MM/AAAA
+    assert dias_del_csv(csv_septiembre) == {("CAMDUN", date(2025, 9, 29)), ("CAMDUN", date(2025, 9, 30))}
+
+def test_dias_del_csv_fecha_invalida(tmp_path):
+    ruta = tmp_path / "ajustes.csv"
+    ruta.write_text("factura,fecha,empresa\nF1,2025-09-01,GMD\nF2,31-09-2025,GMD\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="línea 3"):
+        dias_del_csv(str(ruta))
+
+def test_dias_del_csv_sin_filas(tmp_path):
+    ruta = tmp_path / "ajustes.csv"
+    ruta.write_text("factura,fecha,empresa\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        dias_del_csv(str(ruta))
+
+def test_la_carga_del_csv_real_se_reaplica_al_recargar_sus_dias(conn):
+    aplicar_migraciones(conn)
+    ajustes = leer_ajustes(ajustes_septiembre)
+    with conn.cursor() as cursor:
+        registrar_ajustes(cursor, "prueba_ajustes_2025_09.csv", ajustes, {})
+        dia_recargado = {("CAMDUN", date(2025, 9, 30))}
+        reaplicar, _, _ = ajustes_de_los_dias(cursor, dia_recargado, set(), date(2025, 9, 30), date(2025, 9, 30))
+        otro_dia = {("CAMDUN", date(2025, 9, 28))}
+        sin_cargas, _, _ = ajustes_de_los_dias(cursor, otro_dia, set(), date(2025, 9, 28), date(2025, 9, 28))
+    conn.rollback() # El registro de la prueba no se guarda
+    assert reaplicar["cargas"] == ajustes["cargas"]
+    assert sin_cargas["cargas"] == []
@@ -0,0 +1,128 @@
+# Pruebas del exporte incremental de la Fase 3: el plan a partir del manifiesto ('planear_exporte')
+# y el reemplazo de las últimas filas de la hoja ('anexar_filas_xlsx'), leyendo el resultado con openpyxl.
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from openpyxl import load_workbook
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.excel_streaming import escribir_xlsx_por_lotes, anexar_filas_xlsx, MAX_FILAS_EXCEL
+from fase_3_exporte_xlsx.manifiesto_exporte import planear_exporte, guardar_manifiesto, leer_manifiesto
+
+columnas = ["fecha", "factura", "valor"]
+
+# Días del manifiesto: [fecha, filas, huella]
+dias = [["2025-09-01", 2, "10"], ["2025-09-02", 3, "20"], ["2025-09-03", 1, "30"]]
+
+def _manifiesto(dias_anteriores, columnas_anteriores=columnas):
+    return {"columnas": list(columnas_anteriores), "dias": [list(dia) for dia in dias_anteriores]}
+
+# --- planear_exporte ---
+
+def test_sin_manifiesto_es_completo():
+    assert planear_exporte(None, dias, columnas) == ("completo", None, None)
+
+def test_columnas_distintas_es_completo():
+    assert planear_exporte(_manifiesto(dias, ["fecha", "valor"]), dias, columnas) == ("completo", None, None)
+
+def test_mismos_dias_sin_cambios():
+    assert planear_exporte(_manifiesto(dias), dias, columnas) == ("sin cambios", None, None)
+
+def test_cambio_en_el_primer_dia_corta_en_la_primera_fila():
+    actuales = [["2025-09-01", 2, "11"]] + dias[1:]
+    assert planear_exporte(_manifiesto(dias), actuales, columnas) == ("incremental", 2, "2025-09-01")
+
+def test_cambio_en_un_dia_intermedio():
+    actuales = [dias[0], ["2025-09-02", 4, "21"], dias[2]]
+    assert planear_exporte(_manifiesto(dias), actuales, columnas) == ("incremental", 4, "2025-09-02")
+
+def test_dia_nuevo_al_final():
+    actuales = dias + [["2025-09-04", 5, "40"]]
+    assert planear_exporte(_manifiesto(dias), actuales, columnas) == ("incremental", 8, "2025-09-04")
+
+def test_solo_se_quitan_dias_del_final():
+    assert planear_exporte(_manifiesto(dias), dias[:1], columnas) == ("incremental", 4, None)
+
+def test_mas_filas_que_una_hoja_es_completo():
+    actuales = [["2025-09-01", MAX_FILAS_EXCEL, "10"]]
+    assert planear_exporte(_manifiesto(dias), actuales, columnas) == ("completo", None, None)
+
+# --- leer_manifiesto ---
+
+def _escribir_con_manifiesto(ruta):
+    escribir_xlsx_por_lotes(str(ruta), columnas, [_filas(1, 2)])
+    guardar_manifiesto(str(ruta), columnas, dias)
+
+def test_manifiesto_valido(tmp_path):
+    ruta = tmp_path / "ventas.xlsx"
+    _escribir_con_manifiesto(ruta)
+    assert leer_manifiesto(str(ruta))["dias"] == dias
+
+def test_manifiesto_se_invalida_si_cambia_el_tamano(tmp_path):
+    ruta = tmp_path / "ventas.xlsx"
+    _escribir_con_manifiesto(ruta)
+    estado = os.stat(ruta)
+    with open(ruta, "ab") as f:
+        f.write(b"\0")
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns)) # misma fecha, otro tamaño
+    assert leer_manifiesto(str(ruta)) is None
+
+def test_manifiesto_se_invalida_si_cambia_la_fecha_de_modificacion(tmp_path):
+    ruta = tmp_path / "ventas.xlsx"
+    _escribir_con_manifiesto(ruta)
+    estado = os.stat(ruta)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000_000))
+    assert leer_manifiesto(str(ruta)) is None
+
+# --- anexar_filas_xlsx ---
+
+def _filas(primera, ultima, dia=1):
+    """Filas de prueba: (fecha, factura, valor), con fechas para que la hoja use el estilo de fecha."""
+    return [(datetime(2025, 9, dia), f"F{numero}", numero * 1.5) for numero in range(primera, ultima + 1)]
+
+def _leer(ruta):
+    libro = load_workbook(ruta, read_only=True)
+    filas = [tuple(fila) for fila in libro.active.iter_rows(values_only=True)]
+    libro.close()
+    return filas
+
+@pytest.fixture
+def archivo(tmp_path):
+    """Archivo de 6 filas (2 del día 1, 3 del día 2 y 1 del día 3), como 'dias'."""
+    ruta = str(tmp_path / "ventas.xlsx")
+    escribir_xlsx_por_lotes(ruta, columnas, [_filas(1, 2, 1), _filas(3, 5, 2), _filas(6, 6, 3)])
+    return ruta
+
+def test_anexar_desde_la_primera_fila(archivo):
+    nuevas = _filas(10, 12, 1)
+    assert anexar_filas_xlsx(archivo, 2, columnas, [nuevas]) == 3
+    assert _leer(archivo) == [tuple(columnas)] + nuevas
+
+def test_anexar_desde_una_fila_intermedia(archivo):
+    nuevas = _filas(20, 23, 2)
+    assert anexar_filas_xlsx(archivo, 4, columnas, [nuevas[:2], nuevas[2:]]) == 4
+    assert _leer(archivo) == [tuple(columnas)] + _filas(1, 2, 1) + nuevas
+
+def test_anexar_despues_de_la_ultima_fila(archivo):
+    nuevas = _filas(7, 8, 4)
+    assert anexar_filas_xlsx(archivo, 8, columnas, [nuevas]) == 2
+    assert _leer(archivo) == [tuple(columnas)] + _filas(1, 2, 1) + _filas(3, 5, 2) + _filas(6, 6, 3) + nuevas
+
+def test_solo_quitar_dias_del_final(archivo):
+    assert anexar_filas_xlsx(archivo, 4, columnas, []) == 0
+    assert _leer(archivo) == [tuple(columnas)] + _filas(1, 2, 1)
+
+def test_estilos_distintos_no_toca_el_archivo(tmp_path):
+    # Un archivo sin fechas no tiene el estilo de fecha que usan las filas nuevas
+    ruta = str(tmp_path / "ventas.xlsx")
+    escribir_xlsx_por_lotes(ruta, columnas, [[("2025-09-01", "F1", 1.5)]])
+    with open(ruta, "rb") as f:
+        contenido = f.read()
+    with pytest.raises(ValueError, match="estilos"):
+        anexar_filas_xlsx(ruta, 2, columnas, [_filas(1, 1)])
+    with open(ruta, "rb") as f:
+        assert f.read() == contenido
+    assert not os.path.exists(ruta + ".tmp")
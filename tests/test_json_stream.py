@@ -0,0 +1,42 @@
+# Pruebas de 'iterar_lotes_json' con la respuesta cortada en trozos en cualquier posición.
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.json_stream import iterar_lotes_json
+
+documento = json.dumps({
+    "success": True,
+    "total": 12.5,
+    "limite": -1e5,
+    "data": [
+        1.5e3, -2, 0.25, -0.5E-2, 10, None,
+        {"codigo": "P1", "nombre": "ÑAME Y CAFÉ", "existencias": 123.45, "bodegas": [{"codigoBodega": "00", "existencias": 7}]},
+        {"codigo": "P2", "nombre": "AZÚCAR", "existencias": -0.0, "activo": False, "precio": 1e-3}
+    ],
+    "message": "ok"
+}, ensure_ascii=False).encode("utf-8")
+
+class _RespuestaPorTrozos:
+    """Imita una respuesta de 'requests' en streaming que entrega 'trozos' de bytes."""
+    encoding = "utf-8"
+
+    def __init__(self, trozos):
+        self.trozos = trozos
+
+    def iter_content(self, chunk_size):
+        return iter(self.trozos)
+
+def _registros(trozos):
+    return [registro for lote in iterar_lotes_json(_RespuestaPorTrozos(trozos), tamano_lote=3) for registro in lote]
+
+def test_documento_cortado_en_cada_posicion():
+    esperado = json.loads(documento)["data"]
+    for corte in range(len(documento) + 1):
+        assert _registros([documento[:corte], documento[corte:]]) == esperado, f"corte en el byte {corte}"
+
+def test_documento_de_a_un_byte():
+    esperado = json.loads(documento)["data"]
+    assert _registros([documento[i:i + 1] for i in range(len(documento))]) == esperado
@@ -0,0 +1,76 @@
+# Pruebas de 'upsert_dataframe_por_copy' contra la BD de pruebas (TEST_DATABASE_URL, ver conftest.py).
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.db_utils import upsert_dataframe_por_copy
+
+tabla_prueba = "prueba_upsert_por_copy"
+
+@pytest.fixture
+def conn(conn_prueba):
+    with conn_prueba.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS public."{tabla_prueba}";')
+        cursor.execute(f"""
+            CREATE TABLE public."{tabla_prueba}" (
+                nit_ter text NOT NULL,
+                empresa_ter text NOT NULL,
+                nombre_ter text,
+                telefono_ter text,
+                UNIQUE (nit_ter, empresa_ter)
+            );
+        """)
+    conn_prueba.commit()
+    yield conn_prueba
+    conn_prueba.rollback()
+    with conn_prueba.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS public."{tabla_prueba}";')
+    conn_prueba.commit()
+
+def _terceros(filas):
+    return pd.DataFrame({
+        "nit_ter": [str(i) for i in range(filas)],
+        "empresa_ter": ["CAMDUN"] * filas,
+        "nombre_ter": [f"CLIENTE {i}" for i in range(filas)],
+        "telefono_ter": [None if i % 3 == 0 else f"300{i}" for i in range(filas)],
+    })
+
+def test_segunda_carga_igual_no_actualiza(conn):
+    df = _terceros(50)
+    primera = upsert_dataframe_por_copy(conn, df, tabla_prueba, ["nit_ter", "empresa_ter"])
+    assert (primera["insertadas"], primera["actualizadas"], primera["duplicadas"]) == (50, 0, 0)
+
+    segunda = upsert_dataframe_por_copy(conn, df, tabla_prueba, ["nit_ter", "empresa_ter"])
+    assert (segunda["insertadas"], segunda["actualizadas"], segunda["sin_cambios"]) == (0, 0, 50)
+
+def test_solo_se_actualiza_la_fila_que_cambio(conn):
+    df = _terceros(50)
+    upsert_dataframe_por_copy(conn, df, tabla_prueba, ["nit_ter", "empresa_ter"])
+
+    cambiado = df.copy()
+    cambiado.loc[7, "nombre_ter"] = "CLIENTE CAMBIADO"
+    resultado = upsert_dataframe_por_copy(conn, cambiado, tabla_prueba, ["nit_ter", "empresa_ter"])
+    assert (resultado["insertadas"], resultado["actualizadas"], resultado["sin_cambios"]) == (0, 1, 49)
+
+    with conn.cursor() as cursor:
+        cursor.execute(f'SELECT nombre_ter FROM public."{tabla_prueba}" WHERE nit_ter = %s;', ("7",))
+        assert cursor.fetchone()[0] == "CLIENTE CAMBIADO"
+
+def test_llave_repetida_conserva_la_ultima_fila(conn):
+    df = _terceros(10)
+    repetida = df.iloc[[3]].assign(nombre_ter="CLIENTE 3 CORREGIDO")
+    resultado = upsert_dataframe_por_copy(conn, pd.concat([df, repetida], ignore_index=True), tabla_prueba, ["nit_ter", "empresa_ter"])
+    assert (resultado["recibidas"], resultado["duplicadas"], resultado["insertadas"]) == (11, 1, 10)
+
+    with conn.cursor() as cursor:
+        cursor.execute(f'SELECT nombre_ter FROM public."{tabla_prueba}" WHERE nit_ter = %s;', ("3",))
+        assert cursor.fetchone()[0] == "CLIENTE 3 CORREGIDO"
+
+def test_llave_que_no_es_columna():
+    # La validación ocurre antes de cualquier SQL: no necesita BD
+    with pytest.raises(ValueError):
+        upsert_dataframe_por_copy(object(), _terceros(3), tabla_prueba, ["nit", "empresa_ter"])
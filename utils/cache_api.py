@@ -0,0 +1,211 @@
+# Caché local (en disco y comprimida) de las respuestas crudas de la API de TNS.
+# Sirve para repetir una fase (tras un error de BD, mientras se ajusta la Fase 2, etc.)
+# sin volver a descargar lo mismo.
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import config
+
+_candado_limpieza = threading.Lock()
+
+def _clave(endpoint, empresa, params):
+    """Llave de la entrada: hash del endpoint, la empresa y los parámetros de la consulta."""
+    texto = json.dumps([endpoint, empresa, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def _rutas(clave):
+    """(archivo de datos comprimido, archivo de metadatos) de una entrada."""
+    base = os.path.join(config.api_cache_dir, clave)
+    return base + ".json.gz", base + ".meta.json"
+
+def _borrar_entrada(ruta_datos, ruta_meta):
+    for ruta in (ruta_meta, ruta_datos):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass # Ya no existe o está abierta por otro hilo; se limpiará en la próxima pasada
+
+class _RespuestaCacheada:
+    """
+    Imita lo que 'iterar_lotes_json' usa de una respuesta de 'requests'
+    (iter_content, encoding y el bloque 'with'), leyendo desde el archivo comprimido.
+    """
+    def __init__(self, ruta_datos, encoding):
+        self._archivo = gzip.open(ruta_datos, 'rb')
+        self.encoding = encoding
+        self.status_code = 200
+        self.ok = True
+
+    def iter_content(self, chunk_size=64 * 1024):
+        while True:
+            trozo = self._archivo.read(chunk_size)
+            if not trozo:
+                return
+            yield trozo
+
+    def close(self):
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class _RespuestaGrabada:
+    """
+    Envuelve una respuesta real: a medida que se leen los bytes los va guardando comprimidos
+    en un archivo temporal. Al salir del 'with' sin errores, termina de leer el cuerpo y deja
+    la entrada en la caché. Si hubo un error (o la lectura se cortó) la entrada se descarta.
+    """
+    def __init__(self, response, clave, metadatos):
+        self._response = response
+        self._clave = clave
+        self._metadatos = metadatos
+        self._iterador = None
+        self.encoding = response.encoding
+        self.status_code = response.status_code
+        self.ok = response.ok
+        self.headers = response.headers
+        descriptor, self._ruta_temporal = tempfile.mkstemp(dir=config.api_cache_dir, suffix=".tmp")
+        self._archivo = gzip.open(os.fdopen(descriptor, 'wb'), 'wb', compresslevel=config.api_cache_nivel_compresion)
+
+    def iter_content(self, chunk_size=64 * 1024):
+        self._iterador = self._response.iter_content(chunk_size=chunk_size)
+        for trozo in self._iterador:
+            self._archivo.write(trozo)
+            yield trozo
+
+    def _descartar(self):
+        self._archivo.close()
+        try:
+            os.remove(self._ruta_temporal)
+        except OSError:
+            pass
+
+    def _guardar(self):
+        # El parser deja de leer al cerrar la lista; el resto del cuerpo también va a la caché
+        for trozo in (self._iterador if self._iterador is not None else self._response.iter_content(chunk_size=64 * 1024)):
+            self._archivo.write(trozo)
+        self._archivo.close()
+        ruta_datos, ruta_meta = _rutas(self._clave)
+        self._metadatos["encoding"] = self.encoding or 'utf-8'
+        self._metadatos["creado"] = time.time()
+        try:
+            os.replace(self._ruta_temporal, ruta_datos)
+            with open(ruta_meta, 'w', encoding='utf-8') as archivo_meta:
+                json.dump(self._metadatos, archivo_meta)
+        except OSError as e:
+            print(f"ADVERTENCIA: No se pudo guardar la respuesta en la caché: {e}")
+            self._descartar()
+            return
+        limpiar_cache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_error, *exc):
+        try:
+            if tipo_error is None:
+                self._guardar()
+            else:
+                self._descartar()
+        except Exception as e:
+            print(f"ADVERTENCIA: No se pudo guardar la respuesta en la caché: {e}")
+            self._descartar()
+        finally:
+            self._response.close()
+        return False
+
+def leer(endpoint, empresa, params=None):
+    """
+    Busca la respuesta guardada para (endpoint, empresa, params).
+    Retorna un objeto tipo respuesta para pasarle a 'iterar_lotes_json', o None si la
+    caché está desactivada, no hay entrada o ya venció.
+    """
+    if not config.api_cache_habilitado:
+        return None
+    ruta_datos, ruta_meta = _rutas(_clave(endpoint, empresa, params))
+    try:
+        with open(ruta_meta, encoding='utf-8') as archivo_meta:
+            metadatos = json.load(archivo_meta)
+        if metadatos["expira"] is not None and metadatos["expira"] < time.time():
+            _borrar_entrada(ruta_datos, ruta_meta)
+            return None
+        # El último acceso (atime) es el que usa el desalojo LRU
+        os.utime(ruta_datos, (time.time(), os.path.getmtime(ruta_datos)))
+        respuesta = _RespuestaCacheada(ruta_datos, metadatos["encoding"])
+    except (OSError, ValueError, KeyError):
+        return None
+    print(f"[{empresa}] Info: '{endpoint}' {params or ''} leído de la caché local.")
+    return respuesta
+
+def grabar(response, endpoint, empresa, params=None, ttl=None):
+    """
+    Envuelve una respuesta real (pedida con stream=True y ya validada) para guardarla en la
+    caché mientras se lee. Si la caché está desactivada retorna la misma respuesta.
+    :param ttl: segundos de vigencia. Si es None se usa el del endpoint en config.api_cache_ttl;
+                'sin_vencimiento' la guarda sin fecha de vencimiento (ventanas históricas cerradas).
+    """
+    if not config.api_cache_habilitado:
+        return response
+    if ttl is None:
+        ttl = config.api_cache_ttl.get(endpoint, 0)
+    metadatos = {
+        "endpoint": endpoint, "empresa": empresa, "params": params,
+        "expira": None if ttl == 'sin_vencimiento' else time.time() + ttl,
+    }
+    try:
+        os.makedirs(config.api_cache_dir, exist_ok=True)
+        return _RespuestaGrabada(response, _clave(endpoint, empresa, params), metadatos)
+    except OSError as e:
+        print(f"ADVERTENCIA: No se pudo usar la caché local ({e}). Se continúa sin caché.")
+        return response
+
+def limpiar_cache(max_bytes=None):
+    """
+    Borra las entradas vencidas y, si la caché supera 'max_bytes' (config.api_cache_max_bytes),
+    las usadas hace más tiempo (LRU) hasta quedar por debajo del límite.
+    Retorna el número de entradas borradas.
+    """
+    max_bytes = config.api_cache_max_bytes if max_bytes is None else max_bytes
+    if not os.path.isdir(config.api_cache_dir):
+        return 0
+    with _candado_limpieza:
+        ahora = time.time()
+        entradas = []
+        borradas = 0
+        for nombre in os.listdir(config.api_cache_dir):
+            if not nombre.endswith(".meta.json"):
+                continue
+            clave = nombre[:-len(".meta.json")]
+            ruta_datos, ruta_meta = _rutas(clave)
+            try:
+                with open(ruta_meta, encoding='utf-8') as archivo_meta:
+                    expira = json.load(archivo_meta)["expira"]
+                estado = os.stat(ruta_datos)
+            except (OSError, ValueError, KeyError):
+                _borrar_entrada(ruta_datos, ruta_meta)
+                borradas += 1
+                continue
+            if expira is not None and expira < ahora:
+                _borrar_entrada(ruta_datos, ruta_meta)
+                borradas += 1
+                continue
+            entradas.append((estado.st_atime, estado.st_size, ruta_datos, ruta_meta))
+
+        total = sum(tamano for _, tamano, _, _ in entradas)
+        for _, tamano, ruta_datos, ruta_meta in sorted(entradas):
+            if total <= max_bytes:
+                break
+            _borrar_entrada(ruta_datos, ruta_meta)
+            total -= tamano
+            borradas += 1
+    return borradas
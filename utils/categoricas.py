@@ -0,0 +1,42 @@
+# Columnas categóricas: los textos que se repiten en miles de filas (empresa, zona, vendedor...)
+# se guardan una sola vez por valor y cada fila solo lleva un código entero.
+
+import pandas as pd
+
+def _megas(num_bytes):
+    return num_bytes / (1024 * 1024)
+
+def compactar_categoricas(df, columnas, reportar=False):
+    """
+    Convierte a 'category' las columnas indicadas que existan en el DataFrame (los nulos quedan como NaN).
+    Las que ya son categóricas se dejan igual. Con 'reportar' imprime la memoria de cada columna
+    antes y después. Modifica y retorna el mismo DataFrame.
+    """
+    filas_reporte = []
+    for col in columnas:
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        antes = df[col].memory_usage(index=False, deep=True) if reportar else 0
+        df[col] = df[col].astype('category')
+        if reportar:
+            filas_reporte.append((col, antes, df[col].memory_usage(index=False, deep=True), len(df[col].cat.categories)))
+
+    if filas_reporte:
+        print("Info: Memoria de las columnas categóricas (antes -> después):")
+        for col, antes, despues, valores in filas_reporte:
+            reduccion = 100 * (1 - despues / antes) if antes else 0
+            print(f"  {col:<15} {_megas(antes):>9.2f} MB -> {_megas(despues):>7.2f} MB  (-{reduccion:.0f}%, {valores} valores distintos)")
+        total_antes = sum(fila[1] for fila in filas_reporte)
+        total_despues = sum(fila[2] for fila in filas_reporte)
+        print(f"  {'TOTAL':<15} {_megas(total_antes):>9.2f} MB -> {_megas(total_despues):>7.2f} MB")
+    return df
+
+def recategorizar(df, columnas):
+    """
+    pd.concat convierte en texto (object) las categóricas cuyas categorías no coinciden
+    entre las partes; esto las vuelve a dejar como 'category'.
+    """
+    for col in columnas:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
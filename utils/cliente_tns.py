@@ -0,0 +1,77 @@
+# Cliente compartido de la API de TNS: una sola sesión HTTP (conexiones keep-alive reutilizadas)
+# y un token por empresa que se pide una vez por proceso y se renueva al vencer o con un 401.
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+_sesion = None
+_candado_sesion = threading.Lock()
+_tokens = {} # nombre_corto -> (token, momento en que vence)
+_candados_empresa = {}
+
+def obtener_sesion():
+    """Retorna la sesión HTTP del proceso (se crea la primera vez), con un pool de conexiones por host."""
+    global _sesion
+    with _candado_sesion:
+        if _sesion is None:
+            sesion = requests.Session()
+            # Un hilo por empresa y varias ventanas por empresa comparten el pool
+            tamano_pool = max(10, config.api_max_workers * config.ventas_max_workers_ventanas)
+            adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=tamano_pool)
+            sesion.mount("https://", adaptador)
+            sesion.mount("http://", adaptador)
+            _sesion = sesion
+        return _sesion
+
+def _candado_de(nombre_empresa):
+    with _candado_sesion:
+        return _candados_empresa.setdefault(nombre_empresa, threading.Lock())
+
+def obtener_token(empresa_config, token_rechazado=None):
+    """
+    Retorna el token Bearer de la empresa. Solo hace login si no hay uno guardado,
+    si ya venció (config.api_token_vigencia) o si el guardado es 'token_rechazado' (un 401).
+    Si otro hilo ya lo renovó, se usa el nuevo sin volver a hacer login.
+    """
+    nombre_empresa = empresa_config["nombre_corto"]
+    with _candado_de(nombre_empresa):
+        token, vence = _tokens.get(nombre_empresa, (None, 0))
+        if token and token != token_rechazado and time.time() < vence:
+            return token
+
+        print(f"[{nombre_empresa}] Solicitando token de acceso...")
+        login_payload = {
+            "codigoEmpresa": empresa_config["empresa_tns"],
+            "nombreUsuario": empresa_config["usuario_tns"],
+            "contrasenia": empresa_config["password_tns"]
+        }
+        login_response = obtener_sesion().post(config.api_url["login"], json=login_payload, timeout=config.api_timeout_login)
+        login_response.raise_for_status() # Lanza error si el login falla
+        token = login_response.json()["data"]
+        _tokens[nombre_empresa] = (token, time.time() + config.api_token_vigencia)
+        print(f"[{nombre_empresa}] Token obtenido con éxito.")
+        return token
+
+def consultar(empresa_config, endpoint, params=None, timeout=None, stream=True):
+    """
+    GET autenticado a un endpoint de config.api_url ('ventas', 'productos', 'tercero').
+    Si el servidor responde 401 (token vencido) se hace login de nuevo y se reintenta una vez.
+    Retorna la respuesta sin validar el estado: cada cargador decide qué hacer con los errores.
+    :param timeout: segundos; por defecto config.api_timeout_consulta.
+    """
+    timeout = timeout or config.api_timeout_consulta
+    url = config.api_url[endpoint]
+    token = obtener_token(empresa_config)
+    for intento in range(2):
+        headers = {"Authorization": f"Bearer {token}"}
+        response = obtener_sesion().get(url, headers=headers, params=params, timeout=timeout, stream=stream)
+        if response.status_code != 401 or intento == 1:
+            return response
+        response.close()
+        print(f"[{empresa_config['nombre_corto']}] Token rechazado (401). Renovando...")
+        token = obtener_token(empresa_config, token_rechazado=token)
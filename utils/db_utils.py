@@ -1,5 +1,11 @@
 # Funciones de utilidad para interactuar con la base de datos
  
+import io
+import struct
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
 import psycopg2
 from psycopg2 import extras
 import config
@@ -79,4 +85,346 @@ def copy_csv_to_db(conn, csv_filepath, table_name):
         except psycopg2.Error as e:
             print(f"Error al ejecutar copy en la tabla '{table_name}': {e}")
             conn.rollback()
-            raise
\ No newline at end of file
+            raise
+
+# --- Carga masiva desde memoria (COPY FROM STDIN) ---
+
+def _nombre_columnas_sql(columnas):
+    """Lista de columnas entre comillas dobles, lista para un INSERT o un COPY."""
+    return ', '.join(f'"{c}"' for c in columnas)
+
+# --- Codificador de filas compartido por todas las cargas ---
+
+def _convertir_sin_nulos(serie):
+    """Enteros/booleanos de numpy: no pueden tener nulos, .tolist() ya da int/bool de Python."""
+    return serie.to_numpy().tolist()
+
+def _convertir_flotante(serie):
+    """Floats de numpy: float de Python y None donde hay NaN."""
+    valores = serie.to_numpy()
+    objetos = valores.astype(object)
+    objetos[np.isnan(valores)] = None
+    return objetos
+
+def _convertir_generico(serie):
+    """Int64/boolean nulables, fechas, categóricas y textos: objetos de Python y None en NA/NaT/NaN."""
+    nulos = serie.isna().to_numpy()
+    if not nulos.any():
+        return serie.to_numpy(dtype=object)
+    # copy=True: en columnas de texto to_numpy puede devolver el arreglo del propio DataFrame
+    objetos = serie.to_numpy(dtype=object, copy=True)
+    objetos[nulos] = None
+    return objetos
+
+def _conversor_columna(dtype):
+    """Elige UNA vez, según el tipo de la columna, cómo convertirla a valores nativos de Python."""
+    if isinstance(dtype, np.dtype):
+        if dtype.kind in 'iub':
+            return _convertir_sin_nulos
+        if dtype.kind == 'f':
+            return _convertir_flotante
+    return _convertir_generico
+
+def iterar_filas_en_lotes(df, tamano_lote=None):
+    """
+    Codificador de filas compartido por las cargas a la BD.
+    Produce el DataFrame en lotes (listas de tuplas) con tipos nativos de Python y None en lugar
+    de NA/NaN/NaT, listos para psycopg2 (execute_values) o para COPY.
+    La conversión se hace columna por columna (vectorizada) y solo para el lote actual, así no se
+    materializan copias del DataFrame completo como objetos de Python.
+    """
+    tamano_lote = tamano_lote or config.db_tamano_lote
+    conversores = [_conversor_columna(dtype) for dtype in df.dtypes]
+    for inicio in range(0, len(df), tamano_lote):
+        lote = df.iloc[inicio:inicio + tamano_lote]
+        columnas = [convertir(lote.iloc[:, i]) for i, convertir in enumerate(conversores)]
+        yield list(zip(*columnas))
+
+def insert_dataframe_to_db(conn, df, table_name, page_size=1000, commit=True):
+    """
+    Inserta un DataFrame con INSERT ... VALUES (extras.execute_values).
+    Es el método clásico; se conserva como alternativa y como referencia en los benchmarks.
+    Retorna el número de filas insertadas.
+    """
+    query_insert = f'INSERT INTO public."{table_name}" ({_nombre_columnas_sql(df.columns)}) VALUES %s;'
+    total = 0
+    with conn.cursor() as cursor:
+        try:
+            for lote in iterar_filas_en_lotes(df):
+                extras.execute_values(cursor, query_insert, lote, page_size=page_size)
+                total += len(lote)
+            if commit:
+                conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error al insertar en la tabla '{table_name}': {e}")
+            conn.rollback()
+            raise
+    return total
+
+def _texto_copy(valor):
+    """Convierte un valor de Python al formato de texto de COPY (NULL = \\N)."""
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    texto = valor if isinstance(valor, str) else str(valor)
+    return (texto.replace('\\', '\\\\').replace('\t', '\\t')
+                 .replace('\n', '\\n').replace('\r', '\\r'))
+
+def _lotes_copy_texto(lotes_filas):
+    """Convierte lotes de filas en bloques de bytes del formato de texto de COPY."""
+    for lote in lotes_filas:
+        lineas = ['\t'.join([_texto_copy(v) for v in fila]) for fila in lote]
+        if lineas:
+            yield ('\n'.join(lineas) + '\n').encode('utf-8')
+
+# Fecha base del formato binario de PostgreSQL
+_EPOCA_PG = date(2000, 1, 1)
+_EPOCA_PG_DATETIME = datetime(2000, 1, 1)
+
+def _numeric_binario(valor):
+    """Codifica un número en el formato binario del tipo NUMERIC (dígitos en base 10000)."""
+    decimal = valor if isinstance(valor, Decimal) else Decimal(repr(valor) if isinstance(valor, float) else str(valor))
+    if decimal.is_nan():
+        return struct.pack('>hhHh', 0, 0, 0xC000, 0)
+    signo, digitos, exponente = decimal.as_tuple()
+    escala = max(0, -exponente)
+    entero = int(''.join(map(str, digitos))) if digitos else 0
+    # Alineamos el exponente a un múltiplo de 4 (un dígito en base 10000)
+    if exponente % 4:
+        entero *= 10 ** (exponente % 4)
+        exponente -= exponente % 4
+    grupos = []
+    while entero:
+        entero, resto = divmod(entero, 10000)
+        grupos.append(resto)
+    grupos.reverse()
+    peso = len(grupos) - 1 + exponente // 4 if grupos else 0
+    while grupos and grupos[-1] == 0:
+        grupos.pop()
+    return struct.pack(f'>hhHh{len(grupos)}h', len(grupos), peso, 0x4000 if signo else 0, escala, *grupos)
+
+def _fecha_binaria(valor):
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor[:10])
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    return struct.pack('>i', (valor - _EPOCA_PG).days)
+
+def _timestamp_binario(valor):
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    elif not isinstance(valor, datetime):
+        valor = datetime(valor.year, valor.month, valor.day)
+    delta = valor.replace(tzinfo=None) - _EPOCA_PG_DATETIME
+    return struct.pack('>q', (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+
+def _texto_binario(valor):
+    return (valor if isinstance(valor, str) else str(valor)).encode('utf-8')
+
+# Codificadores binarios por tipo de PostgreSQL (pg_type.typname)
+_CODIFICADORES_BINARIOS = {
+    'int2': lambda v: struct.pack('>h', int(v)),
+    'int4': lambda v: struct.pack('>i', int(v)),
+    'int8': lambda v: struct.pack('>q', int(v)),
+    'float4': lambda v: struct.pack('>f', float(v)),
+    'float8': lambda v: struct.pack('>d', float(v)),
+    'bool': lambda v: b'\x01' if v else b'\x00',
+    'numeric': _numeric_binario,
+    'date': _fecha_binaria,
+    'timestamp': _timestamp_binario,
+    'timestamptz': _timestamp_binario,
+    'text': _texto_binario,
+    'varchar': _texto_binario,
+    'bpchar': _texto_binario,
+}
+
+def obtener_tipos_columnas(conn, table_name, esquema='public'):
+    """Retorna {columna: typname} de una tabla (tipos base, sin modificadores)."""
+    query = """
+        SELECT a.attname, t.typname
+        FROM pg_attribute a
+        JOIN pg_type t ON t.oid = a.atttypid
+        WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped;
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(query, (f'{esquema}."{table_name}"',))
+        return dict(cursor.fetchall())
+
+def _lotes_copy_binario(lotes_filas, tipos):
+    """Convierte lotes de filas en bloques de bytes del formato binario de COPY."""
+    codificadores = []
+    for tipo in tipos:
+        if tipo not in _CODIFICADORES_BINARIOS:
+            raise ValueError(f"El tipo '{tipo}' no está soportado en COPY binario. Use el formato 'text'.")
+        codificadores.append(_CODIFICADORES_BINARIOS[tipo])
+    cabecera_fila = struct.pack('>h', len(codificadores))
+    nulo = struct.pack('>i', -1)
+
+    # Cabecera: firma + flags + longitud de la extensión
+    yield b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+    for lote in lotes_filas:
+        partes = []
+        for fila in lote:
+            partes.append(cabecera_fila)
+            for valor, codificar in zip(fila, codificadores):
+                if valor is None:
+                    partes.append(nulo)
+                else:
+                    campo = codificar(valor)
+                    partes.append(struct.pack('>i', len(campo)))
+                    partes.append(campo)
+        yield b''.join(partes)
+    yield struct.pack('>h', -1) # Fin del flujo
+
+class _FlujoCopy:
+    """
+    Objeto tipo archivo que psycopg2 lee con .read(n) durante el COPY.
+    Genera los bytes lote a lote, así nunca está el contenido completo en memoria.
+    """
+    def __init__(self, bloques):
+        self._bloques = iter(bloques)
+        self._actual = None
+
+    def read(self, n=-1):
+        partes = []
+        faltan = n
+        while faltan != 0:
+            if self._actual is None:
+                bloque = next(self._bloques, None)
+                if bloque is None:
+                    break
+                self._actual = io.BytesIO(bloque)
+            datos = self._actual.read(faltan if faltan > 0 else -1)
+            if not datos:
+                self._actual = None
+                continue
+            partes.append(datos)
+            if faltan > 0:
+                faltan -= len(datos)
+        return b''.join(partes)
+
+def copy_rows_to_db(conn, lotes_filas, columnas, table_name, formato='text', commit=True, esquema='public'):
+    """
+    Carga lotes de filas (iterable de listas de tuplas, con None para NULL) en una tabla
+    usando COPY ... FROM STDIN en formato 'text' o 'binary', desde un buffer en memoria.
+    Para una tabla temporal use esquema='pg_temp'.
+    Retorna el número de filas cargadas.
+    """
+    if formato not in ('text', 'binary'):
+        raise ValueError(f"Formato de COPY no soportado: {formato}")
+
+    contador = {"filas": 0}
+    def contar(lotes):
+        for lote in lotes:
+            contador["filas"] += len(lote)
+            yield lote
+
+    with conn.cursor() as cursor:
+        try:
+            if formato == 'binary':
+                tipos_tabla = obtener_tipos_columnas(conn, table_name, esquema)
+                bloques = _lotes_copy_binario(contar(lotes_filas), [tipos_tabla[c] for c in columnas])
+                opciones = "FORMAT binary"
+            else:
+                bloques = _lotes_copy_texto(contar(lotes_filas))
+                opciones = "FORMAT text, ENCODING 'UTF8'"
+            query_copy = f'COPY {esquema}."{table_name}" ({_nombre_columnas_sql(columnas)}) FROM STDIN WITH ({opciones})'
+            cursor.copy_expert(query_copy, _FlujoCopy(bloques), size=1024 * 1024)
+            if commit:
+                conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error al ejecutar COPY ({formato}) en la tabla '{table_name}': {e}")
+            conn.rollback()
+            raise
+    return contador["filas"]
+
+def copy_dataframe_to_db(conn, df, table_name, formato='text', tamano_lote=None, commit=True, esquema='public'):
+    """
+    Carga un DataFrame con COPY FROM STDIN sin pasar por un archivo en disco.
+    Los NA/NaN/NaT se envían como NULL, igual que en la carga con INSERT.
+    Retorna el número de filas cargadas.
+    """
+    return copy_rows_to_db(conn, iterar_filas_en_lotes(df, tamano_lote), list(df.columns), table_name, formato, commit, esquema)
+
+# --- UPSERT por conjuntos (COPY a una tabla temporal + un solo INSERT ... ON CONFLICT) ---
+
+def upsert_dataframe_por_copy(conn, df, table_name, llaves, columnas_actualizar=None, solo_si_cambia=True, commit=True):
+    """
+    Inserta o actualiza un DataFrame en 'table_name' según la llave única 'llaves':
+    1. COPY (formato texto) de todas las filas a una tabla temporal con la estructura de la tabla.
+    2. Un solo INSERT ... SELECT DISTINCT ON (llaves) ... ON CONFLICT DO UPDATE desde la temporal.
+    Si una llave viene repetida en el DataFrame gana la última fila (como con UPSERT fila a fila),
+    en lugar de abortar con "ON CONFLICT DO UPDATE command cannot affect row a second time".
+
+    :param columnas_actualizar: columnas que se actualizan cuando la llave ya existe
+                                (por defecto todas las del DataFrame menos la llave).
+    :param solo_si_cambia: solo actualiza las filas en las que alguna de esas columnas cambió
+                           (WHERE ... IS DISTINCT FROM ...); las iguales no se reescriben, así no
+                           dejan tuplas muertas ni generan WAL.
+    Retorna un dict con 'recibidas', 'duplicadas', 'insertadas', 'actualizadas' y 'sin_cambios'.
+    Lanza ValueError si alguna de las 'llaves' no es columna del DataFrame (el COPY no la
+    llenaría y todas las filas quedarían con la misma llave).
+    """
+    columnas = list(df.columns)
+    faltantes = [llave for llave in llaves if llave not in columnas]
+    if faltantes:
+        raise ValueError(f"Las llaves {', '.join(faltantes)} no son columnas del DataFrame a cargar en '{table_name}'.")
+    if columnas_actualizar is None:
+        columnas_actualizar = [col for col in columnas if col not in llaves]
+    tabla_temporal = f"{table_name}_entrada"
+    columnas_sql = _nombre_columnas_sql(columnas)
+    llaves_sql = _nombre_columnas_sql(llaves)
+
+    if columnas_actualizar:
+        update_clausule = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in columnas_actualizar)
+        accion_conflicto = f"DO UPDATE SET {update_clausule}"
+        if solo_si_cambia:
+            actuales = ', '.join(f'destino."{col}"' for col in columnas_actualizar)
+            nuevos = ', '.join(f'EXCLUDED."{col}"' for col in columnas_actualizar)
+            accion_conflicto += f" WHERE ROW({actuales}) IS DISTINCT FROM ROW({nuevos})"
+    else:
+        accion_conflicto = "DO NOTHING"
+
+    # '_fila' guarda el orden de llegada del COPY para quedarse con la última fila de cada llave.
+    # (xmax = 0) distingue en el RETURNING las filas insertadas de las actualizadas; las que no
+    # cambiaron no aparecen en el RETURNING.
+    query_merge = f"""
+        WITH entrada AS (
+            SELECT DISTINCT ON ({llaves_sql}) {columnas_sql}
+            FROM pg_temp."{tabla_temporal}"
+            ORDER BY {llaves_sql}, "_fila" DESC
+        ), aplicadas AS (
+            INSERT INTO public."{table_name}" AS destino ({columnas_sql})
+            SELECT {columnas_sql} FROM entrada
+            ON CONFLICT ({llaves_sql}) {accion_conflicto}
+            RETURNING (xmax = 0) AS insertada
+        )
+        SELECT (SELECT count(*) FROM entrada),
+               count(*) FILTER (WHERE insertada),
+               count(*) FILTER (WHERE NOT insertada)
+        FROM aplicadas;
+    """
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(f'DROP TABLE IF EXISTS pg_temp."{tabla_temporal}";')
+            cursor.execute(f'CREATE TEMP TABLE "{tabla_temporal}" (LIKE public."{table_name}" INCLUDING DEFAULTS) ON COMMIT DROP;')
+            cursor.execute(f'ALTER TABLE pg_temp."{tabla_temporal}" ADD COLUMN "_fila" bigserial;')
+            recibidas = copy_dataframe_to_db(conn, df, tabla_temporal, commit=False, esquema='pg_temp')
+            cursor.execute(query_merge)
+            unicas, insertadas, actualizadas = cursor.fetchone()
+            if commit:
+                conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error en el UPSERT por COPY de la tabla '{table_name}': {e}")
+            conn.rollback()
+            raise
+    return {
+        "recibidas": recibidas,
+        "duplicadas": recibidas - unicas,
+        "insertadas": insertadas,
+        "actualizadas": actualizadas,
+        "sin_cambios": unicas - insertadas - actualizadas,
+    }
@@ -0,0 +1,95 @@
+# Diario (checkpoint) de la extracción de la Fase 1: registra qué unidades
+# (empresa, endpoint, ventana) ya terminaron y guarda sus datos en disco, para que una
+# ejecución interrumpida pueda reanudarse sin volver a pedirle a la API lo que ya trajo.
+
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+
+import config
+
+class DiarioExtraccion:
+    """
+    Carpeta de una corrida (ej. .checkpoints/ventas_2025-09-01_2025-09-30) con:
+    - diario.jsonl: una línea por unidad terminada.
+    - un archivo .pkl.gz por unidad con los registros crudos extraídos.
+    Es seguro usarlo desde varios hilos.
+    """
+    def __init__(self, nombre_corrida, reanudar=False):
+        self.ruta = os.path.join(config.checkpoint_dir, nombre_corrida)
+        self._ruta_diario = os.path.join(self.ruta, "diario.jsonl")
+        self._candado = threading.Lock()
+        self._unidades = {}
+        self.fallas = []
+        if not reanudar and os.path.isdir(self.ruta):
+            shutil.rmtree(self.ruta) # Corrida nueva: se descarta el checkpoint anterior del mismo rango
+        os.makedirs(self.ruta, exist_ok=True)
+        if reanudar:
+            self._leer_diario()
+            print(f"Info: Reanudando la corrida '{nombre_corrida}': {len(self._unidades)} unidades ya extraídas.")
+
+    @staticmethod
+    def _llave(empresa, endpoint, inicio, fin):
+        return f"{empresa}|{endpoint}|{inicio}|{fin}"
+
+    def _leer_diario(self):
+        if not os.path.exists(self._ruta_diario):
+            return
+        with open(self._ruta_diario, encoding='utf-8') as archivo:
+            for linea in archivo:
+                try:
+                    unidad = json.loads(linea)
+                except ValueError:
+                    continue # Última línea cortada por la interrupción
+                if unidad["archivo"] and not os.path.exists(os.path.join(self.ruta, unidad["archivo"])):
+                    continue
+                self._unidades[self._llave(unidad["empresa"], unidad["endpoint"], unidad["inicio"], unidad["fin"])] = unidad
+
+    def leer(self, empresa, endpoint, inicio, fin):
+        """Retorna el DataFrame guardado de la unidad, o None si todavía no se ha extraído."""
+        unidad = self._unidades.get(self._llave(empresa, endpoint, inicio, fin))
+        if unidad is None:
+            return None
+        if not unidad["archivo"]:
+            return pd.DataFrame()
+        return pd.read_pickle(os.path.join(self.ruta, unidad["archivo"]))
+
+    def registrar(self, empresa, endpoint, inicio, fin, df):
+        """Guarda los datos de una unidad terminada y la anota en el diario (en ese orden)."""
+        llave = self._llave(empresa, endpoint, inicio, fin)
+        archivo = None
+        if df is not None and not df.empty:
+            archivo = f"{empresa}_{endpoint}_{inicio}_{fin}.pkl.gz"
+            ruta_temporal = os.path.join(self.ruta, archivo + ".tmp")
+            df.to_pickle(ruta_temporal, compression='gzip')
+            os.replace(ruta_temporal, os.path.join(self.ruta, archivo))
+        unidad = {
+            "empresa": empresa, "endpoint": endpoint, "inicio": str(inicio), "fin": str(fin),
+            "archivo": archivo, "registros": 0 if df is None else len(df),
+        }
+        with self._candado:
+            with open(self._ruta_diario, 'a', encoding='utf-8') as archivo_diario:
+                archivo_diario.write(json.dumps(unidad) + "\n")
+                archivo_diario.flush()
+                os.fsync(archivo_diario.fileno())
+            self._unidades[llave] = unidad
+
+    def registrar_falla(self, empresa, endpoint, error):
+        """Anota que una empresa no terminó en esta ejecución (sus ventanas terminadas sí quedan guardadas)."""
+        with self._candado:
+            self.fallas.append((empresa, endpoint, str(error)))
+
+    def completo(self):
+        """True si en esta ejecución no falló ninguna unidad."""
+        return not self.fallas
+
+    def eliminar(self):
+        """Borra el checkpoint (se llama cuando la corrida terminó completa)."""
+        shutil.rmtree(self.ruta, ignore_errors=True)
+
+def existe_checkpoint(nombre_corrida):
+    """True si hay un checkpoint pendiente para la corrida indicada."""
+    return os.path.exists(os.path.join(config.checkpoint_dir, nombre_corrida, "diario.jsonl"))
@@ -0,0 +1,144 @@
+# Escritura de archivos .xlsx en streaming: openpyxl en modo 'write_only' escribe cada fila al
+# archivo a medida que llega, sin armar en memoria el DataFrame ni el libro completo.
+#
+# Un .xlsx es un zip y la hoja es un XML ('xl/worksheets/sheet1.xml'). En modo 'write_only'
+# openpyxl escribe los textos en la misma celda (sin tabla de textos compartidos) y sin
+# dimensiones, así que para reemplazar las últimas filas de un archivo escrito aquí basta con
+# cortar ese XML en una fila y pegar las filas nuevas: 'anexar_filas_xlsx'.
+
+import os
+import re
+import tempfile
+import zipfile
+
+from openpyxl import Workbook
+
+# Filas por hoja que admite Excel (incluye la fila de encabezados)
+MAX_FILAS_EXCEL = 1048576
+
+_HOJA = "xl/worksheets/sheet1.xml"
+_ESTILOS = "xl/styles.xml"
+_FIN_FILAS = b"</sheetData>"
+_TAMANO_BLOQUE = 1 << 20
+
+def escribir_xlsx_por_lotes(ruta_archivo, columnas, lotes_filas, max_filas=MAX_FILAS_EXCEL):
+    """
+    Escribe un .xlsx con los lotes de filas (iterable de listas de tuplas, None para las celdas
+    vacías), cada hoja con la fila de encabezados. Al llegar a 'max_filas' en una hoja se sigue
+    en una nueva: Sheet1, Sheet2, ... (el primer nombre es el mismo que usa pandas.to_excel).
+    Se escribe en un archivo temporal y se renombra al final, así una exportación interrumpida
+    no deja el archivo anterior a medias.
+    Retorna (filas escritas, hojas).
+    """
+    libro = Workbook(write_only=True)
+    filas_por_hoja = max_filas - 1
+    hoja, filas_en_hoja, hojas, total = None, 0, 0, 0
+
+    for lote in lotes_filas:
+        for fila in lote:
+            if hoja is None or filas_en_hoja == filas_por_hoja:
+                hojas += 1
+                hoja = libro.create_sheet(f"Sheet{hojas}")
+                hoja.append(list(columnas))
+                filas_en_hoja = 0
+            hoja.append(fila)
+            filas_en_hoja += 1
+            total += 1
+
+    if hoja is None: # Sin filas: solo los encabezados
+        hojas = 1
+        libro.create_sheet("Sheet1").append(list(columnas))
+
+    ruta_temporal = ruta_archivo + ".tmp"
+    try:
+        libro.save(ruta_temporal)
+        os.replace(ruta_temporal, ruta_archivo)
+    finally:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+    return total, hojas
+
+def _filas_xml(columnas, lotes_filas, primera_fila):
+    """
+    Genera con openpyxl el XML de las filas (sin encabezados), numeradas desde 'primera_fila'.
+    Retorna (xml, filas, estilos del libro).
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_cola = os.path.join(directorio, "cola.xlsx")
+        filas, _ = escribir_xlsx_por_lotes(ruta_cola, columnas, lotes_filas)
+        with zipfile.ZipFile(ruta_cola) as libro:
+            hoja = libro.read(_HOJA)
+            estilos = libro.read(_ESTILOS)
+
+    # Lo que hay entre el final de la fila de encabezados y el cierre de la hoja
+    xml = hoja[hoja.index(b"</row>") + len(b"</row>"):hoja.rindex(_FIN_FILAS)]
+    desplazamiento = primera_fila - 2
+    xml = re.sub(
+        rb'(<row r="|<c r="[A-Z]+)(\d+)',
+        lambda m: m.group(1) + str(int(m.group(2)) + desplazamiento).encode(),
+        xml
+    )
+    return xml, filas, estilos
+
+def _copiar_hasta(origen, destino, marcadores, inicial=b""):
+    """
+    Copia de 'origen' a 'destino' (None para descartar) hasta justo antes del primero de los
+    'marcadores' que aparezca. Retorna lo ya leído desde ese marcador (incluido).
+    """
+    largo = max(len(marcador) for marcador in marcadores)
+    pendiente = inicial
+    while True:
+        bloque = origen.read(_TAMANO_BLOQUE)
+        datos = pendiente + bloque
+        posiciones = [posicion for posicion in (datos.find(marcador) for marcador in marcadores) if posicion >= 0]
+        if posiciones:
+            posicion = min(posiciones)
+            if destino is not None:
+                destino.write(datos[:posicion])
+            return datos[posicion:]
+        if not bloque:
+            raise ValueError("La hoja del archivo no tiene el formato esperado.")
+        # Se guarda la cola del bloque por si un marcador quedó partido entre dos bloques
+        corte = max(0, len(datos) - largo + 1)
+        if destino is not None:
+            destino.write(datos[:corte])
+        pendiente = datos[corte:]
+
+def anexar_filas_xlsx(ruta_archivo, fila_corte, columnas, lotes_filas):
+    """
+    Reemplaza desde la fila 'fila_corte' (la 1 son los encabezados) hasta el final de la hoja de
+    un .xlsx de una sola hoja escrito con 'escribir_xlsx_por_lotes' por las filas de 'lotes_filas'.
+    Las filas anteriores al corte no se vuelven a generar: su XML se copia tal cual (solo se
+    descomprime y se vuelve a comprimir), así el costo depende de las filas nuevas.
+    Se escribe en un archivo temporal y se renombra al final. Retorna las filas escritas.
+    """
+    xml_nuevo, filas, estilos_nuevos = _filas_xml(columnas, lotes_filas, fila_corte)
+    marcador_corte = f'<row r="{fila_corte}"'.encode()
+
+    ruta_temporal = ruta_archivo + ".tmp"
+    try:
+        with zipfile.ZipFile(ruta_archivo) as origen, \
+             zipfile.ZipFile(ruta_temporal, "w", zipfile.ZIP_DEFLATED) as destino:
+            # Las celdas de fecha apuntan a un estilo por su número: deben ser los mismos en ambos libros
+            if filas and origen.read(_ESTILOS) != estilos_nuevos:
+                raise ValueError("Los estilos del archivo no coinciden con los de las filas nuevas.")
+            for item in origen.infolist():
+                if item.filename != _HOJA:
+                    destino.writestr(item, origen.read(item.filename))
+                    continue
+                with origen.open(item) as hoja_origen, \
+                     destino.open(item.filename, "w", force_zip64=True) as hoja_destino:
+                    resto = _copiar_hasta(hoja_origen, hoja_destino, [marcador_corte, _FIN_FILAS])
+                    resto = _copiar_hasta(hoja_origen, None, [_FIN_FILAS], inicial=resto)
+                    hoja_destino.write(xml_nuevo)
+                    hoja_destino.write(resto)
+                    while True:
+                        bloque = hoja_origen.read(_TAMANO_BLOQUE)
+                        if not bloque:
+                            break
+                        hoja_destino.write(bloque)
+        os.replace(ruta_temporal, ruta_archivo)
+    finally:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+    return filas
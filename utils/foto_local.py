@@ -0,0 +1,105 @@
+# Foto local de la última carga exitosa de una entidad "foto completa" (inventario):
+# solo la llave de cada fila y un hash de 64 bits de su contenido, guardados en Parquet.
+# Comparando la extracción nueva contra esta foto se sabe, sin consultar la BD, qué filas
+# son nuevas, cuáles cambiaron y cuáles desaparecieron.
+#
+# Junto a la foto se guarda '<entidad>.bd.json' con la huella que tenía la tabla en la BD por
+# empresa al confirmar la carga ({empresa: [filas, suma de hashes de las filas]}): la foto solo se
+# usa si la BD sigue teniendo esa huella.
+
+import json
+import os
+
+import pandas as pd
+
+import config
+from utils.landing import PARQUET_DISPONIBLE
+
+def _ruta_foto(entidad):
+    return os.path.join(config.foto_local_dir, f"{entidad}.parquet")
+
+def _ruta_huellas_bd(entidad):
+    return os.path.join(config.foto_local_dir, f"{entidad}.bd.json")
+
+def huellas_por_llave(df, llaves):
+    """
+    Retorna un DataFrame con las columnas de la llave (como texto) y 'huella' (uint64 con el hash
+    del contenido completo de la fila). Si una llave viene repetida se conserva la última fila,
+    que es la que queda en la BD después de los UPSERT.
+    """
+    huellas = pd.DataFrame({col: df[col].astype(str).to_numpy() for col in llaves})
+    huellas['huella'] = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return huellas.drop_duplicates(subset=llaves, keep='last').reset_index(drop=True)
+
+def leer_foto(entidad):
+    """Lee la foto guardada de la entidad. Retorna un DataFrame (llaves + huella) o None si no hay."""
+    ruta = _ruta_foto(entidad)
+    if not PARQUET_DISPONIBLE or not os.path.exists(ruta):
+        return None
+    try:
+        return pd.read_parquet(ruta)
+    except Exception as e:
+        print(f"ADVERTENCIA: No se pudo leer la foto local de '{entidad}' ({e}). Se hará una carga completa.")
+        return None
+
+def leer_huellas_bd(entidad):
+    """Lee las huellas de la BD guardadas con la foto ({empresa: [filas, huella]}). Retorna {} si no hay."""
+    ruta = _ruta_huellas_bd(entidad)
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"ADVERTENCIA: No se pudieron leer las huellas de la BD de '{entidad}' ({e}). Se hará una carga completa.")
+        return {}
+
+def comparar_con_foto(huellas, foto, llaves, columna_empresa):
+    """
+    Compara las huellas de la extracción nueva contra la foto anterior, solo para las empresas que
+    vienen en la extracción (una empresa que falló no pierde sus filas).
+    Retorna (nuevas, cambiadas, borradas): DataFrames con las columnas de la llave.
+    """
+    empresas = huellas[columna_empresa].unique()
+    foto = foto[foto[columna_empresa].isin(empresas)]
+    cruce = huellas.merge(foto, on=llaves, how='outer', suffixes=('', '_anterior'), indicator=True)
+
+    nuevas = cruce.loc[cruce['_merge'] == 'left_only', llaves]
+    borradas = cruce.loc[cruce['_merge'] == 'right_only', llaves]
+    ambas = cruce[cruce['_merge'] == 'both']
+    cambiadas = ambas.loc[ambas['huella'] != ambas['huella_anterior'], llaves]
+    return nuevas, cambiadas, borradas
+
+def guardar_foto(entidad, huellas, columna_empresa, huellas_bd):
+    """
+    Guarda la foto después de una carga exitosa: reemplaza las filas de las empresas cargadas y
+    conserva las del resto. Se escribe en un archivo temporal y se renombra, así una corrida
+    interrumpida nunca deja una foto a medias. 'huellas_bd' ({empresa: [filas, huella]}) es la
+    huella de la tabla en la BD de las empresas cargadas; se guarda después de la foto, así que
+    si la corrida se interrumpe entre los dos archivos la próxima carga es completa.
+    """
+    if not PARQUET_DISPONIBLE:
+        return
+    anterior = leer_foto(entidad)
+    if anterior is not None:
+        anterior = anterior[~anterior[columna_empresa].isin(huellas[columna_empresa].unique())]
+        huellas = pd.concat([anterior, huellas], ignore_index=True)
+
+    os.makedirs(config.foto_local_dir, exist_ok=True)
+    ruta = _ruta_foto(entidad)
+    ruta_temporal = ruta + ".tmp"
+    huellas.to_parquet(ruta_temporal, index=False, compression=config.landing_compresion)
+    os.replace(ruta_temporal, ruta)
+
+    huellas_bd = {**leer_huellas_bd(entidad), **huellas_bd}
+    ruta = _ruta_huellas_bd(entidad)
+    ruta_temporal = ruta + ".tmp"
+    with open(ruta_temporal, "w", encoding="utf-8") as f:
+        json.dump(huellas_bd, f)
+    os.replace(ruta_temporal, ruta)
+
+def descartar_foto(entidad):
+    """Borra la foto de la entidad y sus huellas de la BD (la próxima carga será completa)."""
+    for ruta in (_ruta_foto(entidad), _ruta_huellas_bd(entidad)):
+        if os.path.exists(ruta):
+            os.remove(ruta)
@@ -0,0 +1,144 @@
+# Lectura incremental (streaming) de las respuestas JSON de la API de TNS
+
+import codecs
+import json
+import re
+
+import config
+
+_DECODIFICADOR_JSON = json.JSONDecoder()
+_ESPACIOS = re.compile(r'\s*')
+_CARACTERES_NUMERO = re.compile(r'[-+0-9.eE]*')
+
+class RespuestaDemasiadoGrandeError(Exception):
+    """El cuerpo de la respuesta superó el máximo de bytes permitido mientras se leía."""
+
+class _LectorJson:
+    """
+    Buffer de texto que se va llenando a medida que llegan los bytes de la respuesta.
+    Solo guarda lo que todavía no se ha consumido, así la memoria no crece con el tamaño total.
+    """
+    def __init__(self, trozos_bytes, encoding):
+        self._trozos = iter(trozos_bytes)
+        self._decodificador = codecs.getincrementaldecoder(encoding)()
+        self.buffer = ''
+        self.pos = 0
+        self.terminado = False
+
+    def _leer_mas(self):
+        """Descarta lo ya consumido y agrega el siguiente trozo. Retorna False si no hay más datos."""
+        if self.terminado:
+            return False
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        trozo = next(self._trozos, None)
+        if trozo is None:
+            self.buffer += self._decodificador.decode(b'', final=True)
+            self.terminado = True
+            return False
+        self.buffer += self._decodificador.decode(trozo)
+        return True
+
+    def caracter(self):
+        """Retorna el siguiente carácter que no sea espacio (sin consumirlo), o None al final."""
+        while True:
+            self.pos = _ESPACIOS.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._leer_mas():
+                return None
+
+    def consumir(self, esperado):
+        caracter = self.caracter()
+        if caracter != esperado:
+            raise ValueError(f"JSON inválido: se esperaba '{esperado}' y se encontró '{caracter}'")
+        self.pos += 1
+
+    def valor(self):
+        """Decodifica y consume el siguiente valor JSON completo (objeto, lista, string, número...)."""
+        caracter = self.caracter()
+        # Un número que llega hasta el final del buffer puede seguir en el próximo trozo ("12." de
+        # "12.5", "1e" de "1e5"): se piden más bytes antes de decodificarlo
+        if caracter is not None and caracter in '-0123456789':
+            while _CARACTERES_NUMERO.match(self.buffer, self.pos).end() == len(self.buffer) and self._leer_mas():
+                pass
+        while True:
+            try:
+                valor, fin = _DECODIFICADOR_JSON.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # El valor está cortado: pedimos más bytes y reintentamos
+                if not self._leer_mas():
+                    raise
+                continue
+            self.pos = fin
+            return valor
+
+def _limitar_bytes(trozos, max_bytes):
+    """Deja pasar los trozos de bytes y lanza RespuestaDemasiadoGrandeError si se supera max_bytes."""
+    total = 0
+    for trozo in trozos:
+        total += len(trozo)
+        if max_bytes and total > max_bytes:
+            raise RespuestaDemasiadoGrandeError(f"la respuesta superó {max_bytes} bytes")
+        yield trozo
+
+def iterar_lotes_json(response, llave='data', columnas=None, tamano_lote=None, max_bytes=None):
+    """
+    Lee una respuesta de 'requests' (pedida con stream=True) con la forma {"<llave>": [ {...}, ... ]}
+    y produce los registros de la lista en lotes de 'tamano_lote' diccionarios.
+
+    :param columnas: si se indica, cada registro conserva SOLO estas llaves mientras se parsea
+                     (las llaves que no vengan en el registro simplemente no aparecen, igual que
+                     al construir un DataFrame con la respuesta completa).
+    :param max_bytes: corta la lectura con RespuestaDemasiadoGrandeError si el cuerpo lo supera.
+
+    Lanza ValueError si la respuesta no tiene la llave esperada.
+    La memoria usada es la de un lote, no la de la respuesta completa.
+    """
+    tamano_lote = tamano_lote or config.api_tamano_lote
+    columnas = set(columnas) if columnas is not None else None
+    lector = _LectorJson(
+        _limitar_bytes(response.iter_content(chunk_size=64 * 1024), max_bytes),
+        response.encoding or 'utf-8'
+    )
+
+    lector.consumir('{')
+    if lector.caracter() == '}':
+        raise ValueError(f"La respuesta de la API no tuvo el formato esperado (sin clave '{llave}')")
+
+    while True:
+        nombre = lector.valor()
+        lector.consumir(':')
+        if nombre != llave:
+            lector.valor() # Otras llaves (ej. 'success', 'message') se leen y se descartan
+        elif lector.caracter() == 'n':
+            lector.valor() # "data": null -> sin registros
+            return
+        else:
+            lote = []
+            lector.consumir('[')
+            if lector.caracter() == ']':
+                lector.pos += 1
+            else:
+                while True:
+                    registro = lector.valor()
+                    if columnas is not None and isinstance(registro, dict):
+                        registro = {k: v for k, v in registro.items() if k in columnas}
+                    lote.append(registro)
+                    if len(lote) >= tamano_lote:
+                        yield lote
+                        lote = []
+                    if lector.caracter() == ',':
+                        lector.pos += 1
+                        continue
+                    lector.consumir(']')
+                    break
+            if lote:
+                yield lote
+            return
+
+        if lector.caracter() == ',':
+            lector.pos += 1
+            continue
+        lector.consumir('}')
+        raise ValueError(f"La respuesta de la API no tuvo el formato esperado (sin clave '{llave}')")
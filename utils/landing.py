@@ -0,0 +1,166 @@
+# Zona de aterrizaje (landing) local: copia en Parquet comprimido de cada extracción de la API,
+# particionada por entidad/empresa/fecha. Permite recargar la BD o exportar sin volver a consultar TNS.
+#
+# landing/<entidad>/empresa=<EMPRESA>/fecha=<YYYY-MM-DD>/datos.parquet
+
+import os
+import shutil
+from datetime import date
+
+import pandas as pd
+
+import config
+from utils.categoricas import recategorizar
+
+SIN_FECHA = "sin_fecha"
+
+try:
+    import pyarrow # noqa: F401 (pandas lo usa como motor de Parquet)
+    PARQUET_DISPONIBLE = True
+except ImportError:
+    PARQUET_DISPONIBLE = False
+
+def _verificar_parquet():
+    if not PARQUET_DISPONIBLE:
+        print("ADVERTENCIA: 'pyarrow' no está instalado; la zona de aterrizaje Parquet no está disponible.")
+    return PARQUET_DISPONIBLE
+
+def _ruta_particion(entidad, empresa, fecha):
+    return os.path.join(config.landing_dir, entidad, f"empresa={empresa}", f"fecha={fecha}")
+
+def _valor_particion(nombre_directorio):
+    """'empresa=CAMDUN' -> 'CAMDUN'"""
+    return nombre_directorio.split("=", 1)[1] if "=" in nombre_directorio else None
+
+def _categorias_como_texto(serie):
+    textos = serie.cat.categories.astype(str)
+    if textos.is_unique:
+        return serie.cat.rename_categories(textos)
+    # 1 y '1' quedan en la misma categoría
+    return serie.astype(str).where(serie.notna(), None).astype('category')
+
+def _preparar_para_parquet(df):
+    """
+    Las columnas de objetos pueden traer números y textos mezclados: se guardan como texto.
+    Lo mismo con las categorías de las categóricas (quedan como diccionario de textos).
+    """
+    columnas_objeto = [col for col in df.columns if df[col].dtype == object]
+    columnas_categoricas = [
+        col for col in df.columns
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and df[col].cat.categories.dtype == object
+    ]
+    if not columnas_objeto and not columnas_categoricas:
+        return df
+    df = df.astype({col: 'string' for col in columnas_objeto})
+    for col in columnas_categoricas:
+        df[col] = _categorias_como_texto(df[col])
+    return df
+
+def _restaurar_objetos(df):
+    """Los textos vuelven como objetos de Python con None en los nulos, igual que tras la extracción."""
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.StringDtype):
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df
+
+def _escribir_archivo(df, directorio):
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, "datos.parquet")
+    ruta_temporal = ruta + ".tmp"
+    _preparar_para_parquet(df).to_parquet(ruta_temporal, index=False, compression=config.landing_compresion)
+    os.replace(ruta_temporal, ruta)
+
+def escribir_landing(df, entidad, columna_empresa, columna_fecha=None, rango=None, incluir_sin_fecha=True):
+    """
+    Escribe el DataFrame en la zona de aterrizaje, un archivo por (empresa, fecha).
+    - Con 'columna_fecha' (ventas) cada día queda en su partición. Con 'rango' (desde, hasta)
+      primero se borran las particiones del rango de las empresas escritas, así un día que ya
+      no trae datos no se queda con los de una extracción anterior. 'incluir_sin_fecha' indica si
+      la partición de filas sin fecha también es del rango (la extracción por ventanas solo las trae
+      en la primera ventana).
+    - Sin 'columna_fecha' (inventario, terceros) el DataFrame es una foto completa y se guarda
+      con la fecha de hoy.
+    Cada partición escrita reemplaza a la que hubiera. Retorna el número de archivos escritos.
+    """
+    if df is None or df.empty or not config.landing_habilitado or not _verificar_parquet():
+        return 0
+    empresas = df[columna_empresa].dropna().unique()
+
+    if columna_fecha is None:
+        hoy = date.today().isoformat()
+        for empresa in empresas:
+            _escribir_archivo(df[df[columna_empresa] == empresa], _ruta_particion(entidad, empresa, hoy))
+        print(f"Info: Foto de '{entidad}' guardada en la zona de aterrizaje ({len(empresas)} empresas, {hoy}).")
+        return len(empresas)
+
+    if rango is not None:
+        for empresa in empresas:
+            for fecha in _fechas_guardadas(entidad, empresa):
+                if (incluir_sin_fecha if fecha == SIN_FECHA else rango[0] <= fecha <= rango[1]):
+                    shutil.rmtree(_ruta_particion(entidad, empresa, fecha), ignore_errors=True)
+
+    fechas = df[columna_fecha].dt.strftime('%Y-%m-%d').fillna(SIN_FECHA)
+    archivos = 0
+    for (empresa, fecha), df_particion in df.groupby([df[columna_empresa], fechas], sort=False, observed=True):
+        _escribir_archivo(df_particion, _ruta_particion(entidad, empresa, fecha))
+        archivos += 1
+    print(f"Info: {len(df)} registros de '{entidad}' guardados en la zona de aterrizaje ({archivos} particiones).")
+    return archivos
+
+def _empresas_guardadas(entidad):
+    ruta = os.path.join(config.landing_dir, entidad)
+    if not os.path.isdir(ruta):
+        return []
+    return sorted(_valor_particion(nombre) for nombre in os.listdir(ruta) if nombre.startswith("empresa="))
+
+def _fechas_guardadas(entidad, empresa):
+    ruta = os.path.join(config.landing_dir, entidad, f"empresa={empresa}")
+    if not os.path.isdir(ruta):
+        return []
+    return sorted(
+        _valor_particion(nombre) for nombre in os.listdir(ruta)
+        if nombre.startswith("fecha=") and os.path.exists(os.path.join(ruta, nombre, "datos.parquet"))
+    )
+
+def _leer_particiones(entidad, particiones):
+    dfs = [
+        pd.read_parquet(os.path.join(_ruta_particion(entidad, empresa, fecha), "datos.parquet"))
+        for empresa, fecha in particiones
+    ]
+    if not dfs:
+        return None
+    # Las categóricas se guardan como diccionario en el Parquet; se conservan al unir las particiones
+    categoricas = {col for df in dfs for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)}
+    return _restaurar_objetos(recategorizar(pd.concat(dfs, ignore_index=True), categoricas))
+
+def leer_landing(entidad, empresas=None, fecha_desde=None, fecha_hasta=None, incluir_sin_fecha=True):
+    """
+    Lee de la zona de aterrizaje las particiones de 'entidad' (ej. 'ventas') que cumplan los filtros.
+    Las fechas son strings YYYY-MM-DD (inclusivas). Retorna un DataFrame o None si no hay datos.
+    """
+    if not _verificar_parquet():
+        return None
+    particiones = []
+    for empresa in (empresas or _empresas_guardadas(entidad)):
+        for fecha in _fechas_guardadas(entidad, empresa):
+            if fecha == SIN_FECHA:
+                if incluir_sin_fecha:
+                    particiones.append((empresa, fecha))
+            elif (fecha_desde is None or fecha >= fecha_desde) and (fecha_hasta is None or fecha <= fecha_hasta):
+                particiones.append((empresa, fecha))
+    df = _leer_particiones(entidad, particiones)
+    if df is not None:
+        print(f"Info: {len(df)} registros de '{entidad}' leídos de la zona de aterrizaje ({len(particiones)} particiones).")
+    return df
+
+def leer_ultima_foto(entidad, empresas=None):
+    """Lee la foto más reciente de cada empresa (inventario, terceros). Retorna un DataFrame o None."""
+    if not _verificar_parquet():
+        return None
+    particiones = []
+    for empresa in (empresas or _empresas_guardadas(entidad)):
+        fechas = [fecha for fecha in _fechas_guardadas(entidad, empresa) if fecha != SIN_FECHA]
+        if fechas:
+            particiones.append((empresa, fechas[-1]))
+            print(f"Info: Usando la foto de '{entidad}' de {empresa} del {fechas[-1]}.")
+    return _leer_particiones(entidad, particiones)
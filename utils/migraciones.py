@@ -0,0 +1,300 @@
+# Migraciones versionadas del esquema de la BD (tablas e índices).
+# Cada archivo de 'migraciones_db/' (NNNN_descripcion.py) tiene una función 'aplicar(cursor)'.
+# Las aplicadas quedan en la tabla 'esquema_migraciones'; cada una corre en su propia transacción.
+# Una migración lleva su DDL escrito en SQL literal y no importa código de la aplicación: lo que
+# aplicó no cambia después. Es la aplicación la que depende de las migraciones ('exigir_migracion').
+# Al iniciar, 'verificar_esquema' reporta las migraciones pendientes, los índices que faltan
+# y el costo del plan de las consultas más usadas.
+
+import importlib.util
+import json
+import os
+import re
+import time
+from datetime import date
+
+import psycopg2
+
+import config
+
+tabla_migraciones = "esquema_migraciones"
+directorio_migraciones = os.path.join(config.base_dir, "migraciones_db")
+
+# Índices de los caminos de acceso más usados: (tabla, nombre, columnas, único, para qué).
+# Las tablas que no existen (o que son vistas) y las columnas que aún no existen (migración pendiente)
+# se omiten; así la lista sirve igual para el modelo normalizado ('ventas_hechos') que para una
+# 'ventas_detalladas' sin normalizar.
+indices_esperados = [
+    ("ventas_hechos", "ventas_hechos_empresa_fecha_idx", ["empresa", "fecha"], False,
+     "DELETE por día/rango (Fase 1) y consulta de la Fase 3"),
+    ("ventas_hechos", "ventas_hechos_factura_idx", ["factura"], False,
+     "UPDATE/DELETE por factura (Fase 2)"),
+    ("ventas_hechos", "ventas_hechos_id_linea_idx", ["id_linea"], False,
+     "UPDATE/DELETE de la vista 'ventas_detalladas' (triggers)"),
+    ("ventas_detalladas", "ventas_detalladas_empresa_fecha_idx", ["empresa", "fecha"], False,
+     "DELETE por día/rango (Fase 1) y consulta de la Fase 3"),
+    ("ventas_detalladas", "ventas_detalladas_factura_idx", ["factura"], False,
+     "UPDATE/DELETE por factura (Fase 2)"),
+    ("inventario", "inventario_llave_uk", ["codigo_inv", "bodega_inv", "empresa_inv"], True,
+     "ON CONFLICT de la carga de inventario"),
+    ("terceros", "terceros_llave_uk", ["nit_ter", "empresa_ter"], True,
+     "ON CONFLICT de la carga de terceros"),
+]
+
+def _tipo_relacion(cursor, tabla):
+    """'r' tabla, 'p' particionada, 'v' vista o None si no existe."""
+    cursor.execute("""
+        SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = %s;
+    """, (tabla,))
+    fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+def _columnas_de(cursor, tabla):
+    cursor.execute("""
+        SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped;
+    """, (f'public."{tabla}"',))
+    return {fila[0] for fila in cursor.fetchall()}
+
+def _existe_indice_equivalente(cursor, tabla, columnas, unico):
+    """
+    True si la tabla ya tiene un índice que sirve: para uno normal, cualquier índice que empiece
+    por esas columnas; para uno único, un índice único exactamente sobre esas columnas.
+    """
+    cursor.execute("""
+        SELECT x.indisunique, array_agg(a.attname ORDER BY k.orden)
+        FROM pg_index x
+        CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, orden)
+        JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+        WHERE x.indrelid = %s::regclass
+        GROUP BY x.indexrelid, x.indisunique;
+    """, (f'public."{tabla}"',))
+    for es_unico, columnas_indice in cursor.fetchall():
+        if unico and es_unico and sorted(columnas_indice) == sorted(columnas):
+            return True
+        if not unico and columnas_indice[:len(columnas)] == columnas:
+            return True
+    return False
+
+def indices_faltantes(cursor, tablas=None):
+    """Índices de 'indices_esperados' (de 'tablas', o de todas) cuya tabla existe y no tiene uno equivalente."""
+    faltantes = []
+    for indice in indices_esperados:
+        tabla, _, columnas, unico, _ = indice
+        if tablas is not None and tabla not in tablas:
+            continue
+        if _tipo_relacion(cursor, tabla) not in ('r', 'p'):
+            continue
+        if not set(columnas) <= _columnas_de(cursor, tabla):
+            continue
+        if not _existe_indice_equivalente(cursor, tabla, columnas, unico):
+            faltantes.append(indice)
+    return faltantes
+
+def crear_indices(cursor, tablas=None):
+    """
+    Crea los índices de 'indices_esperados' que falten (de 'tablas', o de todas).
+    En una tabla particionada el índice se crea en todas sus particiones.
+    Retorna los nombres de los índices creados.
+    """
+    creados = []
+    for tabla, nombre, columnas, unico, _ in indices_faltantes(cursor, tablas):
+        print(f"Info: Creando índice '{nombre}' en '{tabla}' ({', '.join(columnas)})...")
+        lista_columnas = ', '.join(f'"{col}"' for col in columnas)
+        cursor.execute(f'CREATE {"UNIQUE " if unico else ""}INDEX IF NOT EXISTS "{nombre}" ON public."{tabla}" ({lista_columnas});')
+        creados.append(nombre)
+    return creados
+
+# --- Migraciones versionadas ---
+
+def _asegurar_tabla_migraciones(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS public."{tabla_migraciones}" (
+            version integer PRIMARY KEY,
+            nombre text NOT NULL,
+            aplicada_en timestamptz NOT NULL DEFAULT now(),
+            segundos numeric NOT NULL
+        );
+    """)
+
+def listar_migraciones():
+    """Migraciones disponibles como (version, nombre, ruta), ordenadas por versión."""
+    migraciones = []
+    if not os.path.isdir(directorio_migraciones):
+        return migraciones
+    for archivo in os.listdir(directorio_migraciones):
+        coincidencia = re.match(r"^(\d{4})_(\w+)\.py$", archivo)
+        if coincidencia:
+            migraciones.append((int(coincidencia.group(1)), coincidencia.group(2), os.path.join(directorio_migraciones, archivo)))
+    return sorted(migraciones)
+
+def _versiones_aplicadas(cursor):
+    if _tipo_relacion(cursor, tabla_migraciones) is None:
+        return set()
+    cursor.execute(f'SELECT version FROM public."{tabla_migraciones}";')
+    return {fila[0] for fila in cursor.fetchall()}
+
+def _cargar_modulo(version, nombre, ruta):
+    spec = importlib.util.spec_from_file_location(f"migracion_{version:04d}_{nombre}", ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    if not hasattr(modulo, 'aplicar'):
+        raise AttributeError(f"La migración {os.path.basename(ruta)} no tiene una función 'aplicar(cursor)'.")
+    return modulo
+
+class MigracionPendienteError(RuntimeError):
+    """Falta aplicar una migración de la que depende la aplicación (ver 'exigir_migracion')."""
+
+def migraciones_pendientes(cursor):
+    aplicadas = _versiones_aplicadas(cursor)
+    return [migracion for migracion in listar_migraciones() if migracion[0] not in aplicadas]
+
+def exigir_migracion(cursor, version):
+    """
+    Lanza MigracionPendienteError si la migración 'version' no está aplicada. Lo llaman las partes
+    de la aplicación que usan las tablas que crea esa migración.
+    """
+    if version in _versiones_aplicadas(cursor):
+        return
+    nombres = {numero: nombre for numero, nombre, _ in listar_migraciones()}
+    raise MigracionPendienteError(
+        f"Falta aplicar la migración {version:04d} '{nombres.get(version, '?')}' de la BD. "
+        f"Use la opción 'Aplicar migraciones de la BD' del menú (o db_migraciones_automaticas=true)."
+    )
+
+def esquema_al_dia(conn):
+    """
+    True si la BD no tiene migraciones pendientes. Si tiene, imprime el error y retorna False: los
+    flujos completos dependen de ellas y se detienen antes de empezar, en lugar de fallar en la
+    carga y seguir a la exportación con los datos anteriores.
+    """
+    with conn.cursor() as cursor:
+        pendientes = migraciones_pendientes(cursor)
+    conn.rollback()
+    if pendientes:
+        print(f"ERROR CRÍTICO: Faltan aplicar {len(pendientes)} migraciones de la BD "
+              f"({', '.join(f'{version:04d}_{nombre}' for version, nombre, _ in pendientes)}). "
+              f"Use la opción 'Aplicar migraciones de la BD' del menú (o db_migraciones_automaticas=true). Abortando flujo.")
+    return not pendientes
+
+def aplicar_migraciones(conn):
+    """
+    Aplica en orden las migraciones pendientes, cada una en su propia transacción (si una falla
+    se revierte solo esa y no se siguen aplicando las demás). Un candado (advisory lock) evita
+    que dos procesos migren a la vez. Retorna el número de migraciones aplicadas.
+    """
+    aplicadas = 0
+    with conn.cursor() as cursor:
+        _asegurar_tabla_migraciones(cursor)
+        conn.commit()
+        pendientes = migraciones_pendientes(cursor)
+        conn.commit()
+        if not pendientes:
+            print("Info: El esquema de la BD está al día. No hay migraciones pendientes.")
+            return 0
+        for version, nombre, ruta in pendientes:
+            inicio = time.perf_counter()
+            try:
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (tabla_migraciones,))
+                if version in _versiones_aplicadas(cursor): # Otro proceso la aplicó mientras esperábamos
+                    conn.commit()
+                    continue
+                print(f"Info: Aplicando migración {version:04d} '{nombre}'...")
+                _cargar_modulo(version, nombre, ruta).aplicar(cursor)
+                segundos = time.perf_counter() - inicio
+                cursor.execute(
+                    f'INSERT INTO public."{tabla_migraciones}" (version, nombre, segundos) VALUES (%s, %s, %s);',
+                    (version, nombre, round(segundos, 3))
+                )
+                conn.commit()
+                aplicadas += 1
+                print(f"¡ÉXITO! Migración {version:04d} '{nombre}' aplicada en {segundos:.1f} s.")
+            except Exception as e:
+                print(f"ERROR: La migración {version:04d} '{nombre}' falló y se revirtió: {e}")
+                conn.rollback()
+                raise
+    return aplicadas
+
+# --- Verificación al iniciar ---
+
+def _consultas_calientes(cursor):
+    """
+    Consultas más usadas, como (descripción, SQL, parámetros), con valores de ejemplo
+    (la primera empresa del config y el mes actual) para pedirle el plan a PostgreSQL.
+    """
+    empresa = config.api_config_tns[0]["nombre_corto"] if config.api_config_tns else ""
+    hoy = date.today()
+    inicio_mes = date(hoy.year, hoy.month, 1)
+    tabla_ventas = "ventas_hechos" if _tipo_relacion(cursor, "ventas_detalladas") == 'v' else "ventas_detalladas"
+    consultas = []
+    if _tipo_relacion(cursor, tabla_ventas) in ('r', 'p'):
+        consultas += [
+            ("DELETE de días (Fase 1)",
+             f'DELETE FROM public."{tabla_ventas}" WHERE empresa = %s AND fecha = %s', (empresa, hoy)),
+            ("DELETE por rango (delete_by_date_range)",
+             f'DELETE FROM public."{tabla_ventas}" WHERE fecha BETWEEN %s AND %s AND empresa = %s', (inicio_mes, hoy, empresa)),
+            ("Consulta de la Fase 3 (empresa + mes)",
+             'SELECT * FROM ventas_detalladas WHERE empresa = %s AND fecha BETWEEN %s AND %s', (empresa, inicio_mes, hoy)),
+            ("Ajustes por factura (Fase 2)",
+             'DELETE FROM ventas_detalladas WHERE factura = %s', ('FACTURA',)),
+        ]
+    if _tipo_relacion(cursor, "inventario") in ('r', 'p'):
+        consultas.append(("Llave del ON CONFLICT de inventario",
+                          'SELECT 1 FROM inventario WHERE codigo_inv = %s AND bodega_inv = %s AND empresa_inv = %s', ('', '', empresa)))
+    if _tipo_relacion(cursor, "terceros") in ('r', 'p'):
+        consultas.append(("Llave del ON CONFLICT de terceros",
+                          'SELECT 1 FROM terceros WHERE nit_ter = %s AND empresa_ter = %s', ('', empresa)))
+    return consultas
+
+def _recorridos(plan):
+    """Tipos de recorrido del plan (Seq Scan, Index Scan...) sin repetir, en orden."""
+    encontrados = []
+    pendientes = [plan]
+    while pendientes:
+        nodo = pendientes.pop(0)
+        if "Scan" in nodo["Node Type"] and nodo["Node Type"] not in encontrados:
+            encontrados.append(nodo["Node Type"])
+        pendientes.extend(nodo.get("Plans", []))
+    return encontrados
+
+def costos_consultas_calientes(cursor):
+    """Retorna [(descripción, costo total estimado, recorridos)] con EXPLAIN (sin ejecutar las consultas)."""
+    resultados = []
+    for descripcion, sql, parametros in _consultas_calientes(cursor):
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", parametros)
+        plan = cursor.fetchone()[0]
+        plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+        resultados.append((descripcion, plan["Total Cost"], _recorridos(plan)))
+    return resultados
+
+def verificar_esquema(conn):
+    """
+    Reporta las migraciones pendientes, los índices que faltan para las consultas calientes
+    y el costo estimado del plan de cada una. No modifica nada.
+    Retorna True si el esquema está al día y no falta ningún índice.
+    """
+    print("\n--- Verificación del esquema de la BD ---")
+    try:
+        with conn.cursor() as cursor:
+            pendientes = migraciones_pendientes(cursor)
+            faltantes = indices_faltantes(cursor)
+            costos = costos_consultas_calientes(cursor)
+        conn.rollback() # Solo lecturas y EXPLAIN; no dejamos la transacción abierta
+    except psycopg2.Error as e:
+        print(f"ADVERTENCIA: No se pudo verificar el esquema de la BD: {e}")
+        conn.rollback()
+        return False
+
+    if pendientes:
+        print(f"ADVERTENCIA: {len(pendientes)} migraciones pendientes: "
+              f"{', '.join(f'{version:04d}_{nombre}' for version, nombre, _ in pendientes)}. "
+              f"Use la opción 'Aplicar migraciones de la BD' del menú.")
+    else:
+        print("Info: Migraciones al día.")
+    for tabla, nombre, columnas, unico, uso in faltantes:
+        print(f"ADVERTENCIA: Falta el índice {'único ' if unico else ''}'{nombre}' en '{tabla}' ({', '.join(columnas)}), usado por: {uso}.")
+    if costos:
+        print(f"  {'Consulta':<42} {'Costo estimado':>15}  Recorridos")
+        for descripcion, costo, recorridos in costos:
+            print(f"  {descripcion:<42} {costo:>15.1f}  {', '.join(recorridos)}")
+    return not pendientes and not faltantes
@@ -0,0 +1,163 @@
+# Funciones de utilidad para tablas particionadas por mes (PARTITION BY RANGE sobre una fecha)
+
+from datetime import date, datetime, timedelta
+
+import re
+
+import psycopg2
+
+def _a_fecha(valor):
+    if isinstance(valor, str):
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor
+
+def _primer_dia_mes_siguiente(fecha):
+    return date(fecha.year + 1, 1, 1) if fecha.month == 12 else date(fecha.year, fecha.month + 1, 1)
+
+def nombre_particion(table_name, anio, mes):
+    """Nombre de la partición mensual: ventas_detalladas_2025_09"""
+    return f"{table_name}_{anio}_{mes:02d}"
+
+def meses_del_rango(fecha_desde, fecha_hasta):
+    """
+    Retorna los meses que toca el rango [fecha_desde, fecha_hasta] como diccionarios con:
+    anio, mes, inicio (primer día), fin_exclusivo (primer día del mes siguiente) y
+    completo (True si el rango cubre el mes entero).
+    """
+    desde, hasta = _a_fecha(fecha_desde), _a_fecha(fecha_hasta)
+    meses = []
+    inicio = date(desde.year, desde.month, 1)
+    while inicio <= hasta:
+        fin_exclusivo = _primer_dia_mes_siguiente(inicio)
+        meses.append({
+            "anio": inicio.year, "mes": inicio.month,
+            "inicio": inicio, "fin_exclusivo": fin_exclusivo,
+            "completo": desde <= inicio and hasta >= fin_exclusivo - timedelta(days=1),
+        })
+        inicio = fin_exclusivo
+    return meses
+
+def es_tabla_particionada(cursor, table_name):
+    """True si public.<table_name> existe y es una tabla particionada."""
+    cursor.execute("""
+        SELECT c.relkind = 'p'
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = %s;
+    """, (table_name,))
+    fila = cursor.fetchone()
+    return bool(fila and fila[0])
+
+def existe_tabla(cursor, table_name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (f'public."{table_name}"',))
+    return cursor.fetchone()[0]
+
+def crear_tabla_particionada(cursor, table_name, columnas_sql, columna_rango):
+    """
+    Crea (si no existe) la tabla padre particionada por rango sobre 'columna_rango'
+    y su partición DEFAULT, donde caen las filas sin fecha.
+    :param columnas_sql: lista de tuplas (columna, tipo_sql)
+    """
+    definicion = ',\n            '.join(f'"{col}" {tipo}' for col, tipo in columnas_sql)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS public."{table_name}" (
+            {definicion}
+        ) PARTITION BY RANGE ("{columna_rango}");
+    """)
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS public."{table_name}_default" PARTITION OF public."{table_name}" DEFAULT;')
+
+def asegurar_particiones(cursor, table_name, fecha_desde, fecha_hasta):
+    """
+    Crea bajo demanda las particiones mensuales que cubren el rango.
+    Retorna la lista de nombres de partición del rango, en orden.
+    """
+    nombres = []
+    for mes in meses_del_rango(fecha_desde, fecha_hasta):
+        nombre = nombre_particion(table_name, mes["anio"], mes["mes"])
+        if not existe_tabla(cursor, nombre):
+            print(f"Info: Creando partición '{nombre}' ({mes['inicio']} a {mes['fin_exclusivo']})...")
+            cursor.execute(f"""
+                CREATE TABLE public."{nombre}" PARTITION OF public."{table_name}"
+                FOR VALUES FROM (%s) TO (%s);
+            """, (mes["inicio"], mes["fin_exclusivo"]))
+        nombres.append(nombre)
+    return nombres
+
+def crear_tabla_de_intercambio(cursor, table_name, mes, columna_rango):
+    """
+    Crea una tabla vacía con la estructura de la tabla padre y un CHECK con los límites del mes.
+    Se llena por fuera (COPY) y luego 'intercambiar_particion' la pone en lugar de la partición actual.
+    El CHECK hace que el ATTACH no tenga que recorrer la tabla para validar los límites.
+    Retorna el nombre de la tabla creada.
+    """
+    nombre = nombre_particion(table_name, mes["anio"], mes["mes"]) + "_nueva"
+    cursor.execute(f'DROP TABLE IF EXISTS public."{nombre}";')
+    cursor.execute(f'CREATE TABLE public."{nombre}" (LIKE public."{table_name}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS);')
+    cursor.execute(f"""
+        ALTER TABLE public."{nombre}" ADD CONSTRAINT "{nombre}_rango"
+        CHECK ("{columna_rango}" IS NOT NULL AND "{columna_rango}" >= DATE %s AND "{columna_rango}" < DATE %s);
+    """, (mes["inicio"].isoformat(), mes["fin_exclusivo"].isoformat()))
+    return nombre
+
+def _indices_de(cursor, table_name):
+    """[(nombre, definición)] de los índices de la tabla."""
+    cursor.execute("""
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass;
+    """, (f'public."{table_name}"',))
+    return cursor.fetchall()
+
+def crear_indices_como_padre(cursor, table_name, tabla_nueva):
+    """
+    Crea en 'tabla_nueva' los mismos índices de la tabla padre. Se llama después de llenarla
+    (más rápido que mantener los índices fila a fila) y antes del ATTACH: así el ATTACH solo
+    asocia los índices existentes y no los construye con la tabla padre bloqueada.
+    """
+    for nombre, definicion in _indices_de(cursor, table_name):
+        sufijo = nombre[len(table_name) + 1:] if nombre.startswith(f"{table_name}_") else nombre
+        definicion = re.sub(
+            r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ ",
+            lambda m: f'CREATE {m.group(1) or ""}INDEX "{tabla_nueva}_{sufijo}" ON public."{tabla_nueva}" ',
+            definicion
+        )
+        cursor.execute(definicion)
+
+def intercambiar_particion(cursor, table_name, mes, tabla_nueva):
+    """
+    Reemplaza la partición del mes por 'tabla_nueva': DETACH + DROP de la actual, RENAME y ATTACH.
+    Debe ejecutarse al final de la transacción: el DETACH bloquea la tabla padre hasta el commit.
+    """
+    nombre = nombre_particion(table_name, mes["anio"], mes["mes"])
+    if existe_tabla(cursor, nombre):
+        cursor.execute(f'ALTER TABLE public."{table_name}" DETACH PARTITION public."{nombre}";')
+        cursor.execute(f'DROP TABLE public."{nombre}";')
+    cursor.execute(f'ALTER TABLE public."{tabla_nueva}" RENAME TO "{nombre}";')
+    cursor.execute(f'ALTER TABLE public."{nombre}" RENAME CONSTRAINT "{tabla_nueva}_rango" TO "{nombre}_rango";')
+    # Los índices creados con 'crear_indices_como_padre' toman el nombre de la partición
+    for nombre_indice, _ in _indices_de(cursor, nombre):
+        if nombre_indice.startswith(f"{tabla_nueva}_"):
+            cursor.execute(f'ALTER INDEX public."{nombre_indice}" RENAME TO "{nombre}_{nombre_indice[len(tabla_nueva) + 1:]}";')
+    cursor.execute(f"""
+        ALTER TABLE public."{table_name}" ATTACH PARTITION public."{nombre}"
+        FOR VALUES FROM (%s) TO (%s);
+    """, (mes["inicio"], mes["fin_exclusivo"]))
+    return nombre
+
+def analizar_tablas(conn, nombres_tablas):
+    """
+    Ejecuta ANALYZE sobre las tablas indicadas para que el planificador tenga estadísticas frescas.
+    Un error aquí solo se reporta: los datos ya quedaron cargados.
+    """
+    try:
+        with conn.cursor() as cursor:
+            for nombre in nombres_tablas:
+                cursor.execute(f'ANALYZE public."{nombre}";')
+        conn.commit()
+    except psycopg2.Error as e:
+        print(f"ADVERTENCIA: No se pudo ejecutar ANALYZE: {e}")
+        conn.rollback()
+        return
+    if nombres_tablas:
+        print(f"Info: Estadísticas actualizadas (ANALYZE) para: {', '.join(nombres_tablas)}")
@@ -62,10 +62,28 @@ def pedir_mes_anio_exporte():
             
     return mes, anio
 
+def pedir_rango_meses_exporte():
+    """
+    Pide el mes inicial y, si se quiere exportar varios meses, el mes final.
+    Retorna (mes_inicio, anio_inicio, mes_fin, anio_fin) como números enteros.
+    """
+    mes_inicio, anio_inicio = pedir_mes_anio_exporte()
+    respuesta = input("¿Exportar varios meses (hasta un mes final)? (s/n): ").strip().lower()
+    if respuesta != 's':
+        return mes_inicio, anio_inicio, mes_inicio, anio_inicio
+
+    while True:
+        print("\n--- Mes final del exporte ---")
+        mes_fin, anio_fin = pedir_mes_anio_exporte()
+        if (anio_fin, mes_fin) < (anio_inicio, mes_inicio):
+            print("Error: El mes final no puede ser anterior al mes inicial.")
+        else:
+            return mes_inicio, anio_inicio, mes_fin, anio_fin
+
 def seleccionar_script_ajuste(ruta_directorio):
     """
-    Escanea un directorio en busca de scripts .py, los muestra
-    y pide al usuario que seleccione uno.
+    Escanea un directorio en busca de ajustes declarados (.csv) y scripts .py,
+    los muestra y pide al usuario que seleccione uno.
     Retorna la ruta completa al script seleccionado, o None si cancela.
     """
     print("\n--- Selección de Script de Ajuste ---")
@@ -74,8 +92,8 @@ def seleccionar_script_ajuste(ruta_directorio):
         print(f"ERROR: El directorio de scripts no existe: {ruta_directorio}")
         return None
 
-    # Encontrar solo archivos .py que NO sean __init__.py
-    scripts = [f for f in os.listdir(ruta_directorio) if f.endswith('.py') and not f.startswith('__')]
+    # Encontrar los archivos .csv y .py que NO sean __init__.py
+    scripts = sorted(f for f in os.listdir(ruta_directorio) if f.endswith(('.csv', '.py')) and not f.startswith('__'))
     
     if not scripts:
         print(f"No se encontraron scripts de ajuste en: {ruta_directorio}")